@@ -0,0 +1,186 @@
+"""
+Check the import time of every runner script against a budget.
+
+Each entry point is imported in a fresh interpreter with `python -X importtime`, several times, and the fastest
+cumulative import time of the module itself is compared to its budget in STARTUP_BUDGETS_MS. On a failure the
+slowest imports of that script are listed.
+
+Heavy dependencies (PyYAML, Conan, Cura, pyartifactory) should only be imported by the code that needs them. As the
+timings vary per machine, importing one of DEFERRED_IMPORTS at module load fails the check as well, unless the
+script is listed for it in ALLOWED_IMPORTS.
+
+Usage:
+    python check_startup_time.py [--runs N] [--scale FACTOR] [--relative] [--json-output PATH] [MODULE...]
+
+The budgets are for a Linux runner; --scale multiplies them for slower machines, like the Windows runners. With
+--relative they are scaled by how much slower than REFERENCE_MS this machine imports REFERENCE_MODULES, the standard
+library modules every script imports, so they hold on shared runners too. tests/test_startup_time.py runs the check
+that way.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+RUNNER_SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Module -> budget in milliseconds for importing it, with everything it imports at module load
+STARTUP_BUDGETS_MS = {
+    "cleanup_distribution": 40,
+    "conan_package_finder": 60,
+    "get_conan_broadcast_data": 15,
+    "make_runners_list": 15,
+    "prepare_installer": 15,
+    "profile_frozen_startup": 40,
+    "rename_installers": 15,
+    "report_distribution_size": 40,
+    "sanitize_jfrog_artifactory": 1000,
+    "upload_conan_package": 40,
+    "upload_conan_recipes": 50,
+}
+
+# The standard library modules every script imports, and their import time where the budgets were set
+REFERENCE_MODULES = ("argparse", "json", "subprocess")
+REFERENCE_MS = 12
+
+DEFERRED_IMPORTS = ("yaml", "conan", "conans", "cura", "UM", "pyartifactory", "requests")
+
+# Module -> deferred imports it may still import at module load
+ALLOWED_IMPORTS = {
+    # pyartifactory (and with it requests) is needed by every path through the script
+    "sanitize_jfrog_artifactory": ("pyartifactory", "requests"),
+}
+
+
+def parse_importtime_lines(output):
+    """Returns [(module, depth, self us, cumulative us)] from the -X importtime output, in the order they were printed;
+    the imports of a module are listed before it at a deeper indentation"""
+    lines = []
+    for line in output.splitlines():
+        if not line.startswith("import time:") or line.count("|") != 2:
+            continue
+        self_time, cumulative, name = line[len("import time:"):].split("|")
+        if not self_time.strip().isdigit():
+            continue  # the header line
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        lines.append((name.strip(), depth, int(self_time), int(cumulative)))
+    return lines
+
+
+def parse_importtime(output, module):
+    """Returns {imported module: (depth, cumulative us)} for everything the module imported, from the -X importtime
+    output"""
+    lines = [(name, depth, cumulative) for name, depth, self_time, cumulative in parse_importtime_lines(output)]
+
+    timings = {}
+    for index, (name, depth, cumulative) in enumerate(lines):
+        if name == module and depth == 0:
+            timings[name] = (0, cumulative)
+            for child, child_depth, child_cumulative in reversed(lines[:index]):
+                if child_depth == 0:
+                    break
+                timings[child] = (child_depth, child_cumulative)
+            return timings
+    raise ValueError(f"{module} not found in the import times")
+
+
+def measure_import(module, runs = 5):
+    """Imports the module in `runs` fresh interpreters, returns the cumulative import times in ms and the timings
+    of the fastest run"""
+    durations = []
+    fastest = None
+    for _ in range(runs):
+        result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=RUNNER_SCRIPTS_DIR,
+                                capture_output=True, text=True)
+        if result.returncode != 0:
+            raise RuntimeError(f"Importing {module} failed:\n{result.stderr[-2000:]}")
+        timings = parse_importtime(result.stderr, module)
+        duration = timings[module][1] / 1000
+        if fastest is None or duration < min(durations):
+            fastest = timings
+        durations.append(duration)
+    return durations, fastest
+
+
+def measure_reference(runs = 5):
+    """Returns the fastest import time in ms of REFERENCE_MODULES in a fresh interpreter"""
+    durations = []
+    for _ in range(runs):
+        result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {', '.join(REFERENCE_MODULES)}"],
+                                capture_output=True, text=True)
+        durations.append(sum(cumulative for name, depth, self_time, cumulative in parse_importtime_lines(result.stderr)
+                             if depth == 0 and name in REFERENCE_MODULES) / 1000)
+    return min(durations)
+
+
+def relative_scale(runs = 5):
+    """Returns how much slower this machine imports REFERENCE_MODULES than where the budgets were set, at least 1"""
+    return max(1.0, measure_reference(runs) / REFERENCE_MS)
+
+
+def slowest_imports(timings, count = 5):
+    # The modules imported by the module itself, by cumulative time
+    direct = [(name, cumulative) for name, (depth, cumulative) in timings.items() if depth == 1]
+    return sorted(direct, key=lambda item: item[1], reverse=True)[:count]
+
+
+def deferred_imports(timings, module):
+    allowed = ALLOWED_IMPORTS.get(module, ())
+    return sorted({name.split(".")[0] for name in timings
+                   if name.split(".")[0] in DEFERRED_IMPORTS and name.split(".")[0] not in allowed})
+
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description="Check the import time of the runner scripts against their budgets")
+    parser.add_argument("modules", nargs="*", help="Modules to check (default: all in STARTUP_BUDGETS_MS)")
+    parser.add_argument("--runs", type=int, default=5, help="Imports per module, the fastest one counts (default: 5)")
+    parser.add_argument("--scale", type=float, default=1.0, help="Multiply the budgets, for slower runners (default: 1.0)")
+    parser.add_argument("--relative", action="store_true", help="Also scale the budgets by the import time of the standard library on this machine")
+    parser.add_argument("--json-output", type=str, help="Also write the measurements to this JSON file")
+    args = parser.parse_args(argv)
+
+    modules = args.modules or list(STARTUP_BUDGETS_MS)
+    unknown = [module for module in modules if module not in STARTUP_BUDGETS_MS]
+    if unknown:
+        print(f"Error: no budget for {', '.join(unknown)}", file=sys.stderr)
+        sys.exit(2)
+
+    scale = args.scale
+    if args.relative:
+        scale *= relative_scale(args.runs)
+        print(f"Budgets scaled by {scale:.2f} for this machine")
+
+    report = {}
+    over_budget = []
+    print(f"{'module':30} {'fastest':>9} {'median':>9} {'budget':>9}")
+    for module in modules:
+        durations, timings = measure_import(module, args.runs)
+        budget = STARTUP_BUDGETS_MS[module] * scale
+        fastest = min(durations)
+        eager = deferred_imports(timings, module)
+        report[module] = {"fastest_ms": fastest, "median_ms": statistics.median(durations), "budget_ms": budget,
+                          "deferred_imports": eager,
+                          "slowest_imports": {name: cumulative / 1000 for name, cumulative in slowest_imports(timings)}}
+        status = "" if fastest <= budget else "  OVER BUDGET"
+        if eager:
+            status += f"  IMPORTS {', '.join(eager)} AT MODULE LOAD"
+        print(f"{module:30} {fastest:7.1f}ms {statistics.median(durations):7.1f}ms {budget:7.1f}ms{status}")
+        if status:
+            over_budget.append(module)
+            for name, cumulative in report[module]["slowest_imports"].items():
+                print(f"    {name:26} {cumulative:7.1f}ms")
+
+    if args.json_output:
+        with open(args.json_output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if over_budget:
+        print(f"{len(over_budget)} script(s) over their startup budget: {', '.join(over_budget)}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -13,7 +13,20 @@ Each entry in 'pyinstaller.blacklist' has:
               Recognised values: Windows, Linux, Macos.
 
 Usage:
-  python cleanup_distribution.py <dist_dir> [--conandata PATH] [--os Windows|Linux|Macos]
+  python cleanup_distribution.py <dist_dir> [--conandata PATH] [--os Windows|Linux|Macos] [--jobs N]
+                                 [--plan-json PATH | --apply-plan PATH]
+                                 [--dedup hardlink|symlink [--dedup-min-size BYTES] [--dedup-report PATH]]
+
+The removal plan is collected first, then the matched trees are deleted in parallel by a
+bounded thread pool (--jobs); log output follows the plan order.
+
+--plan-json only writes that plan, with the blacklist entry that matched each path and the bytes
+it frees, plus per-entry totals. --apply-plan deletes the paths of such a plan without walking
+the tree again.
+
+--dedup (Linux and Macos) runs after the cleanup and replaces byte-identical files by hardlinks or
+relative symlinks to a single copy. Files are grouped by size and only size collisions are hashed.
+Files whose paths match different sets of OS-specific blacklist entries are never linked together.
 
 Examples:
   # Linux / macOS AppImage
@@ -24,65 +37,451 @@ Examples:
 
   # Windows
   python cleanup_distribution.py dist\\UltiMaker-Cura --conandata _cura_sources\\conandata.yml --os Windows
+
+  # Report which blacklist entries shrink the distribution, then apply that plan
+  python cleanup_distribution.py dist/UltiMaker-Cura --conandata _cura_sources/conandata.yml --plan-json plan.json
+  python cleanup_distribution.py dist/UltiMaker-Cura --apply-plan plan.json
+
+  # Clean the AppImage distribution and hardlink the remaining duplicates
+  python cleanup_distribution.py dist/UltiMaker-Cura --conandata _cura_sources/conandata.yml --os Linux --dedup hardlink
 """
 
 import argparse
+import hashlib
+import json
 import os
 import shutil
 import sys
-from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path, PurePosixPath
+from typing import NamedTuple
+
+from workflow_context import positive_int
+from yaml_loader import load_yaml_file
+
+
+class BlacklistMatcher:
+    """Aho-Corasick automaton over all substrings of the blacklist entries that apply to one OS.
+
+    Every path is scanned once, character by character, and the set of entries whose patterns
+    all occurred is reported. Since the walk visits parents before children, the automaton state
+    at the end of a directory path is reused to scan the names inside it, so each file only
+    costs the length of its own name.
+    """
+
+    def __init__(self, entries: list, current_os: str):
+        self.entries = []
+        self.entry_indices = []
+        self._entry_masks = []
+        pattern_ids = {}
+        for index, entry in enumerate(entries):
+            oses = entry.get("oses") if isinstance(entry, dict) else None
+            if oses and current_os not in oses:
+                continue
+            patterns = entry if isinstance(entry, list) else entry.get("patterns", [])
+            mask = 0
+            for pattern in patterns:
+                mask |= 1 << pattern_ids.setdefault(pattern, len(pattern_ids))
+            self.entries.append(entry)
+            self.entry_indices.append(index)
+            self._entry_masks.append(mask)
+
+        # Trie of all distinct patterns; _output[state] is the bitmask of patterns ending there.
+        self._goto = [{}]
+        self._output = [0]
+        for pattern, pattern_id in pattern_ids.items():
+            state = 0
+            for char in pattern:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][char] = next_state
+                    self._goto.append({})
+                    self._output.append(0)
+                state = next_state
+            self._output[state] |= 1 << pattern_id
+
+        # Failure links, breadth first, folding the outputs of suffix states into each state.
+        self._fail = [0] * len(self._goto)
+        queue = list(self._goto[0].values())
+        for state in queue:
+            for char, next_state in self._goto[state].items():
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[next_state] = target if target != next_state else 0
+                self._output[next_state] |= self._output[self._fail[next_state]]
+                queue.append(next_state)
+
+        # Transitions resolved through the failure links are memoised, turning the automaton into
+        # a DFA for the characters that actually occur in the scanned paths.
+        self._delta = [dict(transitions) for transitions in self._goto]
+
+    def _step(self, state: int, char: str) -> int:
+        fallback = state
+        while True:
+            next_state = self._goto[fallback].get(char)
+            if next_state is not None:
+                break
+            if fallback == 0:
+                next_state = 0
+                break
+            fallback = self._fail[fallback]
+        self._delta[state][char] = next_state
+        return next_state
+
+    def scan(self, text: str, state: int = 0, matched: int = 0) -> tuple:
+        """Feed text into the automaton, starting from the given state and matched-pattern bitmask.
+        Returns the (state, matched) pair at the end of the text so scanning can be resumed.
+        """
+        delta = self._delta
+        output = self._output
+        for char in text:
+            next_state = delta[state].get(char)
+            if next_state is None:
+                next_state = self._step(state, char)
+            state = next_state
+            matched |= output[state]
+        return state, matched
+
+    def first_match(self, matched: int):
+        """Return the blacklist index of the first entry whose patterns are all in matched, or None."""
+        for index, mask in zip(self.entry_indices, self._entry_masks):
+            if matched & mask == mask:
+                return index
+        return None
+
+    def all_matches(self, matched: int) -> tuple:
+        """Return the blacklist indices of every entry whose patterns are all in matched."""
+        return tuple(
+            index for index, mask in zip(self.entry_indices, self._entry_masks) if matched & mask == mask
+        )
+
+
+class PlannedRemoval(NamedTuple):
+    path: Path
+    is_dir: bool
+    entry_index: int
+    size: int = 0
+
+
+def collect_removal_plan(dist_dir: Path, matcher: BlacklistMatcher, with_sizes: bool = False) -> list:
+    """Walk dist_dir with os.scandir and return the PlannedRemoval items, without deleting anything.
+
+    The order is that of a top-down os.walk with every directory listing sorted by name: the matched
+    subdirectories of a directory, then its matched files, then the remaining subdirectories in turn.
+    No planned path lies inside another one.
+
+    With with_sizes, the walk also descends into matched directories (without matching) and sums the
+    sizes of their files bottom-up, so every file is stat'd exactly once.
+    """
+    plan = []
 
-try:
-    import yaml
-except ImportError as exc:
-    raise SystemExit("PyYAML is required (pip install pyyaml).") from exc
+    def visit(root_path: Path, matching: bool) -> int:
+        """Plan the removals below root_path, or when not matching, return the bytes it holds."""
+        try:
+            with os.scandir(root_path) as it:
+                listing = sorted(it, key=lambda entry: entry.name)
+        except OSError:
+            # Same as os.walk: directories that can't be listed are skipped.
+            return 0
 
+        if not matching:
+            return sum(
+                visit(Path(entry.path), False) if _is_real_dir(entry) else _entry_size(entry)
+                for entry in listing
+            )
 
-def path_matches(path: Path, entry) -> bool:
-    """Return True if every pattern string appears in the normalised lowercase path.
-    Entry is either a plain list (legacy) or a dict with a 'patterns' key.
+        # Scan the directory prefix (including the separator that joining a name would add) once,
+        # then resume from that state for every entry in this directory.
+        prefix = (root_path / "_").as_posix()[:-1].lower()
+        prefix_state, prefix_matched = matcher.scan(prefix)
+
+        matched_dirs = []
+        matched_files = []
+        walk_into = []
+        for entry in listing:
+            try:
+                is_dir = entry.is_dir()
+            except OSError:
+                is_dir = False
+            _, matched = matcher.scan(entry.name.lower(), prefix_state, prefix_matched)
+            entry_index = matcher.first_match(matched)
+            if entry_index is not None:
+                (matched_dirs if is_dir else matched_files).append((entry, is_dir, entry_index))
+            elif is_dir and not entry.is_symlink():
+                walk_into.append(entry)
+
+        for entry, is_dir, entry_index in matched_dirs + matched_files:
+            size = 0
+            if with_sizes:
+                size = visit(Path(entry.path), False) if _is_real_dir(entry) else _entry_size(entry)
+            plan.append(PlannedRemoval(root_path / entry.name, is_dir, entry_index, size))
+
+        for entry in walk_into:
+            visit(root_path / entry.name, True)
+        return 0
+
+    visit(Path(dist_dir), True)
+    return plan
+
+
+def _is_real_dir(entry: os.DirEntry) -> bool:
+    try:
+        return entry.is_dir(follow_symlinks=False)
+    except OSError:
+        return False
+
+
+def _entry_size(entry: os.DirEntry) -> int:
+    try:
+        return entry.stat(follow_symlinks=False).st_size
+    except OSError:
+        return 0
+
+
+def remove_path(target: Path, is_dir: bool) -> None:
+    if is_dir and not target.is_symlink():
+        shutil.rmtree(target)
+    else:
+        target.unlink(missing_ok=True)
+
+
+def execute_plan(dist_dir: Path, plan: list, jobs: int = None) -> int:
+    """Delete the planned paths from a pool of at most `jobs` threads (default: the ThreadPoolExecutor
+    default). Log lines are printed in plan order as the deletions complete.
     """
-    patterns = entry if isinstance(entry, list) else entry.get("patterns", [])
-    normalised = path.as_posix().lower()
-    return all(part in normalised for part in patterns)
-
-
-def cleanup(dist_dir: Path, entries: list, current_os: str) -> int:
-    removed = 0
-    for root, dirs, files in os.walk(dist_dir, topdown=True):
-        root_path = Path(root)
-
-        # Check directories first — prune the walk so we don't recurse into removed trees.
-        for d in dirs[:]:
-            target = root_path / d
-            for entry in entries:
-                oses = entry.get("oses") if isinstance(entry, dict) else None
-                if oses and current_os not in oses:
-                    continue
-                if path_matches(target, entry):
-                    print(f"  Removing dir:  {target.relative_to(dist_dir)}")
-                    shutil.rmtree(target)
-                    dirs.remove(d)
-                    removed += 1
-                    break
-
-        # Check individual files.
-        for f in files:
-            target = root_path / f
-            for entry in entries:
-                oses = entry.get("oses") if isinstance(entry, dict) else None
-                if oses and current_os not in oses:
-                    continue
-                if path_matches(target, entry):
-                    print(f"  Removing file: {target.relative_to(dist_dir)}")
-                    target.unlink(missing_ok=True)
-                    removed += 1
-                    break
-
-    return removed
-
-
-def main() -> None:
+    def log(item: PlannedRemoval) -> None:
+        if item.is_dir:
+            print(f"  Removing dir:  {item.path.relative_to(dist_dir)}")
+        else:
+            print(f"  Removing file: {item.path.relative_to(dist_dir)}")
+
+    if jobs == 1:
+        for item in plan:
+            log(item)
+            remove_path(item.path, item.is_dir)
+    else:
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            futures = [executor.submit(remove_path, item.path, item.is_dir) for item in plan]
+            for item, future in zip(plan, futures):
+                future.result()
+                log(item)
+
+    return len(plan)
+
+
+def cleanup(dist_dir: Path, entries: list, current_os: str, jobs: int = None) -> int:
+    """Remove everything in dist_dir matched by the blacklist entries that apply to current_os.
+
+    The full removal plan is collected first, then handed to execute_plan.
+    """
+    matcher = BlacklistMatcher(entries, current_os)
+    if not matcher.entries:
+        return 0
+
+    plan = collect_removal_plan(dist_dir, matcher)
+    return execute_plan(dist_dir, plan, jobs)
+
+
+def write_plan_json(plan_path: Path, dist_dir: Path, entries: list, current_os: str) -> dict:
+    """Run the matching walk with size accounting and write the plan as JSON, without deleting.
+
+    Besides the planned removals, the JSON lists every blacklist entry with the number of items it
+    matched and the bytes it frees, so entries that don't shrink the distribution stand out.
+    """
+    matcher = BlacklistMatcher(entries, current_os)
+    plan = collect_removal_plan(dist_dir, matcher, with_sizes=True) if matcher.entries else []
+
+    entry_stats = {index: {"matches": 0, "bytes": 0} for index in range(len(entries))}
+    for item in plan:
+        entry_stats[item.entry_index]["matches"] += 1
+        entry_stats[item.entry_index]["bytes"] += item.size
+
+    data = {
+        "dist_dir": Path(dist_dir).as_posix(),
+        "os": current_os,
+        "total_bytes": sum(item.size for item in plan),
+        "removals": [
+            {
+                "path": item.path.relative_to(dist_dir).as_posix(),
+                "type": "dir" if item.is_dir else "file",
+                "entry": item.entry_index,
+                "bytes": item.size,
+            }
+            for item in plan
+        ],
+        "entries": [
+            {
+                "index": index,
+                "entry": entry,
+                "applies": index in matcher.entry_indices,
+                **entry_stats[index],
+            }
+            for index, entry in enumerate(entries)
+        ],
+    }
+    with open(plan_path, "w") as fh:
+        json.dump(data, fh, indent=2)
+    return data
+
+
+def read_plan_json(plan_path: Path, dist_dir: Path) -> list:
+    """Load a plan written by write_plan_json as PlannedRemoval items rooted at dist_dir.
+    Paths already gone are skipped; paths escaping dist_dir are rejected.
+    """
+    with open(plan_path) as fh:
+        data = json.load(fh)
+
+    plan = []
+    for removal in data.get("removals", []):
+        relative = PurePosixPath(removal["path"])
+        if relative.is_absolute() or ".." in relative.parts:
+            raise ValueError(f"Plan path escapes the distribution directory: {removal['path']}")
+        target = Path(dist_dir).joinpath(*relative.parts)
+        if not os.path.lexists(target):
+            print(f"  Skipping (already removed): {relative}")
+            continue
+        plan.append(PlannedRemoval(target, removal["type"] == "dir", removal.get("entry"), removal.get("bytes", 0)))
+    return plan
+
+
+DEDUP_PARTIAL_HASH_BYTES = 64 * 1024
+DEDUP_READ_BUFFER = 1024 * 1024
+
+
+def _hash_file(path: str, limit: int = None) -> bytes:
+    """SHA-256 of the first `limit` bytes of the file (the whole file if limit is None), streamed."""
+    digest = hashlib.sha256()
+    remaining = limit
+    with open(path, "rb") as fh:
+        while remaining is None or remaining > 0:
+            chunk = fh.read(DEDUP_READ_BUFFER if remaining is None else min(DEDUP_READ_BUFFER, remaining))
+            if not chunk:
+                break
+            digest.update(chunk)
+            if remaining is not None:
+                remaining -= len(chunk)
+    return digest.digest()
+
+
+def _split_by_hash(paths: list, limit: int = None) -> list:
+    """Split a list of same-sized file paths into the sublists (of 2 or more) with equal content hashes."""
+    by_hash = {}
+    for path in paths:
+        by_hash.setdefault(_hash_file(path, limit), []).append(path)
+    return [group for group in by_hash.values() if len(group) > 1]
+
+
+def _replace_with_link(duplicate: str, original: str, mode: str) -> None:
+    """Atomically replace duplicate by a hardlink to, or a relative symlink pointing at, original."""
+    temp_path = f"{duplicate}.dedup-tmp"
+    try:
+        os.unlink(temp_path)  # left behind by an interrupted run
+    except FileNotFoundError:
+        pass
+    if mode == "symlink":
+        os.symlink(os.path.relpath(original, os.path.dirname(duplicate)), temp_path)
+    else:
+        os.link(original, temp_path)
+    try:
+        os.replace(temp_path, duplicate)
+    except OSError:
+        os.unlink(temp_path)
+        raise
+
+
+def deduplicate(dist_dir: Path, entries: list, mode: str = "hardlink", min_size: int = 1) -> dict:
+    """Replace byte-identical files in dist_dir by hardlinks (or relative symlinks) to a single copy.
+
+    Files are grouped by size first; only groups with a size collision are hashed, first over their
+    first DEDUP_PARTIAL_HASH_BYTES and then, for the remaining candidates, over their full content.
+    Files are only linked together when they also share device, permission bits and the set of
+    platform-specific blacklist entries (those with 'oses', whatever the current OS) their paths
+    match, so no link ever crosses a boundary that the blacklist removes on some platform only.
+    The first path in sorted order of every group is kept as the original.
+
+    Files that are already hardlinked together count as one; when such a duplicate is linked, all its
+    paths are. Returns a report with the linked groups and the number of bytes saved, which only
+    counts the duplicates whose inode loses its last link (not those also linked from outside dist_dir).
+    """
+    platform_entries = [
+        {"patterns": entry.get("patterns", [])}
+        for entry in entries
+        if isinstance(entry, dict) and entry.get("oses")
+    ]
+    boundary_matcher = BlacklistMatcher(platform_entries, None)
+
+    # (boundary, device, mode, size) -> [path, ...], keeping one path per inode.
+    candidates = {}
+    # The first path of every inode -> (its link count, all its paths)
+    inodes = {}
+    first_paths = {}
+    pending = [Path(dist_dir)]
+    while pending:
+        root_path = pending.pop()
+        try:
+            with os.scandir(root_path) as it:
+                listing = sorted(it, key=lambda entry: entry.name)
+        except OSError:
+            continue
+
+        prefix = (root_path / "_").as_posix()[:-1].lower()
+        prefix_state, prefix_matched = boundary_matcher.scan(prefix)
+        for entry in reversed(listing):
+            if entry.is_symlink():
+                continue
+            if entry.is_dir():
+                pending.append(Path(entry.path))
+                continue
+            try:
+                stat = entry.stat(follow_symlinks=False)
+            except OSError:
+                continue
+            if not entry.is_file() or stat.st_size < min_size:
+                continue
+            first_path = first_paths.setdefault((stat.st_dev, stat.st_ino), entry.path)
+            if first_path != entry.path:
+                inodes[first_path][1].append(entry.path)
+                continue
+            inodes[entry.path] = (stat.st_nlink, [entry.path])
+            _, matched = boundary_matcher.scan(entry.name.lower(), prefix_state, prefix_matched)
+            key = (boundary_matcher.all_matches(matched), stat.st_dev, stat.st_mode, stat.st_size)
+            candidates.setdefault(key, []).append(entry.path)
+
+    groups = []
+    for (_, _, _, size), paths in candidates.items():
+        if len(paths) < 2:
+            continue
+        for partial_group in _split_by_hash(paths, DEDUP_PARTIAL_HASH_BYTES):
+            if size <= DEDUP_PARTIAL_HASH_BYTES:
+                groups.append((size, sorted(partial_group)))
+            else:
+                groups.extend((size, sorted(group)) for group in _split_by_hash(partial_group))
+    groups.sort(key=lambda group: group[1][0])
+
+    report = {"mode": mode, "groups": [], "linked_files": 0, "bytes_saved": 0}
+    for size, (original, *duplicates) in groups:
+        original = min(inodes[original][1])
+        linked = []
+        for duplicate in duplicates:
+            link_count, paths = inodes[duplicate]
+            for path in sorted(paths):
+                _replace_with_link(path, original, mode)
+                linked.append(path)
+            if link_count == len(paths):
+                report["bytes_saved"] += size
+        report["groups"].append({
+            "original": Path(original).relative_to(dist_dir).as_posix(),
+            "duplicates": [Path(path).relative_to(dist_dir).as_posix() for path in linked],
+            "size": size,
+        })
+        report["linked_files"] += len(linked)
+    return report
+
+
+def main(argv: list = None) -> None:
     parser = argparse.ArgumentParser(
         description="Remove blacklisted packages from a built distribution directory",
         formatter_class=argparse.RawDescriptionHelpFormatter,
@@ -103,7 +502,43 @@ def main() -> None:
         default=None,
         help="Override OS name: Windows, Linux, or Macos (defaults to current platform)",
     )
-    args = parser.parse_args()
+    parser.add_argument(
+        "--jobs",
+        type=positive_int,
+        default=None,
+        help="Number of deletion threads (default: min(32, CPU count + 4); 1 deletes sequentially)",
+    )
+    parser.add_argument(
+        "--dedup",
+        choices=["hardlink", "symlink"],
+        default=None,
+        help="After cleaning, replace byte-identical files by hardlinks or relative symlinks (Linux and Macos only)",
+    )
+    parser.add_argument(
+        "--dedup-min-size",
+        type=int,
+        default=1,
+        help="Ignore files smaller than this many bytes when deduplicating (default: 1)",
+    )
+    parser.add_argument(
+        "--dedup-report",
+        default=None,
+        help="Write the linked groups and bytes saved by --dedup to this JSON file",
+    )
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument(
+        "--plan-json",
+        default=None,
+        help="Do not delete anything; write the matched paths, their blacklist entry and size to this JSON file",
+    )
+    mode.add_argument(
+        "--apply-plan",
+        default=None,
+        help="Delete the paths of a plan written by --plan-json, without walking the tree or reading conandata.yml",
+    )
+    args = parser.parse_args(argv)
+    if args.dedup and args.plan_json:
+        parser.error("--dedup deletes nothing but still modifies the tree, so it can't be combined with --plan-json")
 
     current_os = args.os_name or {
         "linux": "Linux",
@@ -111,27 +546,55 @@ def main() -> None:
         "win32": "Windows",
     }.get(sys.platform, sys.platform)
 
-    conandata_path = Path(args.conandata)
-    if not conandata_path.exists():
-        print(f"ERROR: conandata.yml not found at {conandata_path}", file=sys.stderr)
+    dist_dir = Path(args.dist_dir)
+    if not dist_dir.exists():
+        print(f"ERROR: Distribution directory not found: {dist_dir}", file=sys.stderr)
+        sys.exit(1)
+
+    if args.dedup and current_os not in ("Linux", "Macos"):
+        print(f"ERROR: --dedup is only supported on Linux and Macos, not {current_os}", file=sys.stderr)
         sys.exit(1)
 
-    with open(conandata_path) as fh:
-        conandata = yaml.safe_load(fh)
+    entries = []
+    if not args.apply_plan or args.dedup:
+        conandata_path = Path(args.conandata)
+        if not conandata_path.exists():
+            print(f"ERROR: conandata.yml not found at {conandata_path}", file=sys.stderr)
+            sys.exit(1)
 
-    entries = conandata.get("pyinstaller", {}).get("blacklist", [])
-    if not entries:
+        conandata = load_yaml_file(conandata_path, keys=("pyinstaller.blacklist",))
+        entries = conandata.get("pyinstaller", {}).get("blacklist", [])
+
+    if args.apply_plan:
+        print(f"Applying plan {args.apply_plan} to {dist_dir} ...")
+        try:
+            plan = read_plan_json(Path(args.apply_plan), dist_dir)
+        except (OSError, ValueError, KeyError) as exc:
+            print(f"ERROR: Could not read plan {args.apply_plan}: {exc}", file=sys.stderr)
+            sys.exit(1)
+        removed = execute_plan(dist_dir, plan, args.jobs)
+        print(f"Done — removed {removed} item(s).")
+    elif not entries:
         print("No 'pyinstaller.blacklist' entries found in conandata.yml — nothing to do.")
+    elif args.plan_json:
+        print(f"Planning cleanup of {dist_dir} for {current_os} ...")
+        data = write_plan_json(Path(args.plan_json), dist_dir, entries, current_os)
+        print(f"Done — {len(data['removals'])} item(s) would free {data['total_bytes']} bytes; plan written to {args.plan_json}.")
         return
+    else:
+        print(f"Cleaning {dist_dir} for {current_os} ...")
+        removed = cleanup(dist_dir, entries, current_os, jobs=args.jobs)
+        print(f"Done — removed {removed} item(s).")
 
-    dist_dir = Path(args.dist_dir)
-    if not dist_dir.exists():
-        print(f"ERROR: Distribution directory not found: {dist_dir}", file=sys.stderr)
-        sys.exit(1)
-
-    print(f"Cleaning {dist_dir} for {current_os} ...")
-    removed = cleanup(dist_dir, entries, current_os)
-    print(f"Done — removed {removed} item(s).")
+    if args.dedup:
+        print(f"Linking duplicate files in {dist_dir} ({args.dedup}s) ...")
+        report = deduplicate(dist_dir, entries, mode=args.dedup, min_size=args.dedup_min_size)
+        for group in report["groups"]:
+            print(f"  Linked {len(group['duplicates'])} copy(ies) of {group['original']} ({group['size']} bytes)")
+        if args.dedup_report:
+            with open(args.dedup_report, "w") as fh:
+                json.dump(report, fh, indent=2)
+        print(f"Done — linked {report['linked_files']} file(s), saving {report['bytes_saved']} bytes.")
 
 
 if __name__ == "__main__":
@@ -3,59 +3,524 @@
 Conan Package Finder and Processor
 """
 
+import hashlib
 import json
+import os
 import sys
 import argparse
 import subprocess
 import re
-from typing import Dict, List, Tuple, Optional, Any
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Dict, Iterable, Iterator, List, Tuple, Optional, Any
 
-try:
-    from conan.tools.scm import Version
-except ImportError:
-    # Fallback for older Conan versions
-    try:
-        from conans.model.version import Version
-    except ImportError:
-        print("Error: Conan is not installed or version comparison tools are not available", file=sys.stderr)
-        sys.exit(1)
+
+DEFAULT_CACHE_DIR = os.path.join(os.environ.get("XDG_CACHE_HOME", os.path.join(os.path.expanduser("~"), ".cache")),
+                                 "cura-workflows", "conan-list")
+DEFAULT_CACHE_TTL = 300  # seconds, when the cache is enabled
+CONAN_API_MIN_VERSION = "2.0.0"
 
 
-def search_conan_packages(pattern: str) -> str:
+def run_conan_command(arguments: List[str], timeout: int = 120) -> Optional[str]:
     """
-    Execute conan list command to search for packages. Since conan API can change between versions,
-    we use subprocess to call the conan CLI directly for compatibility.
+    Run a conan CLI command and return its stdout, or None if it failed.
     
     Args:
-        pattern: Conan package pattern (e.g., "*/*@ultimaker/cura_12824")
+        arguments: Arguments following 'conan'
+        timeout: Timeout in seconds
         
     Returns:
-        Raw JSON output from conan list command (stdout only)
+        Stdout of the command (stderr contains logs/warnings), or None on failure
     """
     try:
         result = subprocess.run(
-            ['conan', 'list', pattern, '-r=*', '--format=json'],
+            ['conan'] + arguments,
             capture_output=True,
             text=True,
-            timeout=120,  # 2 minute timeout
+            timeout=timeout,
             check=True   # Raise CalledProcessError on non-zero exit
         )
-        
-        # Only return stdout for JSON parsing - stderr contains logs/warnings
-        # If there are important errors, they'll be in the exception handling
         return result.stdout
         
     except subprocess.TimeoutExpired:
-        print("Error: Conan list command timed out", file=sys.stderr)
-        return ""
+        print(f"Error: Conan {arguments[0]} command timed out", file=sys.stderr)
+        return None
     except subprocess.CalledProcessError as e:
-        print(f"Error: Conan list command failed with return code {e.returncode}", file=sys.stderr)
+        print(f"Error: Conan {arguments[0]} command failed with return code {e.returncode}", file=sys.stderr)
         print(f"Stdout: {e.stdout}", file=sys.stderr)
         print(f"Stderr: {e.stderr}", file=sys.stderr)
-        return ""
+        return None
     except FileNotFoundError:
         print("Error: 'conan' command not found. Make sure Conan is installed and in PATH", file=sys.stderr)
-        return ""
+        return None
+
+
+def list_result_references(list_result: Dict[str, Any]) -> List[str]:
+    """
+    Collect the references of a 'conan list' result, in the order of its remotes, reporting and
+    dropping remote errors and references with '+'.
+    
+    Args:
+        list_result: Parsed JSON output of 'conan list', or the serialized result of the Conan API
+        
+    Returns:
+        The references found
+    """
+    references = []
+    for remote_name, remote_data in list_result.items():
+        if isinstance(remote_data, dict) and "error" in remote_data:
+            print(f"Warning: Listing packages on remote '{remote_name}' failed: {remote_data['error']}", file=sys.stderr)
+            continue
+        references.extend(reference for reference in (remote_data or {}) if '+' not in reference)
+    return references
+
+
+class JsonStreamReader:
+    """
+    Minimal incremental JSON reader over a text stream, holding only the current chunk in memory.
+    It provides just what is needed to walk the outer levels of a document and skip the values
+    that are not needed, without ever building them.
+    """
+    _STRING = re.compile(r'"[^"\\]*(?:\\.[^"\\]*)*"')
+    # A string (closed, or running into the end of the buffer) or a bracket
+    _SKIP_TOKEN = re.compile(r'"[^"\\]*(?:\\.[^"\\]*)*(?P<closed>")?|[{}\[\]]')
+    _WHITESPACE = re.compile(r'\s*')
+    _SCALAR = re.compile(r'[^,}\]\s]*')
+    
+    def __init__(self, stream, chunk_size: int = 64 * 1024):
+        self._stream = stream
+        self._chunk_size = chunk_size
+        self._buffer = ""
+        self._pos = 0
+        self._eof = False
+    
+    def _fill(self) -> bool:
+        """Read the next chunk, dropping the consumed part of the buffer. Returns False at end of stream."""
+        if self._eof:
+            return False
+        chunk = self._stream.read(self._chunk_size)
+        if not chunk:
+            self._eof = True
+            return False
+        self._buffer = self._buffer[self._pos:] + chunk
+        self._pos = 0
+        return True
+    
+    def peek(self) -> str:
+        """Skip whitespace and return the next character without consuming it ('' at end of stream)."""
+        while True:
+            self._pos = self._WHITESPACE.match(self._buffer, self._pos).end()
+            if self._pos < len(self._buffer):
+                return self._buffer[self._pos]
+            if not self._fill():
+                return ""
+    
+    def expect(self, char: str) -> None:
+        found = self.peek()
+        if found != char:
+            raise ValueError(f"Expected '{char}' but found '{found or 'end of input'}'")
+        self._pos += 1
+    
+    def read_string(self) -> str:
+        found = self.peek()
+        if found != '"':
+            raise ValueError(f"Expected a string but found '{found or 'end of input'}'")
+        while True:
+            match = self._STRING.match(self._buffer, self._pos)
+            if match:
+                self._pos = match.end()
+                token = match.group(0)
+                return json.loads(token) if '\\' in token else token[1:-1]
+            if not self._fill():
+                raise ValueError("Unterminated string")
+    
+    def skip_value(self) -> None:
+        """Consume the next value (object, array, string or scalar) without decoding it."""
+        first = self.peek()
+        if first == "":
+            raise ValueError("Unexpected end of input")
+        if first not in '{["':
+            # Scalar: everything up to the next separator
+            while True:
+                self._pos = self._SCALAR.match(self._buffer, self._pos).end()
+                if self._pos < len(self._buffer) or not self._fill():
+                    return
+        
+        depth = 0
+        while True:
+            match = self._SKIP_TOKEN.search(self._buffer, self._pos)
+            if match is None:
+                self._pos = len(self._buffer)
+                if not self._fill():
+                    raise ValueError("Unexpected end of input")
+                continue
+            token = match.group(0)
+            if token[0] == '"':
+                if match.group("closed") is None:
+                    # The string continues in the next chunk
+                    self._pos = match.start()
+                    if not self._fill():
+                        raise ValueError("Unterminated string")
+                    continue
+                self._pos = match.end()
+                if depth == 0:
+                    return
+                continue
+            self._pos = match.end()
+            depth += 1 if token in "{[" else -1
+            if depth == 0:
+                return
+
+
+def iter_conan_list_references(stream) -> Iterator[Tuple[str, Optional[str]]]:
+    """
+    Stream the references out of 'conan list --format=json' output, one at a time.
+    
+    The revision and package metadata below the references is skipped without being parsed, and
+    references with '+' are dropped as they are read, so memory use doesn't grow with the output.
+    
+    Args:
+        stream: Text stream of the JSON output, e.g. the stdout pipe of the conan process
+        
+    Yields:
+        (remote_name, None) when the listing of a remote starts, then (remote_name, reference)
+        for each reference of that remote. Remote errors are reported on stderr and skipped.
+        
+    Raises:
+        ValueError: If the output is not a valid conan list document
+    """
+    reader = JsonStreamReader(stream)
+    if reader.peek() == "":
+        return
+    reader.expect('{')
+    while reader.peek() != '}':
+        remote_name = reader.read_string()
+        reader.expect(':')
+        if reader.peek() == '{':
+            reader.expect('{')
+            announced = False
+            failed = False
+            while reader.peek() != '}':
+                reference = reader.read_string()
+                reader.expect(':')
+                if reference == "error" and reader.peek() == '"':
+                    print(f"Warning: Listing packages on remote '{remote_name}' failed: {reader.read_string()}", file=sys.stderr)
+                    failed = True
+                else:
+                    reader.skip_value()
+                    if not announced:
+                        announced = True
+                        yield remote_name, None
+                    if '+' not in reference:
+                        yield remote_name, reference
+                if reader.peek() == ',':
+                    reader.expect(',')
+            reader.expect('}')
+            if not announced and not failed:
+                yield remote_name, None
+        else:
+            reader.skip_value()
+            yield remote_name, None
+        if reader.peek() == ',':
+            reader.expect(',')
+    reader.expect('}')
+
+
+def stream_conan_list(arguments: List[str], timeout: int = 120) -> Optional[List[str]]:
+    """
+    Run a 'conan list ... --format=json' command and stream its stdout through
+    iter_conan_list_references instead of capturing it. Only the reference strings are kept.
+    
+    Args:
+        arguments: Arguments following 'conan'
+        timeout: Timeout in seconds
+        
+    Returns:
+        The references found, as by list_result_references, or None on failure
+    """
+    # stderr goes to a temporary file, so a chatty conan can never block on a full pipe
+    with tempfile.TemporaryFile(mode="w+") as stderr_file:
+        try:
+            process = subprocess.Popen(['conan'] + arguments, stdout=subprocess.PIPE, stderr=stderr_file, text=True)
+        except FileNotFoundError:
+            print("Error: 'conan' command not found. Make sure Conan is installed and in PATH", file=sys.stderr)
+            return None
+        
+        timer = threading.Timer(timeout, process.kill)
+        timer.start()
+        references: List[str] = []
+        parse_error = None
+        try:
+            with process.stdout:
+                try:
+                    for _, reference in iter_conan_list_references(process.stdout):
+                        if reference is not None:
+                            references.append(reference)
+                except ValueError as e:
+                    parse_error = e
+                    # Drain the rest so the process can exit
+                    for _ in iter(lambda: process.stdout.read(64 * 1024), ""):
+                        pass
+            returncode = process.wait()
+        finally:
+            timed_out = not timer.is_alive()
+            timer.cancel()
+        
+        if timed_out:
+            print(f"Error: Conan {arguments[0]} command timed out", file=sys.stderr)
+            return None
+        if returncode != 0:
+            stderr_file.seek(0)
+            print(f"Error: Conan {arguments[0]} command failed with return code {returncode}", file=sys.stderr)
+            print(f"Stderr: {stderr_file.read()}", file=sys.stderr)
+            return None
+        if parse_error is not None:
+            print(f"Failed to parse conan list JSON output: {parse_error}", file=sys.stderr)
+            return None
+        return references
+
+
+class SubprocessConanBackend:
+    """
+    Lists packages through the conan CLI. Works with any Conan 2 version, but every call pays
+    Conan's startup and config load.
+    """
+    name = "subprocess"
+    concurrent = True
+    
+    def list_remotes(self) -> Optional[List[str]]:
+        """
+        Get the names of the enabled Conan remotes, or None if they could not be listed.
+        """
+        raw_output = run_conan_command(['remote', 'list', '--format=json'], timeout=60)
+        if raw_output is None:
+            return None
+        
+        try:
+            remotes = json.loads(raw_output)
+        except json.JSONDecodeError as e:
+            print(f"Failed to parse conan remote list JSON output: {e}", file=sys.stderr)
+            return None
+        
+        return [remote["name"] for remote in remotes if remote.get("enabled", True)]
+    
+    def list_packages(self, pattern: str, remote: str) -> Optional[List[str]]:
+        """
+        List the references matching pattern on a remote ('*' for all remotes), or None on failure.
+        """
+        remote_argument = '-r=*' if remote == '*' else f'-r={remote}'
+        return stream_conan_list(['list', pattern, remote_argument, '--format=json'], timeout=120)
+
+
+class ConanApiBackend:
+    """
+    Lists packages through Conan's Python API, in-process, so Conan's startup and config load are
+    paid once. Requires Conan >= CONAN_API_MIN_VERSION; the constructor raises ImportError otherwise.
+    """
+    name = "api"
+    # The Conan API is not documented to be thread-safe, so remotes are queried one after another
+    concurrent = False
+    
+    def __init__(self):
+        from conan import conan_version
+        if conan_version < CONAN_API_MIN_VERSION:
+            raise ImportError(f"Conan {conan_version} is older than {CONAN_API_MIN_VERSION}")
+        
+        from conan.api.conan_api import ConanAPI
+        from conan.api.model import ListPattern
+        
+        self._conan_api = ConanAPI()
+        self._list_pattern = ListPattern
+    
+    def list_remotes(self) -> Optional[List[str]]:
+        """
+        Get the names of the enabled Conan remotes, or None if they could not be listed.
+        """
+        try:
+            return [remote.name for remote in self._conan_api.remotes.list()]
+        except Exception as e:
+            print(f"Error: Could not list Conan remotes: {e}", file=sys.stderr)
+            return None
+    
+    def list_packages(self, pattern: str, remote: str) -> Optional[List[str]]:
+        """
+        List the references matching pattern on a remote ('*' for all remotes), or None on failure.
+        """
+        try:
+            # Same arguments as the 'conan list' command uses
+            remotes = self._conan_api.remotes.list(None if remote == '*' else [remote])
+            list_pattern = self._list_pattern(pattern, rrev=None, prev=None)
+        except Exception as e:
+            print(f"Error: Could not list packages on remote '{remote}': {e}", file=sys.stderr)
+            return None
+        
+        # Same as 'conan list': a failing remote is reported in the result instead of aborting the search
+        list_result = {}
+        for conan_remote in remotes:
+            try:
+                list_result[conan_remote.name] = self._conan_api.list.select(list_pattern, remote=conan_remote).serialize()
+            except Exception as e:
+                list_result[conan_remote.name] = {"error": str(e)}
+        return list_result_references(list_result)
+
+
+def get_conan_backend(name: str = "auto"):
+    """
+    Get the backend to query Conan with.
+    
+    Args:
+        name: "api", "subprocess", or "auto" to use the API when the installed Conan supports it
+        
+    Returns:
+        A ConanApiBackend or SubprocessConanBackend; requesting "api" falls back to the
+        subprocess backend (with a warning) when the API is not available
+    """
+    if name in ("auto", "api"):
+        try:
+            return ConanApiBackend()
+        except Exception as e:
+            print(f"{'Warning: ' if name == 'api' else ''}Conan API backend not available ({e}), "
+                  f"falling back to the conan CLI", file=sys.stderr)
+    return SubprocessConanBackend()
+
+
+def _cache_file(cache_dir: str, pattern: str, remote: str) -> str:
+    key = hashlib.sha256(f"{pattern}\n{remote}".encode()).hexdigest()
+    return os.path.join(cache_dir, f"{key}.json")
+
+
+def read_cached_list(cache_dir: str, pattern: str, remote: str, ttl: float) -> Optional[List[str]]:
+    """
+    Get the cached references of a 'conan list' for the pattern and remote, if they are younger than ttl seconds.
+    """
+    try:
+        with open(_cache_file(cache_dir, pattern, remote), "r") as f:
+            cached = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+    
+    if cached.get("pattern") != pattern or cached.get("remote") != remote:
+        return None
+    if time.time() - cached.get("created", 0) > ttl:
+        return None
+    return cached.get("references")
+
+
+def write_cached_list(cache_dir: str, pattern: str, remote: str, references: List[str]) -> None:
+    """
+    Store the references of a 'conan list' for the pattern and remote. Failures to write the cache are not fatal.
+    """
+    cache_file = _cache_file(cache_dir, pattern, remote)
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        # Write to a temporary file first so concurrent jobs never read a partial entry
+        temp_file = f"{cache_file}.{os.getpid()}.tmp"
+        with open(temp_file, "w") as f:
+            json.dump({"pattern": pattern, "remote": remote, "created": time.time(), "references": references}, f)
+        os.replace(temp_file, cache_file)
+    except OSError as e:
+        print(f"Warning: Could not write conan list cache {cache_file}: {e}", file=sys.stderr)
+
+
+def list_remote_packages(pattern: str, remotes: List[str], backend, use_cache: bool = False,
+                         cache_dir: str = DEFAULT_CACHE_DIR, cache_ttl: float = DEFAULT_CACHE_TTL,
+                         max_workers: Optional[int] = None) -> Iterator[Tuple[str, Optional[List[str]]]]:
+    """
+    List packages once per remote ('*' meaning all remotes in one call), going through the on-disk cache.
+    Remotes are queried concurrently when the backend allows it.
+    
+    Yields:
+        (remote name, its references or None on failure), in the order of remotes, each as soon as it
+        and the remotes before it are done
+    """
+    cached: Dict[str, List[str]] = {}
+    if use_cache:
+        for remote in remotes:
+            references = read_cached_list(cache_dir, pattern, remote, cache_ttl)
+            if references is not None:
+                print(f"Using cached conan list result for remote '{remote}'", file=sys.stderr)
+                cached[remote] = references
+    
+    missing = [remote for remote in remotes if remote not in cached]
+    workers = (max_workers or len(missing)) if backend.concurrent else 1
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+        listings = {remote: executor.submit(backend.list_packages, pattern, remote) for remote in missing}
+        for remote in remotes:
+            if remote in cached:
+                yield remote, cached.pop(remote)
+                continue
+            # Popped, so a remote's references are released once they are consumed
+            references = listings.pop(remote).result()
+            if references is not None and use_cache:
+                write_cached_list(cache_dir, pattern, remote, references)
+            yield remote, references
+
+
+def search_conan_packages(pattern: str, use_cache: bool = False, cache_dir: str = DEFAULT_CACHE_DIR,
+                          cache_ttl: float = DEFAULT_CACHE_TTL, max_workers: Optional[int] = None,
+                          backend=None) -> Iterator[str]:
+    """
+    Search the Conan remotes for packages, using the in-process Conan API when the installed Conan
+    supports it, and the conan CLI otherwise (see get_conan_backend).
+    
+    The remotes are queried one by one, concurrently for the CLI backend. With use_cache, each remote's
+    answer is cached on disk for cache_ttl seconds; it is off by default, since a cached answer misses
+    the packages uploaded in the meantime. If the remotes can't be listed, all remotes are searched in
+    a single call instead.
+    
+    Args:
+        pattern: Conan package pattern (e.g., "*/*@ultimaker/cura_12824")
+        use_cache: Whether to read and write the on-disk response cache
+        cache_dir: Directory of the response cache
+        cache_ttl: Maximum age in seconds of a cached response
+        max_workers: Maximum number of remotes queried at the same time (default: all of them)
+        backend: Backend to query Conan with (default: get_conan_backend())
+        
+    Yields:
+        The package references, without those with '+', in the order of the configured remotes;
+        a reference found on several remotes is yielded once
+    """
+    if backend is None:
+        backend = get_conan_backend()
+    
+    remotes = backend.list_remotes()
+    if remotes is None:
+        remotes = ['*']
+    elif not remotes:
+        print("Warning: No enabled Conan remotes configured", file=sys.stderr)
+        return
+    
+    seen = set()
+    for _, references in list_remote_packages(pattern, remotes, backend, use_cache, cache_dir, cache_ttl, max_workers):
+        for reference in references or ():
+            if reference not in seen:
+                seen.add(reference)
+                yield reference
+
+
+def compare_backends(pattern: str, runs: int = 3) -> Dict[str, Any]:
+    """
+    Time an uncached search for pattern with each available backend, including the backend's setup.
+    
+    Returns:
+        Dict of backend name to its wall times in seconds, or to the error that prevented running it
+    """
+    timings: Dict[str, Any] = {}
+    for backend_class in (SubprocessConanBackend, ConanApiBackend):
+        times = []
+        try:
+            for _ in range(runs):
+                start = time.perf_counter()
+                list(search_conan_packages(pattern, use_cache=False, backend=backend_class()))
+                times.append(round(time.perf_counter() - start, 3))
+        except Exception as e:
+            timings[backend_class.name] = {"error": str(e)}
+            continue
+        timings[backend_class.name] = {"runs": times, "min": min(times), "max": max(times)}
+    return timings
 
 
 def parse_conan_list_output(raw_output: str) -> List[str]:
@@ -155,9 +620,56 @@ def parse_package_reference(package_ref: str) -> Optional[Tuple[str, str]]:
     return None
 
 
+def _version_items_key(value: str) -> Tuple:
+    """
+    Key for the dot-separated items of a version: numeric items compare as numbers and sort before
+    textual items, and trailing zero items are ignored (so 1.0 == 1.0.0), as Conan does.
+    """
+    items = []
+    for item in value.split('.'):
+        try:
+            items.append((0, int(item)))
+        except ValueError:
+            items.append((1, item))
+    while items and items[-1] == (0, 0):
+        items.pop()
+    return tuple(items)
+
+
+@lru_cache(maxsize=None)
+def version_sort_key(version: str) -> Tuple:
+    """
+    Build a comparable key for a version string, following Conan's version ordering: the main items
+    first, then a pre-release ('-...') sorts before the same version without one, and a build
+    ('+...') sorts after the same version without one. Pre-release and build qualifiers are
+    compared item by item themselves.
+    
+    Unlike Conan's Version, the key defines a total order (numeric items always sort before textual
+    ones) and it never fails, so the selection is deterministic. The version string itself is the
+    final tie-breaker. Keys are cached, so each distinct version string is parsed once.
+    
+    Args:
+        version: Version string (e.g., "5.10.0-alpha.1+abc123")
+        
+    Returns:
+        Tuple usable as a sort key
+    """
+    value, separator, build = version.rpartition('+')
+    if not separator:
+        value, build = build, None
+    
+    value, separator, pre = value.partition('-')
+    if not separator:
+        pre = None
+    
+    pre_key = (1,) if pre is None else (0, _version_items_key(pre))
+    build_key = (0,) if build is None else (1, _version_items_key(build))
+    return _version_items_key(value), pre_key, build_key, version
+
+
 def deduplicate_packages(packages: List[str]) -> Tuple[List[str], Dict[str, List[str]]]:
     """
-    Deduplicate packages by selecting the highest version for each repository.
+    Deduplicate packages by selecting the highest version for each repository, in a single pass.
     
     Args:
         packages: List of package references
@@ -166,54 +678,30 @@ def deduplicate_packages(packages: List[str]) -> Tuple[List[str], Dict[str, List
         Tuple of (deduplicated_packages, version_selections)
         where version_selections maps package_name to list of all versions found
     """
-    package_map: Dict[str, List[Tuple[str, str]]] = {}  # package_name -> [(full_ref, version), ...]
+    highest: Dict[str, Tuple[Tuple, str]] = {}  # package_name -> (version key, full_ref)
     version_selections: Dict[str, List[str]] = {}
     
-    # Group packages by name
     for pkg_ref in packages:
         parsed = parse_package_reference(pkg_ref)
         if not parsed:
             continue
-            
+        
         package_name, version = parsed
+        key = version_sort_key(version)
         
-        if package_name not in package_map:
-            package_map[package_name] = []
+        if package_name not in highest:
+            highest[package_name] = (key, pkg_ref)
             version_selections[package_name] = []
-            
-        package_map[package_name].append((pkg_ref, version))
+        elif key > highest[package_name][0]:
+            highest[package_name] = (key, pkg_ref)
+        
         version_selections[package_name].append(version)
     
-    # Select highest version for each package
     deduplicated = []
-    
-    for package_name, refs_and_versions in package_map.items():
-        if len(refs_and_versions) == 1:
-            # Only one version, keep it
-            deduplicated.append(refs_and_versions[0][0])
-        else:
-            # Multiple versions, select the highest
-            highest_ref = None
-            highest_version = None
-            
-            for pkg_ref, version in refs_and_versions:
-                try:
-                    current_version = Version(version)
-                    
-                    if highest_version is None or current_version > highest_version:
-                        highest_version = current_version
-                        highest_ref = pkg_ref
-                        
-                except Exception as e:
-                    print(f"Warning: Could not parse version '{version}' for package '{package_name}': {e}", file=sys.stderr)
-                    # If version parsing fails, fall back to string comparison
-                    if highest_version is None or version > str(highest_version):
-                        highest_version = version
-                        highest_ref = pkg_ref
-            
-            if highest_ref:
-                deduplicated.append(highest_ref)
-                print(f"Selected highest version for {package_name}: {highest_version} from {len(refs_and_versions)} options", file=sys.stderr)
+    for package_name, (key, pkg_ref) in highest.items():
+        deduplicated.append(pkg_ref)
+        if len(version_selections[package_name]) > 1:
+            print(f"Selected highest version for {package_name}: {key[-1]} from {len(version_selections[package_name])} options", file=sys.stderr)
     
     return deduplicated, version_selections
 
@@ -240,10 +728,89 @@ def categorize_packages(packages: List[str]) -> Tuple[str, List[str]]:
     return cura_package, override_packages
 
 
-def main():
+def summarize_packages(discovered_packages: List[str]) -> Dict[str, Any]:
+    """
+    Deduplicate and categorize discovered packages into the JSON result document.
+    
+    Args:
+        discovered_packages: List of package references
+        
+    Returns:
+        Dict with the discovered, deduplicated, cura and override packages, and the version selections
+    """
+    deduplicated, version_info = deduplicate_packages(discovered_packages)
+    cura_package, override_packages = categorize_packages(deduplicated)
+    
+    return {
+        "discovered_packages": discovered_packages,
+        "deduplicated_packages": deduplicated,
+        "cura_package": cura_package,
+        "override_packages": override_packages,
+        "version_selections": version_info,
+        "original_count": len(discovered_packages),
+        "deduplicated_count": len(deduplicated)
+    }
+
+
+def load_jira_tickets(value: str) -> List[str]:
+    """
+    Read a list of Jira tickets from a file or a JSON array.
+    
+    Args:
+        value: Path of a file containing a JSON array or whitespace/comma separated tickets,
+               or a JSON array of tickets
+        
+    Returns:
+        List of (not yet normalized) tickets
+        
+    Raises:
+        ValueError: If the value is neither a readable file nor a JSON array of strings
+    """
+    if os.path.isfile(value):
+        with open(value, "r") as f:
+            content = f.read()
+        try:
+            tickets = json.loads(content)
+        except json.JSONDecodeError:
+            tickets = [ticket for ticket in re.split(r'[\s,]+', content) if ticket]
+    else:
+        try:
+            tickets = json.loads(value)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"Jira tickets must be a file or a JSON array: {e}")
+    
+    if not isinstance(tickets, list) or not all(isinstance(ticket, (str, int)) for ticket in tickets):
+        raise ValueError("Jira tickets must be a JSON array of strings")
+    return [str(ticket) for ticket in tickets]
+
+
+def bucket_packages_by_ticket(packages: Iterable[str], tickets: List[str]) -> Dict[str, List[str]]:
+    """
+    Group package references by the Jira ticket in their channel ("name/version@user/<ticket>").
+    
+    Args:
+        packages: Package references, e.g. streamed from search_conan_packages
+        tickets: Normalized tickets to collect packages for
+        
+    Returns:
+        Dict of each ticket (in the given order) to its package references; references of other
+        channels are dropped
+    """
+    buckets: Dict[str, List[str]] = {ticket: [] for ticket in tickets}
+    for pkg_ref in packages:
+        _, _, user_channel = pkg_ref.partition('@')
+        channel = user_channel.partition('/')[2].split('#')[0].lower()
+        if channel in buckets:
+            buckets[channel].append(pkg_ref)
+    return buckets
+
+
+def main(argv: Optional[List[str]] = None):
     parser = argparse.ArgumentParser(description="Search and process Conan packages")
     parser.add_argument("--search-pattern", help="Conan package search pattern (e.g., '*/*@ultimaker/cura_12824')")
     parser.add_argument("--jira-ticket", help="Jira ticket number for search pattern generation and summary")
+    parser.add_argument("--jira-tickets", help="File or JSON array of Jira tickets, searched with a single query per remote; "
+                                               "outputs one JSON document keyed by ticket")
     parser.add_argument("--channel", default="ultimaker", help="Conan channel to search in (default: ultimaker)")
     parser.add_argument("--validate-input", type=lambda x: x.lower() in ['true', '1', 'yes'], default=True, 
                        help="Whether to validate the input Jira ticket number format")
@@ -253,8 +820,21 @@ def main():
                        help="Output format")
     parser.add_argument("--summary-output", type=str, help="Path of output file to write summary, otherwise print to stdout")
     parser.add_argument("--actions-output", type=str, help="Path of output file to write GitHub Actions outputs, otherwise print to stdout")
+    cache = parser.add_mutually_exclusive_group()
+    cache.add_argument("--cache", dest="use_cache", action="store_true", default=False,
+                       help="Reuse conan list results of up to --cache-ttl seconds old from an on-disk cache, e.g. for the jobs "
+                            "of one matrix; off by default, since a cached result misses the packages uploaded since")
+    cache.add_argument("--no-cache", dest="use_cache", action="store_false", help="Don't use the on-disk cache (default)")
+    parser.add_argument("--cache-dir", default=DEFAULT_CACHE_DIR, help=f"Directory of the conan list cache (default: {DEFAULT_CACHE_DIR})")
+    parser.add_argument("--cache-ttl", type=float, default=DEFAULT_CACHE_TTL,
+                       help=f"Maximum age in seconds of cached conan list results (default: {DEFAULT_CACHE_TTL})")
+    parser.add_argument("--max-workers", type=int, help="Maximum number of remotes queried concurrently (default: all)")
+    parser.add_argument("--backend", choices=["auto", "api", "subprocess"], default="auto",
+                       help="Query Conan in-process through its API, or through the conan CLI (default: auto, the API when supported)")
+    parser.add_argument("--compare-backends", action="store_true",
+                       help="Time an uncached search for the search pattern with each backend, print the timings as JSON and exit")
     
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
     
     # Handle Jira ticket validation and pattern generation if needed
     if args.jira_ticket and args.search_pattern:
@@ -275,11 +855,47 @@ def main():
             print(f"Error: {e}", file=sys.stderr)
             sys.exit(1)
     
+    if args.jira_tickets:
+        if args.output_format != "json":
+            print("Error: --jira-tickets only supports the json output format", file=sys.stderr)
+            sys.exit(1)
+        try:
+            tickets = load_jira_tickets(args.jira_tickets)
+            if args.validate_input:
+                normalized_tickets = [validate_and_normalize_jira_ticket(ticket) for ticket in tickets]
+            else:
+                normalized_tickets = [ticket.lower() for ticket in tickets]
+        except (OSError, ValueError) as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(1)
+        normalized_tickets = list(dict.fromkeys(normalized_tickets))  # Drop duplicates, keep the order
+        
+        # One wildcard query for all tickets, bucketed per ticket afterwards
+        pattern = f"*/*@{args.channel}/*"
+        print(f"Searching for packages of {len(normalized_tickets)} tickets with pattern: {pattern}", file=sys.stderr)
+        # The references of other tickets are dropped as they are streamed in
+        references = search_conan_packages(pattern, use_cache=args.use_cache, cache_dir=args.cache_dir,
+                                           cache_ttl=args.cache_ttl, max_workers=args.max_workers,
+                                           backend=get_conan_backend(args.backend))
+        buckets = bucket_packages_by_ticket(references, normalized_tickets)
+        result = {ticket: summarize_packages(packages) for ticket, packages in buckets.items()}
+        print(json.dumps(result, indent=2))
+        return
+    
+    if args.compare_backends:
+        if not args.search_pattern:
+            print("Error: --compare-backends needs --search-pattern or --jira-ticket", file=sys.stderr)
+            sys.exit(1)
+        print(json.dumps(compare_backends(args.search_pattern), indent=2))
+        return
+    
     if args.search_pattern:
         # Execute conan search and process results
         print(f"Searching for packages with pattern: {args.search_pattern}", file=sys.stderr)
-        raw_output = search_conan_packages(args.search_pattern)
-        discovered_packages = parse_conan_list_output(raw_output)
+        discovered_packages = list(search_conan_packages(args.search_pattern, use_cache=args.use_cache,
+                                                         cache_dir=args.cache_dir, cache_ttl=args.cache_ttl,
+                                                         max_workers=args.max_workers,
+                                                         backend=get_conan_backend(args.backend)))
     elif args.raw_output:
         # Process raw conan list output
         discovered_packages = parse_conan_list_output(args.raw_output)
@@ -296,22 +912,13 @@ def main():
         print("Error: Must provide one of --search-pattern, --raw-output, or --packages", file=sys.stderr)
         sys.exit(1)
     
-    # Deduplicate packages
-    deduplicated, version_info = deduplicate_packages(discovered_packages)
-    
-    # Categorize packages
-    cura_package, override_packages = categorize_packages(deduplicated)
+    # Deduplicate and categorize packages
+    result = summarize_packages(discovered_packages)
+    deduplicated = result["deduplicated_packages"]
+    cura_package = result["cura_package"]
+    override_packages = result["override_packages"]
     
     if args.output_format == "json":
-        result = {
-            "discovered_packages": discovered_packages,
-            "deduplicated_packages": deduplicated,
-            "cura_package": cura_package,
-            "override_packages": override_packages,
-            "version_selections": version_info,
-            "original_count": len(discovered_packages),
-            "deduplicated_count": len(deduplicated)
-        }
         print(json.dumps(result, indent=2))
         
     elif args.output_format == "github-actions":
@@ -1,17 +1,17 @@
 import argparse
 import os
-import yaml
 import sys
 import re
 
-def get_conan_broadcast_data(args):
+from yaml_loader import load_yaml_file
+
+
+def conan_broadcast_data(args):
     if args.version is not None and args.version != "":
         version = args.version
     else:
         if os.path.exists("conandata.yml"):
-            with open("conandata.yml", "r") as f:
-                conan_data = yaml.safe_load(f)
-                version = conan_data["version"]
+            version = load_yaml_file("conandata.yml", keys=("version",))["version"]
         else:
             raise ValueError("Version should be specified either via argument or conandata.yml")
 
@@ -53,12 +53,19 @@ def get_conan_broadcast_data(args):
         "channel": channel,
         "user": user,
     }
+    return data
+
+
+def get_conan_broadcast_data(args):
+    data = conan_broadcast_data(args)
 
     version_output = sys.stdout
     if args.version_output is not None:
         version_output = open(args.version_output, "a")
     for key, value in data.items():
         version_output.write(f"{key}={value}\n")
+    if args.version_output is not None:
+        version_output.close()
 
     summary_output = sys.stdout
     if args.summary_output is not None:
@@ -73,9 +80,11 @@ def get_conan_broadcast_data(args):
         else:
             summary_output.write(f"**{key}**\n")
             summary_output.write(f"```\n{value}\n```\n")
+    if args.summary_output is not None:
+        summary_output.close()
 
 
-if __name__ == "__main__":
+def main(argv = None):
     parser = argparse.ArgumentParser(description = 'Get Conan broadcast data')
     parser.add_argument('--package_name',   type = str, help = 'Name of the package', required=True)
     parser.add_argument('--release',        action='store_true', help = 'Is a release')
@@ -88,5 +97,9 @@ if __name__ == "__main__":
     parser.add_argument('--version-output', type = str, help = 'Path of output file to write versions, otherwise print to stdout')
     parser.add_argument('--summary-output', type = str, help = 'Path of output file to write summary, otherwise print to stdout')
 
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
     get_conan_broadcast_data(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,31 +1,373 @@
 import argparse
+import fnmatch
 import json
+import os
+import sys
 
+# Platform -> the matrix entry building it, and the host settings to compute its dependency graph with locally. The
+# settings only approximate the runner's own profiles; the workflows compute the graph on the runner itself instead.
+PLATFORMS = {
+    "linux": ({"platform": "linux", "runner": "ubuntu-latest", "conan_extra_args": ""}, []),
+    "windows": ({"platform": "windows", "runner": "windows-latest", "conan_extra_args": ""},
+                ["-s:h", "os=Windows", "-s:h", "arch=x86_64", "-s:h", "compiler=msvc", "-s:h", "compiler.version=194",
+                 "-s:h", "compiler.runtime=dynamic", "-s:h", "compiler.cppstd=17"]),
+    "mac": ({"platform": "mac", "runner": "macos-13", "conan_extra_args": ""},
+            ["-s:h", "os=Macos", "-s:h", "arch=x86_64", "-s:h", "compiler=apple-clang", "-s:h", "compiler.version=15",
+             "-s:h", "compiler.libcxx=libc++", "-s:h", "compiler.cppstd=17"]),
+    "windows-arm64": ({"platform": "windows-arm64", "runner": "windows-latest-arm64", "conan_extra_args": ""},
+                      ["-s:h", "os=Windows", "-s:h", "arch=armv8", "-s:h", "compiler=msvc", "-s:h", "compiler.version=194",
+                       "-s:h", "compiler.runtime=dynamic", "-s:h", "compiler.cppstd=17"]),
+    "wasm": ({"platform": "wasm", "runner": "ubuntu-latest", "conan_extra_args": "-pr:h cura_wasm.jinja"},
+             ["-pr:h", "cura_wasm.jinja"]),
+}
+
+# Changed files that never affect a build
+DEFAULT_IGNORED_FILES = ["*.md", "LICENSE", ".github/ISSUE_TEMPLATE/*"]
+
+# Conan numbers the nodes of a graph from the conanfile it was computed for
+ROOT_NODE = "0"
+
+
+def selected_platforms(args):
+    return [platform for platform in PLATFORMS if getattr(args, f"platform_{platform.replace('-', '_')}")]
+
+
+def runners_data(args):
+    runners_list = [dict(PLATFORMS[platform][0]) for platform in selected_platforms(args)]
+    return {"include": runners_list}
+
+
+def read_changed_files(path):
+    # One path per line, relative to the repository root, like the output of `git diff --name-only`
+    if path == "-":
+        lines = sys.stdin.read().splitlines()
+    else:
+        with open(path, "r") as f:
+            lines = f.read().splitlines()
+    return [line.strip().replace("\\", "/") for line in lines if line.strip()]
+
+
+def shard_count(value):
+    # PLATFORM=N or N, like the other per platform values, with at least one shard
+    platform, separator, count = value.rpartition("=")
+    if separator and platform not in PLATFORMS:
+        raise argparse.ArgumentTypeError(f"unknown platform '{platform}', expected one of {', '.join(PLATFORMS)}")
+    try:
+        valid = int(count) >= 1
+    except ValueError:
+        valid = False
+    if not valid:
+        raise argparse.ArgumentTypeError(f"'{value}' is not a number of shards of 1 or more")
+    return value
+
+
+def parse_platform_values(values, platforms):
+    # Each value is either PLATFORM=VALUE, or a VALUE used for every platform without its own
+    platform_values = {}
+    default = None
+    for value in values or []:
+        platform, separator, platform_value = value.partition("=")
+        if separator and platform in PLATFORMS:
+            platform_values[platform] = platform_value
+        else:
+            default = value
+    return {platform: platform_values.get(platform, default) for platform in platforms
+            if platform_values.get(platform, default) is not None}
+
+
+def load_graph(path):
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def compute_graph(conanfile, platform):
+    import subprocess  # only this mode runs a process, the plain matrix is on the startup budget
+    # The graph only needs the recipes; with everything marked as built no remote is asked for binaries
+    command = ["conan", "graph", "info", conanfile, "--format=json", "--build=*"] + PLATFORMS[platform][1]
+    result = subprocess.run(command, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"Computing the dependency graph for {platform} failed:\n{result.stderr[-2000:]}")
+    return json.loads(result.stdout)
+
+
+def graph_nodes(graph):
+    """Returns {node id: (name, reference without revision, recipe folder, ids of its dependencies, context)}, the
+    context being "host", or "build" for tool requires and their dependencies"""
+    graph = graph.get("graph", graph)
+    if graph.get("error"):
+        raise ValueError(f"The dependency graph has an error: {graph['error']}")
+    nodes = {}
+    for node_id, node in graph["nodes"].items():
+        reference = (node.get("ref") or node.get("label") or "").split("#")[0]
+        name = node.get("name") or reference.split("/")[0]
+        nodes[node_id] = (name, reference, node.get("recipe_folder"), list(node.get("dependencies", {})),
+                          node.get("context", "host"))
+    return nodes
+
+
+def recipe_package(path, repo_root):
+    # A recipe folder of a package that is not in the graph, in the <package>/config.yml layout of the recipe repos
+    parts = path.split("/")[:-1]
+    while parts:
+        if os.path.isfile(os.path.join(repo_root, *parts, "config.yml")):
+            return parts[-1]
+        parts.pop()
+    return None
+
+
+def changed_nodes(nodes, files, repo_root, package_names):
+    """Returns (ids of the nodes whose recipe changed, the files that can't be attributed to a package), package_names
+    being the packages in the graphs of all platforms"""
+    # Recipes inside the repository, like the consumer conanfile.py, by their folder relative to the root
+    folders = {}
+    for node_id, (name, reference, recipe_folder, dependencies, context) in nodes.items():
+        if recipe_folder:
+            relative = os.path.relpath(os.path.abspath(recipe_folder), os.path.abspath(repo_root)).replace("\\", "/")
+            if not relative.startswith(".."):
+                folders.setdefault("" if relative == "." else relative + "/", []).append(node_id)
+    by_name = {}
+    for node_id, (name, reference, recipe_folder, dependencies, context) in nodes.items():
+        by_name.setdefault(name, []).append(node_id)
+
+    changed = set()
+    unattributed = []
+    for file in files:
+        matching_folders = [folder for folder in folders if file.startswith(folder)]
+        folder = max(matching_folders, key=len) if matching_folders else ""
+        # The closest folder named after a package in the graph, like recipes/<name>/all/conanfile.py, is more specific
+        # than a recipe folder holding it, like the root of a repository with a conanfile.py
+        names = [part for part in reversed(file[len(folder):].split("/")[:-1]) if part in package_names]
+        if names:
+            changed.update(by_name.get(names[0], []))
+        elif recipe_package(file, repo_root) is not None:
+            continue  # a recipe that isn't part of this graph
+        elif matching_folders:
+            changed.update(folders[folder])
+        else:
+            unattributed.append(file)
+    return changed, unattributed
+
+
+def affected_nodes(nodes, changed):
+    # Everything depending on a changed recipe, directly or transitively, is affected as well
+    dependents = {}
+    for node_id, (name, reference, recipe_folder, dependencies, context) in nodes.items():
+        for dependency in dependencies:
+            dependents.setdefault(dependency, []).append(node_id)
+    affected = set()
+    pending = list(changed)
+    while pending:
+        node_id = pending.pop()
+        if node_id in affected:
+            continue
+        affected.add(node_id)
+        pending.extend(dependents.get(node_id, []))
+    return affected
+
+
+def load_timings(path):
+    """Reads the build durations in seconds from a JSON or CSV timing store, as {platform: {package: [durations]}} with
+    "*" for the durations of all platforms. Packages are a name or a name/version.
+
+    JSON: {"windows": {"curaengine": [1810, 1750]}, "*": {"zlib": 25}}, or just {"zlib": 25} for all platforms
+    CSV: a header with the columns package and duration, and optionally platform, then a row per build"""
+    timings = {}
+    with open(path, "r", newline="") as f:
+        if path.endswith(".csv"):
+            import csv
+            for row in csv.DictReader(f):
+                platform = (row.get("platform") or "").strip() or "*"
+                timings.setdefault(platform, {}).setdefault(row["package"].strip(), []).append(float(row["duration"]))
+            return timings
+        data = json.load(f)
+    for key, value in data.items():
+        platform, durations = (key, value) if isinstance(value, dict) else ("*", {key: value})
+        for package, duration in durations.items():
+            timings.setdefault(platform, {}).setdefault(package, []).extend(
+                duration if isinstance(duration, list) else [duration])
+    return timings
+
+
+def expected_durations(timings, platform, packages):
+    """Returns {package reference: expected build duration in seconds}, the median of its recorded builds. Packages
+    without any get the median of the others, so a new package counts as an average one."""
+    import statistics
+    durations = {}
+    for reference in packages:
+        for table in (timings.get(platform, {}), timings.get("*", {})):
+            recorded = table.get(reference) or table.get(reference.split("/")[0])
+            if recorded:
+                durations[reference] = statistics.median(recorded)
+                break
+    default = statistics.median(durations.values()) if durations else 1.0
+    return {reference: durations.get(reference, default) for reference in packages}
+
+
+def dependency_stages(nodes, affected):
+    """Splits the affected packages, except the root conanfile itself, into the shared packages and the independent
+    subtrees above them. The top packages are those no other affected package requires; a package required by more
+    than one of them, directly or transitively, is shared, every other package is in the subtree of the single top
+    package requiring it. A subtree only requires its own packages and shared ones, so once the shared packages are
+    built the subtrees can build in parallel without building anything twice.
+
+    Returns (shared packages, [packages of each subtree]), as sorted lists of (reference, context)"""
+    members = {node_id for node_id in affected if node_id != ROOT_NODE and nodes[node_id][1]}
+    # Conan lists the transitive dependencies of a node, but not those of its tool requires, which are in the build context
+    requires = {node_id: {dependency for dependency in nodes[node_id][3] if dependency in members} for node_id in members}
+    required = set().union(*requires.values())
+    owners = {node_id: set() for node_id in members}
+    for top in members - required:
+        pending = [top]
+        while pending:
+            node_id = pending.pop()
+            if top not in owners[node_id]:
+                owners[node_id].add(top)
+                pending.extend(requires[node_id])
+
+    def package(node_id):
+        return nodes[node_id][1], nodes[node_id][4]
+
+    shared = sorted({package(node_id) for node_id in members if len(owners[node_id]) > 1})
+    subtrees = {}
+    for node_id in members:
+        if len(owners[node_id]) == 1:
+            subtrees.setdefault(next(iter(owners[node_id])), set()).add(package(node_id))
+    # A package in the subtree of one top package and shared by others (a reference can have several nodes) is built once
+    return shared, sorted(sorted(subtree - set(shared)) for subtree in subtrees.values() if subtree - set(shared))
+
+
+def shard_packages(groups, durations, count):
+    """Splits the groups of packages into at most `count` shards with about the same total duration, by giving the
+    longest remaining group to the shard that finishes first (longest processing time first). A group is never split.
+    Returns [(duration, packages)]"""
+    import heapq
+    group_durations = [(sum(durations[reference] for reference, context in group), group) for group in groups]
+    shards = [(0.0, index, []) for index in range(min(count, len(groups)))]
+    for duration, group in sorted(group_durations, key=lambda item: (-item[0], item[1])):
+        total, index, packages = heapq.heappop(shards)
+        packages.extend(group)
+        heapq.heappush(shards, (total + duration, index, packages))
+    return [(total, sorted(packages)) for total, index, packages in sorted(shards, key=lambda shard: shard[1])]
+
+
+def stage_entry(entry, stage, packages, **values):
+    # The host packages are built as requires, the build context ones as tool requires, with the runner's build profile
+    return dict(entry, stage=stage, packages=[reference for reference, context in packages if context != "build"],
+                tool_packages=[reference for reference, context in packages if context == "build"], **values)
+
+
+def shard_runners_data(runners_list, platforms, platform_stages, args):
+    """Splits the dependencies to build of every platform into stages: the shared packages in a single job of stage 0,
+    then the independent subtrees above them in shards of stage 1, each with a shard_index, the shard_count and the
+    packages it builds. The shards only pull the shared packages, they never build each other's; the root conanfile
+    is left to the build that runs after them. The longest shards come first, so they are started first."""
+    shard_counts = parse_platform_values(args.shards, platforms)
+    timings = load_timings(args.timings) if args.timings else {}
+    sharded = []
+    for platform, entry in zip(platforms, runners_list):
+        shared, subtrees = platform_stages[platform]
+        if not shared and not subtrees:
+            print(f"{platform}: no dependencies to build before the root, no shards", file=sys.stderr)
+            continue
+        durations = expected_durations(timings, platform, sorted({reference for reference, context in
+                                                                  shared + [package for subtree in subtrees for package in subtree]}))
+        shared_duration = sum(durations[reference] for reference, context in shared)
+        if shared:
+            sharded.append(stage_entry(entry, 0, shared, shard_index=0, shard_count=1, expected_duration=round(shared_duration, 1)))
+        shards = shard_packages(subtrees, durations, int(shard_counts.get(platform, 1))) if subtrees else []
+        for index, (duration, packages) in enumerate(shards):
+            sharded.append(stage_entry(entry, 1, packages, shard_index=index, shard_count=len(shards),
+                                       expected_duration=round(duration, 1)))
+        longest = max((duration for duration, packages in shards), default=0.0)
+        total = sum(durations[reference] for subtree in subtrees for reference, context in subtree)
+        print(f"{platform}: {len(shared)} shared packages, then {len(subtrees)} subtree(s) in {len(shards)} shard(s), "
+              f"{shared_duration:.0f}s + {longest:.0f}s instead of {shared_duration + total:.0f}s", file=sys.stderr)
+    return sorted(sharded, key=lambda entry: (entry["stage"], -entry["expected_duration"]))
+
+
+def affected_runners_data(args):
+    """The matrix of the selected platforms whose dependency graph is affected by the changed files, or the whole
+    graph without them, with per entry the packages to build"""
+    platforms = selected_platforms(args)
+    ignored = args.ignore if args.ignore is not None else DEFAULT_IGNORED_FILES
+    files = None
+    if args.changed_files is not None:
+        files = [file for file in read_changed_files(args.changed_files)
+                 if not any(fnmatch.fnmatch(file, pattern) for pattern in ignored)]
+
+    graph_files = parse_platform_values(args.graph_json, platforms)
+    missing = [platform for platform in platforms if platform not in graph_files]
+    if missing and args.conanfile is None:
+        raise ValueError(f"No dependency graph for {', '.join(missing)}, pass --graph-json or --conanfile")
+    graphs = {platform: load_graph(path) for platform, path in graph_files.items()}
+    if missing:
+        from concurrent.futures import ThreadPoolExecutor
+        # Every graph takes a Conan process of a few seconds, mostly waiting on the remotes
+        with ThreadPoolExecutor(max_workers=len(missing)) as executor:
+            graphs.update(zip(missing, executor.map(lambda platform: compute_graph(args.conanfile, platform), missing)))
+
+    platform_nodes = {platform: graph_nodes(graphs[platform]) for platform in platforms}
+    package_names = {node[0] for nodes in platform_nodes.values() for node in nodes.values()}
 
-def make_runners_list(args):
     runners_list = []
+    entry_platforms = []
+    platform_stages = {}
+    for platform in platforms:
+        nodes = platform_nodes[platform]
+        changed, unattributed = changed_nodes(nodes, files or [], args.repo_root, package_names)
+        if files is None:
+            affected = set(nodes)
+        elif unattributed:
+            # A change we can't place, like a shared profile or workflow, could affect anything
+            print(f"{platform}: building everything, {unattributed[0]} can't be attributed to a package", file=sys.stderr)
+            affected = set(nodes)
+        else:
+            affected = affected_nodes(nodes, changed)
+        if not affected:
+            print(f"{platform}: not affected by the changed files, skipped", file=sys.stderr)
+            continue
+        entry = dict(PLATFORMS[platform][0])
+        entry["packages"] = sorted({nodes[node_id][1] for node_id in affected})
+        runners_list.append(entry)
+        entry_platforms.append(platform)
+        platform_stages[platform] = dependency_stages(nodes, affected)
 
-    if args.platform_linux:
-        runners_list.append({"runner": "ubuntu-latest", "conan_extra_args": ""})
-    if args.platform_windows:
-        runners_list.append({"runner": "windows-latest", "conan_extra_args": ""})
-    if args.platform_mac:
-        runners_list.append({"runner": "macos-13", "conan_extra_args": ""})
-    if args.platform_windows_arm64:
-        runners_list.append({"runner": "windows-latest-arm64", "conan_extra_args": ""})
-    if args.platform_wasm:
-        runners_list.append({"runner": "ubuntu-latest", "conan_extra_args": "-pr:h cura_wasm.jinja"})
+    if args.shards is not None:
+        runners_list = shard_runners_data(runners_list, entry_platforms, platform_stages, args)
+    return {"include": runners_list}
 
-    runners_data = {"include": runners_list}
-    print(json.dumps(runners_data))
 
+def make_runners_list(args):
+    if args.changed_files is None and args.graph_json is None and args.conanfile is None:
+        if args.shards is not None:
+            print("Error: --shards needs the packages to build, pass --changed-files, --graph-json or --conanfile", file=sys.stderr)
+            sys.exit(2)
+        print(json.dumps(runners_data(args)))
+        return
+    try:
+        print(json.dumps(affected_runners_data(args)))
+    except (OSError, ValueError, RuntimeError) as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
 
-if __name__ == "__main__":
+
+def main(argv = None):
     parser = argparse.ArgumentParser(description = 'Build the runners and conan options list to be processed')
     parser.add_argument('--platform-linux',   action='store_true', help = 'Build on classic Linux runner')
     parser.add_argument('--platform-windows', action='store_true', help = 'Build on Windows runner')
     parser.add_argument('--platform-mac',     action='store_true', help = 'Build on MacOS runner(s)')
     parser.add_argument('--platform-wasm',    action='store_true', help = 'Build for WASM platform (Linux runner with options)')
     parser.add_argument('--platform-windows-arm64', action='store_true', help='Build on Windows ARM64 runner')
-    args = parser.parse_args()
+    parser.add_argument('--changed-files', type=str, help = 'Only keep the platforms affected by the files listed in this file (one per line, - for stdin), and list the packages each has to build')
+    parser.add_argument('--graph-json', action='append', help = 'Saved `conan graph info --format=json` output, as PLATFORM=PATH or a PATH for all platforms (repeatable)')
+    parser.add_argument('--conanfile', type=str, help = 'Compute the graph of the platforms without --graph-json from this conanfile with `conan graph info` and approximate settings; pass the graphs computed on the runners for exact ones')
+    parser.add_argument('--repo-root', type=str, default='.', help = 'Root the changed files are relative to (default: current directory)')
+    parser.add_argument('--ignore', action='append', help = f'Pattern of changed files that never affect a build (repeatable, default: {" ".join(DEFAULT_IGNORED_FILES)})')
+    parser.add_argument('--shards', action='append', type=shard_count, help = 'Split the dependencies to build of each platform into a job for the shared dependencies (stage 0), then at most this many jobs of about the same duration for the subtrees above them (stage 1), as PLATFORM=N or an N for all platforms (repeatable)')
+    parser.add_argument('--timings', type=str, help = 'JSON or CSV timing store with the build duration per package, to balance the shards with')
+    args = parser.parse_args(argv)
     make_runners_list(args)
+
+
+if __name__ == "__main__":
+    main()
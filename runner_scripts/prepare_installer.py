@@ -2,10 +2,11 @@ import argparse
 import os
 import sys
 
-from cura import CuraVersion
 
+def installer_data(args):
+    # Imported here, so the other runner scripts can import this one without Cura being installed
+    from cura import CuraVersion
 
-def set_installer_filename(args):
     os_name = {"Linux": "linux", "Windows": "win64", "macOS": "macos"}.get(args.os)
     enterprise = "-Enterprise" if args.enterprise == "true" else ""
     internal = "-Internal" if args.internal == "true" else ""
@@ -19,28 +20,46 @@ def set_installer_filename(args):
     installer_filename_args.append(args.architecture)
     installer_filename = "-".join(installer_filename_args)
 
+    return {
+        "variables": {
+            "INSTALLER_FILENAME": installer_filename,
+            "CURA_VERSION": CuraVersion.CuraVersion,
+            "CURA_VERSION_FULL": CuraVersion.CuraVersionFull,
+            "CURA_APP_NAME": CuraVersion.CuraAppDisplayName,
+        },
+        "conan_installs": CuraVersion.ConanInstalls,
+        "python_installs": CuraVersion.PythonInstalls,
+    }
+
+
+def set_installer_filename(args):
+    data = installer_data(args)
+    installer_filename = data["variables"]["INSTALLER_FILENAME"]
+
     variables_output = sys.stdout
     if args.variables_output is not None:
         variables_output = open(args.variables_output, "a")
-    variables_output.write(f"INSTALLER_FILENAME={installer_filename}\n")
-    variables_output.write(f"CURA_VERSION={CuraVersion.CuraVersion}\n")
-    variables_output.write(f"CURA_VERSION_FULL={CuraVersion.CuraVersionFull}\n")
-    variables_output.write(f"CURA_APP_NAME={CuraVersion.CuraAppDisplayName}\n")
+    for key, value in data["variables"].items():
+        variables_output.write(f"{key}={value}\n")
+    if args.variables_output is not None:
+        variables_output.close()
 
     summary_output = sys.stdout
     if args.summary_output is not None:
         summary_output = open(args.summary_output, "a")
     summary_output.write(f"# {installer_filename}\n")
     summary_output.write("## Conan packages:\n")
-    for dep_name, dep_info in CuraVersion.ConanInstalls.items():
+    for dep_name, dep_info in data["conan_installs"].items():
         summary_output.write(f"`{dep_name} {dep_info['version']} {dep_info['revision']}`\n")
 
     summary_output.write("## Python modules:\n")
-    for dep_name, dep_info in CuraVersion.PythonInstalls.items():
+    for dep_name, dep_info in data["python_installs"].items():
         summary_output.write(f"`{dep_name} {dep_info['version']}`\n")
+    if args.summary_output is not None:
+        summary_output.close()
 
 
-if __name__ == "__main__":
+def main(argv = None):
     parser = argparse.ArgumentParser(description = 'Set the installer filename')
     parser.add_argument('--os',               type = str, help = 'OS')
     parser.add_argument('--architecture',     type = str, help = 'Architecture')
@@ -48,5 +67,9 @@ if __name__ == "__main__":
     parser.add_argument('--internal',         action='store_true', help = 'Internal')
     parser.add_argument('--summary-output',   type = str, help = 'Output file for the summary. If not specified, stdout will be used.')
     parser.add_argument('--variables-output', type = str, help = 'Output file for the variables. If not specified, stdout will be used.')
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
     set_installer_filename(args)
+
+
+if __name__ == "__main__":
+    main()
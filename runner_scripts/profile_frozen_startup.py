@@ -0,0 +1,304 @@
+"""
+Profile the startup of a built (frozen) Cura distribution.
+
+The executable is launched N times without a display (QT_QPA_PLATFORM=offscreen). Every run measures:
+- the time until the application is ready: the first output line matching --ready-pattern, or, when the application
+  never prints it, the moment its CPU use drops to idle (Linux only), which is when it sits in the Qt event loop;
+- the self and cumulative import time of every module, from the -X importtime output on stderr.
+
+The median and 95th percentile over the runs are written as JSON (--json-output) and as a Markdown table appended to
+the step summary (--summary-output). Given the JSON of a previous build (--baseline), the change of every number is
+listed, and a ready time that grew by more than --threshold-percent is flagged, or fails the run with
+--fail-on-regression.
+
+PyInstaller's bootloader ignores PYTHONPROFILEIMPORTTIME, like the other PYTHON* variables, so the import times need a
+build with the `X importtime` option: profile_importtime.spec builds the Cura spec with it. Its ready times include the
+tracing, so only compare them to those of builds made the same way. Without the traces only the ready times are
+reported.
+
+Usage:
+    python profile_frozen_startup.py [APP] [--runs N] [--warmup N] [--ready-pattern REGEX] [--timeout S]
+                                     [--json-output PATH] [--summary-output PATH] [--baseline PATH] [-- APP_ARGS...]
+
+Example:
+    python profile_frozen_startup.py dist/UltiMaker-Cura/UltiMaker-Cura --runs 5 --json-output startup.json \\
+        --baseline previous-startup.json --summary-output "$GITHUB_STEP_SUMMARY"
+"""
+
+import argparse
+import json
+import math
+import os
+import re
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from check_startup_time import parse_importtime_lines
+from workflow_context import positive_int
+
+DEFAULT_APP = os.path.join("dist", "UltiMaker-Cura", "UltiMaker-Cura")
+
+# Logged by CuraApplication once the main window is loaded and the event loop runs
+DEFAULT_READY_PATTERN = r"Booting Cura took|Started Cura"
+
+PROFILE_FORMAT = 1
+
+
+def percentile(values, fraction):
+    # Nearest rank, so with few runs it is one of the measured values
+    ordered = sorted(values)
+    return ordered[max(math.ceil(fraction * len(ordered)) - 1, 0)]
+
+
+def summarize(values):
+    return {"median": statistics.median(values), "p95": percentile(values, 0.95), "min": min(values), "max": max(values)}
+
+
+def cpu_seconds(pid):
+    # User and system time of the process, from /proc/<pid>/stat (fields 14 and 15, after the command name)
+    with open(f"/proc/{pid}/stat", "r") as f:
+        fields = f.read().rsplit(")", 1)[1].split()
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+def wait_until_idle(process, started, stop, idle_seconds, result):
+    """Sets result["idle"] to the last moment the process was busy, once it used less than 5% of a CPU for idle_seconds"""
+    interval = 0.1
+    previous_time, previous_cpu = started, 0.0
+    last_busy = None
+    while not stop.is_set() and process.poll() is None:
+        time.sleep(interval)
+        try:
+            now, cpu = time.perf_counter(), cpu_seconds(process.pid)
+        except (OSError, IndexError, ValueError):
+            return
+        if cpu - previous_cpu >= 0.05 * (now - previous_time):
+            last_busy = now
+        previous_time, previous_cpu = now, cpu
+        # It has to have done some work first, a process that is still being loaded is idle as well
+        if last_busy is not None and now - last_busy >= idle_seconds:
+            result["idle"] = last_busy - started
+            stop.set()
+            return
+
+
+def read_stream(stream, lines, started, ready_pattern, stop, result):
+    for line in stream:
+        lines.append(line)
+        if "ready" not in result and ready_pattern.search(line):
+            result["ready"] = time.perf_counter() - started
+            stop.set()
+
+
+def profile_run(command, env, ready_pattern, timeout, idle_seconds):
+    """Starts the application once; returns {"ready_s", "ready_by", "imports": [(module, depth, self us, cumulative
+    us)]} or {"error"}"""
+    started = time.perf_counter()
+    process = subprocess.Popen(command, env=env, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                               stderr=subprocess.PIPE, text=True, errors="replace", start_new_session=True)
+    stop = threading.Event()
+    result = {}
+    stdout_lines = []
+    stderr_lines = []
+    threads = [threading.Thread(target=read_stream, args=(process.stdout, stdout_lines, started, ready_pattern, stop, result)),
+               threading.Thread(target=read_stream, args=(process.stderr, stderr_lines, started, ready_pattern, stop, result))]
+    if os.path.exists(f"/proc/{process.pid}/stat"):
+        threads.append(threading.Thread(target=wait_until_idle, args=(process, started, stop, idle_seconds, result)))
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+
+    deadline = started + timeout
+    while not stop.is_set() and process.poll() is None and time.perf_counter() < deadline:
+        stop.wait(0.05)
+    exit_code = process.poll()
+    stop_application(process)
+    for thread in threads[:2]:
+        thread.join(timeout=10)
+
+    imports = parse_importtime_lines("".join(stderr_lines))
+    if "ready" in result:
+        return {"ready_s": result["ready"], "ready_by": "pattern", "imports": imports}
+    if "idle" in result:
+        return {"ready_s": result["idle"], "ready_by": "idle", "imports": imports}
+    if exit_code is not None:
+        tail = "".join(stderr_lines[-20:]).strip()
+        return {"error": f"exited with {exit_code} before it was ready" + (f":\n{tail}" if tail else "")}
+    return {"error": f"not ready after {timeout}s"}
+
+
+def stop_application(process):
+    # The whole process group, Cura starts CuraEngine and other helpers
+    if process.poll() is not None:
+        return
+    try:
+        if hasattr(os, "killpg"):
+            os.killpg(process.pid, signal.SIGTERM)
+        else:
+            process.terminate()
+        process.wait(timeout=10)
+    except (OSError, subprocess.TimeoutExpired):
+        if hasattr(os, "killpg"):
+            try:
+                os.killpg(process.pid, signal.SIGKILL)
+            except OSError:
+                pass
+        process.kill()
+        process.wait()
+
+
+def aggregate(runs, top):
+    """Returns the profile: the ready time and the total import time over the runs, and the import times of the `top`
+    modules with the largest median cumulative time"""
+    profile = {"format": PROFILE_FORMAT, "runs": len(runs), "ready_s": summarize([run["ready_s"] for run in runs]),
+               "ready_by": sorted({run["ready_by"] for run in runs}), "imports_ms": None, "modules": {}}
+    traced = [run for run in runs if run["imports"]]
+    if not traced:
+        return profile
+    # The top level imports together are all the time spent importing
+    profile["imports_ms"] = summarize([sum(cumulative for name, depth, self_time, cumulative in run["imports"] if depth == 0) / 1000
+                                       for run in traced])
+    modules = {}
+    for run in traced:
+        for name, depth, self_time, cumulative in run["imports"]:
+            # A module is imported once per run; keep the first
+            modules.setdefault(name, {}).setdefault(id(run), (self_time, cumulative))
+    medians = {name: statistics.median(cumulative for self_time, cumulative in times.values()) for name, times in modules.items()}
+    for name in sorted(medians, key=lambda name: -medians[name])[:top]:
+        times = list(modules[name].values())
+        profile["modules"][name] = {"self_ms": summarize([self_time / 1000 for self_time, cumulative in times]),
+                                    "cumulative_ms": summarize([cumulative / 1000 for self_time, cumulative in times]),
+                                    "runs": len(times)}
+    return profile
+
+
+def read_baseline(path):
+    if path is None or not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r") as f:
+            baseline = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"Warning: Ignoring the baseline {path}: {e}", file=sys.stderr)
+        return None
+    return baseline if baseline.get("format") == PROFILE_FORMAT else None
+
+
+def format_change(value, baseline_value):
+    if baseline_value is None:
+        return ""
+    return f"{value - baseline_value:+.2f}"
+
+
+def markdown_report(profile, baseline, failures, regressed, threshold_percent):
+    ready = profile["ready_s"]
+    lines = ["## Startup time of the distribution", "",
+             f"{profile['runs']} runs, ready detected by {' and '.join(profile['ready_by'])}"
+             + (f", {failures} failed" if failures else "") + ".", "",
+             "| | median | p95 | change of the median |", "|---|---:|---:|---:|",
+             f"| ready (s){' :warning:' if regressed else ''} | {ready['median']:.2f} | {ready['p95']:.2f} | "
+             f"{format_change(ready['median'], baseline['ready_s']['median'] if baseline else None)} |"]
+    if profile["imports_ms"] is not None:
+        imports = profile["imports_ms"]
+        baseline_imports = (baseline or {}).get("imports_ms") or {}
+        lines.append(f"| imports (ms) | {imports['median']:.1f} | {imports['p95']:.1f} | "
+                     f"{format_change(imports['median'], baseline_imports.get('median'))} |")
+    if regressed:
+        lines += ["", f":warning: The median ready time grew by more than {threshold_percent:g}%."]
+    if profile["modules"]:
+        baseline_modules = (baseline or {}).get("modules", {})
+        lines += ["", "| Module | cumulative median (ms) | p95 (ms) | self median (ms) | change (ms) |",
+                  "|---|---:|---:|---:|---:|"]
+        for name, module in profile["modules"].items():
+            baseline_module = baseline_modules.get(name)
+            change = format_change(module["cumulative_ms"]["median"],
+                                   baseline_module["cumulative_ms"]["median"] if baseline_module else None)
+            lines.append(f"| `{name}` | {module['cumulative_ms']['median']:.1f} | {module['cumulative_ms']['p95']:.1f} | "
+                         f"{module['self_ms']['median']:.1f} | {change} |")
+    else:
+        lines += ["", "No import times; the executable wasn't built with the `X importtime` option (see profile_importtime.spec)."]
+    return "\n".join(lines) + "\n"
+
+
+def profile_runs(command, env, ready_pattern, args):
+    """Returns the measured runs that got ready, and the number that didn't"""
+    runs = []
+    failures = 0
+    for index in range(args.warmup + args.runs):
+        run = profile_run(command, env, ready_pattern, args.timeout, args.idle_seconds)
+        label = f"warm-up {index + 1}" if index < args.warmup else f"run {index - args.warmup + 1}"
+        if "error" in run:
+            print(f"{label}: {run['error']}", file=sys.stderr)
+            failures += index >= args.warmup
+            continue
+        print(f"{label}: ready after {run['ready_s']:.2f}s ({run['ready_by']}), {len(run['imports'])} imports traced",
+              file=sys.stderr)
+        if index >= args.warmup:
+            runs.append(run)
+    return runs, failures
+
+
+def main(argv = None):
+    argv = sys.argv[1:] if argv is None else argv
+    app_args = []
+    if "--" in argv:
+        app_args = argv[argv.index("--") + 1:]
+        argv = argv[:argv.index("--")]
+
+    parser = argparse.ArgumentParser(description="Profile the startup time of a built distribution")
+    parser.add_argument("app", nargs="?", default=DEFAULT_APP, help=f"Executable to start (default: {DEFAULT_APP})")
+    parser.add_argument("--runs", type=positive_int, default=5, help="Measured runs (default: 5)")
+    parser.add_argument("--warmup", type=positive_int, default=1, help="Runs before the measured ones, for the disk cache and the first-run configuration (default: 1)")
+    parser.add_argument("--ready-pattern", type=str, default=DEFAULT_READY_PATTERN, help=f"Regular expression for the output line that marks the application as ready (default: {DEFAULT_READY_PATTERN})")
+    parser.add_argument("--idle-seconds", type=float, default=2.0, help="Without the ready line, the application is ready once it idled this long (default: 2)")
+    parser.add_argument("--timeout", type=float, default=180, help="Seconds to wait for a run to be ready (default: 180)")
+    parser.add_argument("--top", type=int, default=25, help="Modules with the largest import time to report (default: 25)")
+    parser.add_argument("--json-output", type=str, help="Write the profile to this JSON file")
+    parser.add_argument("--summary-output", type=str, help="Append the Markdown report to this file. If not specified, stdout will be used.")
+    parser.add_argument("--baseline", type=str, help="Profile JSON of a previous build to compare to")
+    parser.add_argument("--threshold-percent", type=float, default=10.0, help="Flag a median ready time that grew by more than this percentage (default: 10)")
+    parser.add_argument("--fail-on-regression", action="store_true", help="Exit with 1 when the ready time is flagged")
+    args = parser.parse_args(argv)
+
+    if not os.path.isfile(args.app):
+        print(f"Error: {args.app} not found", file=sys.stderr)
+        sys.exit(1)
+    ready_pattern = re.compile(args.ready_pattern)
+
+    # Every run starts with the same configuration, which the warm-up runs create
+    with tempfile.TemporaryDirectory(prefix="cura-startup-profile-", ignore_cleanup_errors=True) as config_dir:
+        env = dict(os.environ, QT_QPA_PLATFORM="offscreen", XDG_CONFIG_HOME=os.path.join(config_dir, "config"),
+                   XDG_DATA_HOME=os.path.join(config_dir, "data"), XDG_CACHE_HOME=os.path.join(config_dir, "cache"))
+        runs, failures = profile_runs([os.path.abspath(args.app)] + app_args, env, ready_pattern, args)
+    if not runs:
+        print("Error: none of the runs got ready", file=sys.stderr)
+        sys.exit(1)
+
+    profile = aggregate(runs, args.top)
+    baseline = read_baseline(args.baseline)
+    regressed = baseline is not None and \
+        profile["ready_s"]["median"] > baseline["ready_s"]["median"] * (1 + args.threshold_percent / 100)
+
+    if args.json_output:
+        with open(args.json_output, "w") as f:
+            json.dump(profile, f, indent=2)
+
+    summary_output = sys.stdout
+    if args.summary_output is not None:
+        summary_output = open(args.summary_output, "a")
+    summary_output.write(markdown_report(profile, baseline, failures, regressed, args.threshold_percent))
+    if args.summary_output is not None:
+        summary_output.close()
+
+    if args.fail_on_regression and regressed:
+        print("Error: the startup time regressed, see the report", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,21 @@
+# -*- mode: python -*-
+# Builds the PyInstaller spec named by CURA_SPEC with the `X importtime` and `u` interpreter options, so the frozen
+# application writes its import times to stderr like `python -X importtime` does, and its output isn't held back in a
+# buffer; the bootloader ignores PYTHONPROFILEIMPORTTIME and PYTHONUNBUFFERED.
+# PyInstaller resolves the relative paths of a spec from the folder of the spec it runs, so copy this file next to the
+# spec it builds. Only for profile_frozen_startup.py, into its own dist and work folders; never ship the result:
+#
+#   cp profile_importtime.spec cura_inst/
+#   CURA_SPEC=cura_inst/UltiMaker-Cura.spec pyinstaller cura_inst/profile_importtime.spec --distpath dist-profile --workpath build-profile
+
+import os
+
+_EXE = EXE
+
+
+def EXE(*args, **kwargs):
+    return _EXE(*args, [("X importtime", None, "OPTION"), ("u", None, "OPTION")], **kwargs)
+
+
+with open(os.environ["CURA_SPEC"], "r") as f:
+    exec(compile(f.read(), os.environ["CURA_SPEC"], "exec"))
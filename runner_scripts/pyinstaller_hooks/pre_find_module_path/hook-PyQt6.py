@@ -1,11 +1,33 @@
 # See https://pyinstaller.readthedocs.io/en/stable/usage.html#what-to-bundle-where-to-search
 # for information about the --additional-hooks-dir option and how to use it to include this file.
 
+import fnmatch
+import functools
 import glob
+import importlib.machinery
+import json
 import os
+import re
+import subprocess
+import sys
 
 from PyInstaller.utils.hooks import logger
 
+# The Qt plugins to leave out are listed in the 'pyinstaller.qt_plugin_exclusions' section of this conandata.yml,
+# as glob patterns; without it the quick3d plugins are excluded
+CONANDATA_PATH = os.environ.get("CURA_PYINSTALLER_CONANDATA", os.path.join("_cura_sources", "conandata.yml"))
+DEFAULT_EXCLUSION_PATTERNS = ["*quick3d*"]
+
+# Set to a file path to have get_qt_binaries report there which Qt libraries the imported PyQt6 modules need, and why;
+# without it nothing is analysed or written
+QT_BINARIES_REPORT_PATH = os.environ.get("CURA_PYINSTALLER_QT_REPORT")
+
+_module_graph = None
+_exclusion_patterns = None
+_directory_entries = {}
+_matching_files = {}
+
+
 def pre_find_module_path(api):
     """
     Hook to apply modifications to default PyQt6 hook that exclude unwanted items,
@@ -13,6 +35,11 @@ def pre_find_module_path(api):
     """
     from PyInstaller.utils.hooks import qt
 
+    # The module graph isn't part of the public hook API, so it is only looked at for the opt-in report
+    global _module_graph
+    if QT_BINARIES_REPORT_PATH:
+        _module_graph = getattr(api, "_module_graph", None)
+
     logger.info("Override get_qt_binaries in hooks/qt.py")
     qt.get_qt_binaries = get_qt_binaries
 
@@ -21,18 +48,213 @@ def pre_find_module_path(api):
     misc.files_in_dir = files_in_dir
 
 def get_qt_binaries(qt_library_info):
-    # Monkey-patch that omits unused Qt binaries to reduce file size
-    binaries = []
-    return binaries
+    # Monkey-patch that collects no Qt binaries, leaving them to PyInstaller's binary dependency analysis. With
+    # CURA_PYINSTALLER_QT_REPORT set, it reports which Qt libraries the imported PyQt6 modules link to
+    if not QT_BINARIES_REPORT_PATH:
+        return []
+    if _module_graph is None:
+        logger.warning("No module graph, not writing the Qt binaries report")
+        return []
+    try:
+        report_qt_binaries(qt_library_info, _module_graph, QT_BINARIES_REPORT_PATH)
+    except Exception as e:
+        # Like a PE file pefile can't read, or ldd/otool output that can't be parsed; the build goes on regardless
+        logger.warning(f"Could not resolve the Qt library dependencies for the report: {type(e).__name__}: {e}")
+    return []
+
+def report_qt_binaries(qt_library_info, module_graph, path):
+    package_dir, extensions = imported_qt_extensions(module_graph)
+    location = getattr(qt_library_info, "location", None) or {}
+    library_dir = location.get("BinariesPath" if sys.platform == "win32" else "LibrariesPath")
+    if package_dir is None or not extensions or not library_dir or not os.path.isdir(library_dir):
+        logger.warning("The PyQt6 modules or the Qt libraries weren't found, not writing the Qt binaries report")
+        return
+
+    dependencies = qt_library_dependencies(sorted(extensions.values()), library_dir)
+    required_by = {}
+    for module, filename in sorted(extensions.items()):
+        for library in dependency_closure(filename, dependencies):
+            required_by.setdefault(library, []).append(module)
+    write_qt_binaries_report(path, extensions, required_by, library_dir)
+
+def imported_qt_extensions(module_graph):
+    # Returns the PyQt6 package folder and {module: extension module file} of the PyQt6 modules Cura imports
+    package_dir = None
+    extensions = {}
+    for node in module_graph.flatten():
+        name = getattr(node, "identifier", "")
+        filename = getattr(node, "filename", None)
+        if not filename:
+            continue
+        if name == "PyQt6":
+            package_dir = os.path.dirname(filename)
+        elif name.startswith("PyQt6.") and filename.endswith(tuple(importlib.machinery.EXTENSION_SUFFIXES)):
+            extensions[name] = filename
+    return package_dir, extensions
+
+def qt_library_dependencies(files, library_dir):
+    """Returns {file: the Qt libraries it links to directly} for the files and every Qt library they need, with one
+    ldd/otool call (or PE import scan on Windows) for each level of dependencies"""
+    dependencies = {}
+    pending = list(files)
+    while pending:
+        for file, libraries in linked_libraries(pending, library_dir).items():
+            # Only the Qt libraries; the system libraries and the others are left to PyInstaller's own analysis
+            dependencies[file] = {qt_library for qt_library in (qt_library_path(library, library_dir) for library in libraries)
+                                  if qt_library is not None}
+        pending = sorted({library for libraries in dependencies.values() for library in libraries} - set(dependencies))
+    return dependencies
+
+def qt_library_path(library, library_dir):
+    # The library's path in the Qt library folder, under the name it is linked by, or None when it is from elsewhere
+    real_library_dir = os.path.realpath(library_dir)
+    real_dir = os.path.realpath(os.path.dirname(library))
+    if real_dir != real_library_dir and not real_dir.startswith(real_library_dir + os.sep):
+        return None
+    return os.path.normpath(os.path.join(library_dir, os.path.relpath(real_dir, real_library_dir), os.path.basename(library)))
+
+def linked_libraries(files, library_dir):
+    # Returns {file: paths of the libraries it links to}, for all files at once
+    if sys.platform == "win32":
+        return {file: pe_imports(file, library_dir) for file in files}
+    if sys.platform == "darwin":
+        return parse_otool_output(run_batched(["otool", "-L"], files), files, library_dir)
+    return parse_ldd_output(run_batched(["ldd"], files), files)
+
+def run_batched(command, files):
+    # ldd exits with an error when one of the files isn't dynamically linked, the output of the others is still there
+    return subprocess.run(command + files, capture_output=True, text=True, check=False).stdout
+
+def parse_ldd_output(output, files):
+    # "file:" headers (only with more than one file), then "\tlibname => /path/libname (0x...)" lines
+    libraries = {file: set() for file in files}
+    current = files[0] if len(files) == 1 else None
+    for line in output.splitlines():
+        if not line[:1].isspace() and line.endswith(":"):
+            current = line[:-1]
+            continue
+        match = re.match(r"\s*\S+ => (/\S+) \(", line)
+        if current in libraries and match:
+            libraries[current].add(match.group(1))
+    return libraries
+
+def parse_otool_output(output, files, library_dir):
+    # "file:" headers, then "\t@rpath/QtCore.framework/Versions/A/QtCore (compatibility version ...)" lines
+    libraries = {file: set() for file in files}
+    current = None
+    for line in output.splitlines():
+        if not line[:1].isspace() and line.endswith(":"):
+            current = line[:-1].split(" (architecture ")[0]  # universal binaries list every architecture
+            continue
+        name = line.strip().split(" (")[0]
+        if current not in libraries or not name:
+            continue
+        if name.startswith("@rpath/"):
+            # The PyQt6 wheels point their runpath at the Qt library folder
+            name = os.path.join(library_dir, name[len("@rpath/"):])
+        elif name.startswith("@loader_path/"):
+            name = os.path.join(os.path.dirname(current), name[len("@loader_path/"):])
+        if os.path.isabs(name) and os.path.normpath(name) != os.path.normpath(current):
+            libraries[current].add(os.path.normpath(name))
+    return libraries
+
+def pe_imports(file, library_dir):
+    # pefile comes with PyInstaller on Windows; the DLLs are looked up in the Qt folder, like the loader would
+    import pefile
+    pe = pefile.PE(file, fast_load=True)
+    pe.parse_data_directories(directories=[pefile.DIRECTORY_ENTRY["IMAGE_DIRECTORY_ENTRY_IMPORT"]])
+    names = [entry.dll.decode() for entry in getattr(pe, "DIRECTORY_ENTRY_IMPORT", [])]
+    pe.close()
+    available = {name.lower(): name for name in os.listdir(library_dir)}
+    return {os.path.join(library_dir, available[name.lower()]) for name in names if name.lower() in available}
+
+def dependency_closure(file, dependencies):
+    closure = set()
+    pending = list(dependencies.get(file, ()))
+    while pending:
+        library = pending.pop()
+        if library not in closure:
+            closure.add(library)
+            pending.extend(dependencies.get(library, ()))
+    return closure
+
+def write_qt_binaries_report(path, extensions, required_by, library_dir):
+    # The Qt libraries in the Qt folder that no imported module links to are listed as well
+    available = sorted(name for name in directory_entries(library_dir)
+                       if re.search(r"\.(so(\.\d+)*|dylib|dll|framework)$", name, re.IGNORECASE))
+    included = {os.path.relpath(library, library_dir) for library in required_by}
+    report = {
+        "modules": {module: os.path.basename(filename) for module, filename in sorted(extensions.items())},
+        "included": {os.path.relpath(library, library_dir): modules for library, modules in sorted(required_by.items())},
+        "not_required": [name for name in available
+                         if name not in included and not any(library.startswith(name + os.sep) for library in included)],
+    }
+    logger.info(f"{len(extensions)} PyQt6 modules need {len(report['included'])} Qt libraries, "
+                f"{len(report['not_required'])} others aren't linked to by them, see {path}")
+    try:
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+    except OSError as e:
+        logger.warning(f"Could not write {path}: {e}")
+
+def exclusion_patterns():
+    global _exclusion_patterns
+    if _exclusion_patterns is None:
+        _exclusion_patterns = load_exclusion_patterns(CONANDATA_PATH)
+        logger.info(f"Excluding the Qt plugins matching {', '.join(_exclusion_patterns)}")
+    return _exclusion_patterns
+
+def load_exclusion_patterns(conandata_path):
+    if not os.path.isfile(conandata_path):
+        return DEFAULT_EXCLUSION_PATTERNS
+    try:
+        import yaml
+    except ImportError:
+        logger.warning(f"PyYAML is not installed, can't read the Qt plugin exclusions from {conandata_path}")
+        return DEFAULT_EXCLUSION_PATTERNS
+    with open(conandata_path, "r") as f:
+        conandata = yaml.load(f, Loader=getattr(yaml, "CSafeLoader", yaml.SafeLoader)) or {}
+    patterns = (conandata.get("pyinstaller") or {}).get("qt_plugin_exclusions")
+    return DEFAULT_EXCLUSION_PATTERNS if patterns is None else list(patterns)
+
+@functools.lru_cache(maxsize=None)
+def compile_patterns(patterns):
+    # One regular expression for all patterns; like glob, a * only matches a leading dot when the pattern starts with it
+    flags = re.IGNORECASE if os.path.normcase("A") == "a" else 0
+    visible = "|".join(fnmatch.translate(pattern) for pattern in patterns) or "(?!)"
+    hidden = "|".join(fnmatch.translate(pattern) for pattern in patterns if pattern.startswith(".")) or "(?!)"
+    return re.compile(visible, flags), re.compile(hidden, flags)
+
+def matches(name, compiled):
+    visible, hidden = compiled
+    return (hidden if name.startswith(".") else visible).match(name) is not None
+
+def directory_entries(directory):
+    # PyInstaller asks for the same Qt plugin directories many times, they are only listed once per build
+    if directory not in _directory_entries:
+        try:
+            with os.scandir(directory) as entries:
+                _directory_entries[directory] = [entry.name for entry in entries]
+        except OSError:
+            _directory_entries[directory] = []
+    return _directory_entries[directory]
 
 def files_in_dir(directory, file_patterns=[]):
     # Monkey-patch that excludes specific Qt plugins to reduce file size
-    included_files = []
-    excluded_files = []
-    exclusion_patterns = [ "*quick3d*" ]
-    for file_pattern in file_patterns:
-        included_files.extend(glob.glob(os.path.join(directory, file_pattern)))
-    for file_pattern in exclusion_patterns:
-        excluded_files.extend(glob.glob(os.path.join(directory, file_pattern)))
-    files = list(set(included_files) - set(excluded_files))
-    return files
+    key = (directory, tuple(file_patterns))
+    if key not in _matching_files:
+        if any(os.sep in pattern or (os.altsep and os.altsep in pattern) for pattern in file_patterns):
+            # Patterns reaching into subdirectories are left to glob
+            files = set()
+            for file_pattern in file_patterns:
+                files.update(glob.glob(os.path.join(directory, file_pattern)))
+            excluded = compile_patterns(tuple(exclusion_patterns()))
+            files = [file for file in files if not matches(os.path.basename(file), excluded)]
+        else:
+            included = compile_patterns(tuple(file_patterns))
+            excluded = compile_patterns(tuple(exclusion_patterns()))
+            files = [os.path.join(directory, name) for name in directory_entries(directory)
+                     if matches(name, included) and not matches(name, excluded)]
+        # Sorted, so the builds are reproducible
+        _matching_files[key] = sorted(files)
+    return list(_matching_files[key])
@@ -1,30 +1,101 @@
 import os
 import argparse
+import hashlib
+import json
+import mmap
+import sys
+
+from workflow_context import positive_int
+
+READ_BUFFER_SIZE = 8 * 1024 * 1024
+
+
+def file_sha256(path):
+    # The installers are several GB; hashing the memory mapped file avoids copying every block into a Python buffer,
+    # and hashlib releases the GIL while hashing, so the files are hashed in parallel by the threads
+    sha256 = hashlib.sha256()
+    with open(path, "rb", buffering=0) as f:
+        try:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                sha256.update(mapped)
+                return sha256.hexdigest()
+        except (OSError, ValueError):
+            pass  # empty files can't be mapped, fall back to reading into a large buffer
+        buffer = bytearray(READ_BUFFER_SIZE)
+        view = memoryview(buffer)
+        while size := f.readinto(buffer):
+            sha256.update(view[:size])
+    return sha256.hexdigest()
+
+
+def installer_entry(original_name, name):
+    return {"name": name, "original_name": original_name, "size": os.path.getsize(name), "sha256": file_sha256(name)}
+
+
+def write_checksums(entries, args, cura_version):
+    # Same format as the output of `sha256sum --binary`, so it can be checked with `sha256sum -c`
+    with open(args.checksums_file, "w", newline="\n") as f:
+        for entry in entries:
+            f.write(f"{entry['sha256']} *{entry['name']}\n")
+
+    with open(args.manifest, "w") as f:
+        json.dump({"tag": args.tag, "cura_version": cura_version, "installers": entries}, f, indent=2)
+
 
 def rename_installers(args):
-    first_file = True
+    from concurrent.futures import ThreadPoolExecutor
 
-    for file in os.listdir("."):
-        # Find the commit tag, and place the tags instead
-        index_plus = file.index("+")
-        file_start = file[:index_plus]
-        file_end = file[index_plus:]
-        file_end = file_end[file_end.index("-")+1:]
+    cura_version = None
+    renamed = []
 
-        new_file_name = f"{file_start}-{args.tag}-{file_end}"
-        os.rename(file, new_file_name)
+    with ThreadPoolExecutor(max_workers=args.jobs) as executor:
+        # Sorted, so the version is always taken from the same file
+        for file in sorted(os.listdir(".")):
+            if not os.path.isfile(file) or "+" not in file:
+                # Like the checksum files of a previous run, or an installer that was already renamed
+                print(f"Skipping {file}, it has no commit tag", file=sys.stderr)
+                continue
 
-        if first_file:
-            first_file = False
+            # Find the commit tag, and place the tags instead
+            file_start, _, file_end = file.partition("+")
+            _, separator, file_end = file_end.partition("-")
+            version_parts = file_start.split("-")
+            if not separator or len(version_parts) < 3:
+                print(f"Warning: Skipping {file}, it isn't named like UltiMaker-Cura-<version>+<commit>-<platform>",
+                      file=sys.stderr)
+                continue
 
-            short_version = file_start.split("-")[2]
-            short_version = ".".join(short_version.split(".")[:2])
+            new_file_name = f"{file_start}-{args.tag}-{file_end}"
+            os.rename(file, new_file_name)
+            # The hashes are computed while the other files are renamed
+            if not args.no_checksums:
+                renamed.append(executor.submit(installer_entry, file, new_file_name))
 
-            print(f"cura_version={file_start}")
-            print(f"short_version={file_start}")
+            if cura_version is None:
+                cura_version = file_start
 
-if __name__ == "__main__":
+                short_version = ".".join(version_parts[2].split(".")[:2])
+
+                print(f"cura_version={file_start}")
+                print(f"short_version={short_version}")
+
+        entries = [future.result() for future in renamed]
+
+    # Nothing renamed, like on a second run, keeps the checksums of the first one
+    if entries:
+        write_checksums(entries, args, cura_version)
+
+
+def main(argv = None):
     parser = argparse.ArgumentParser(description = 'Rename the installers')
     parser.add_argument('--tag', type = str, help = 'Tag to be added in the name, e.g. "nightly" or "weekly-Internal"', required=True)
-    args = parser.parse_args()
+    parser.add_argument('--checksums-file', type = str, default = 'SHA256SUMS', help = 'Where to write the SHA-256 of the renamed installers (default: SHA256SUMS)')
+    parser.add_argument('--manifest', type = str, default = 'installers-manifest.json', help = 'Where to write the JSON manifest with the name, size and SHA-256 of the renamed installers (default: installers-manifest.json)')
+    parser.add_argument('--jobs', type = positive_int, default = min(os.cpu_count() or 1, 8), help = 'Installers to hash in parallel (default: number of CPUs, at most 8)')
+    parser.add_argument('--no-checksums', action = 'store_true', help = 'Only rename the installers')
+    args = parser.parse_args(argv)
     rename_installers(args)
+
+
+if __name__ == "__main__":
+    main()
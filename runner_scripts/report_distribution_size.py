@@ -0,0 +1,329 @@
+#!/usr/bin/env python3
+"""Attribute the size of a PyInstaller distribution to the Conan packages and Python modules it came from.
+
+Walks the distribution once and attributes every file's bytes to one of:
+  conan:<package>   — the 'pyinstaller.datas' and 'pyinstaller.binaries' entries of conandata.yml, by their 'dst'
+                      folder (or 'binary' file), which is where Cura's .spec file collects them
+  python:<dist>     — the top level packages and extension modules PyInstaller collected, mapped to their
+                      distribution by the *.dist-info folders in the distribution and the distributions installed
+                      for --python (default: this interpreter), e.g. the venv the distribution was built from
+  python-runtime    — the interpreter, its libraries and PyInstaller's own archives
+  unattributed      — everything else
+
+Hardlinked files (see cleanup_distribution.py --dedup) are counted once, symlinks are not followed.
+
+The result is written as a compact JSON baseline (--output). Given the baseline of a previous build (--baseline), the
+report lists the largest packages with their change and flags the packages that grew by more than both
+--threshold-percent and --threshold-bytes. The report is appended to --summary-output, the step summary file
+prepare_installer.py writes to.
+
+Usage:
+  python report_distribution_size.py <dist_dir> [--conandata PATH] [--os Windows|Linux|Macos]
+                                     [--python PATH] [--baseline PATH] [--output PATH] [--summary-output PATH]
+                                     [--threshold-percent P] [--threshold-bytes B] [--top N] [--fail-on-growth]
+
+Examples:
+  # Compare to the baseline of the previous build, and replace it
+  python report_distribution_size.py dist/UltiMaker-Cura --conandata _cura_sources/conandata.yml \\
+      --python cura_installer_venv/bin/python --baseline size-baseline.json --output size-baseline.json \\
+      --summary-output "$GITHUB_STEP_SUMMARY"
+"""
+
+import argparse
+import json
+import os
+import sys
+
+from yaml_loader import load_yaml_file
+
+BASELINE_FORMAT = 1
+
+# Folders PyInstaller puts the collected files in, relative to the distribution root (the last ones in .app bundles)
+MODULE_ROOTS = ("", "_internal", "Contents/Frameworks", "Contents/Resources", "Contents/MacOS")
+
+# Lowercase names, up to the first dot, of the interpreter's and PyInstaller's own files
+RUNTIME_PREFIXES = ("python3", "libpython3", "base_library", "lib-dynload", "pyi-", "vcruntime140", "msvcp140",
+                    "ucrtbase", "api-ms-win-")
+
+
+def conan_owners(conandata: dict, current_os: str) -> tuple:
+    """Return ({folder: package}, {file: package}) for the pyinstaller datas and binaries of conandata.yml, with the
+    paths relative to the distribution root under every module root."""
+    folders = {}
+    files = {}
+    pyinstaller = conandata.get("pyinstaller", {}) or {}
+    for section in ("datas", "binaries"):
+        for entry in (pyinstaller.get(section) or {}).values():
+            if not isinstance(entry, dict) or "package" not in entry:
+                continue
+            if "oses" in entry and current_os not in entry["oses"]:
+                continue
+            package = f"conan:{entry['package']}"
+            dst = str(entry.get("dst", ".")).replace("\\", "/").strip("/")
+            dst = "" if dst == "." else dst
+            for root in MODULE_ROOTS:
+                folder = "/".join(part for part in (root, dst) if part)
+                if entry.get("binary"):
+                    for name in (entry["binary"], f"{entry['binary']}.exe"):
+                        files["/".join(part for part in (folder, name) if part)] = package
+                elif dst:
+                    # A 'dst' of "." collects into the root, which can't be attributed as a whole
+                    folders.setdefault(folder, package)
+    return folders, files
+
+
+def dist_info_modules(dist_dir: str) -> dict:
+    """Return {top level module name: distribution name} from the *.dist-info folders PyInstaller collected."""
+    modules = {}
+    for root in MODULE_ROOTS:
+        root_dir = os.path.join(dist_dir, root)
+        if not os.path.isdir(root_dir):
+            continue
+        for entry in os.scandir(root_dir):
+            if not entry.name.endswith(".dist-info") or not entry.is_dir(follow_symlinks=False):
+                continue
+            distribution = entry.name[:-len(".dist-info")].rsplit("-", 1)[0]
+            for listing in ("top_level.txt", "RECORD"):
+                try:
+                    with open(os.path.join(entry.path, listing), "r", encoding="utf-8") as f:
+                        lines = f.read().splitlines()
+                except OSError:
+                    continue
+                for line in lines:
+                    name = line.split(",")[0].split("/")[0]
+                    if name and not name.endswith(".dist-info"):
+                        modules.setdefault(name.split(".")[0], distribution)
+                break
+    return modules
+
+
+def environment_modules(python: str = None) -> dict:
+    """Return {top level module name: distribution name} for the distributions installed for this interpreter, or for
+    the given one, like the one of the venv the distribution was built from."""
+    if python is None:
+        from importlib.metadata import packages_distributions
+        distributions = packages_distributions()
+    else:
+        import subprocess
+        command = "import json, importlib.metadata; print(json.dumps(importlib.metadata.packages_distributions()))"
+        result = subprocess.run([python, "-c", command], capture_output=True, text=True)
+        if result.returncode != 0:
+            print(f"WARNING: Could not list the Python distributions of {python}: {result.stderr.strip()}", file=sys.stderr)
+            return {}
+        distributions = json.loads(result.stdout)
+    return {module: names[0] for module, names in distributions.items() if names}
+
+
+def name_owner(name: str, modules: dict) -> str:
+    # The owner of a file or folder directly in a module root, by its name
+    if name.endswith(".dist-info"):
+        name = name[:-len(".dist-info")].rsplit("-", 1)[0]
+        return f"python:{modules.get(name, name)}"
+    module = name.split(".")[0]
+    if module in modules:
+        return f"python:{modules[module]}"
+    if name.lower().startswith(RUNTIME_PREFIXES):
+        return "python-runtime"
+    return None
+
+
+def attribute_sizes(dist_dir: str, folders: dict, files: dict, modules: dict) -> dict:
+    """Walk dist_dir once; return the baseline: per owner the bytes and the number of files."""
+    module_roots = set(MODULE_ROOTS)
+    packages = {}
+    seen_inodes = set()
+    total_bytes = 0
+    total_files = 0
+    # (path relative to dist_dir, owner inherited from a parent folder)
+    pending = [("", None)]
+    while pending:
+        relative, owner = pending.pop()
+        try:
+            entries = list(os.scandir(os.path.join(dist_dir, relative)))
+        except OSError as exc:
+            print(f"WARNING: Could not list {relative or dist_dir}: {exc}", file=sys.stderr)
+            continue
+        in_module_root = relative in module_roots
+        for entry in entries:
+            path = f"{relative}/{entry.name}" if relative else entry.name
+            # A more specific 'dst' wins over the folder holding it
+            entry_owner = folders.get(path) or files.get(path) or owner
+            if entry_owner is None and in_module_root:
+                entry_owner = name_owner(entry.name, modules)
+
+            if entry.is_dir(follow_symlinks=False):
+                pending.append((path, entry_owner))
+                continue
+            if not entry.is_file(follow_symlinks=False):
+                continue
+            try:
+                stat = entry.stat(follow_symlinks=False)
+            except OSError as exc:
+                print(f"WARNING: Skipping {path}: {exc}", file=sys.stderr)
+                continue
+            if stat.st_nlink > 1:
+                inode = (stat.st_dev, stat.st_ino)
+                if inode in seen_inodes:
+                    continue
+                seen_inodes.add(inode)
+            totals = packages.setdefault(entry_owner or "unattributed", [0, 0])
+            totals[0] += stat.st_size
+            totals[1] += 1
+            total_bytes += stat.st_size
+            total_files += 1
+    return {"format": BASELINE_FORMAT, "total_bytes": total_bytes, "total_files": total_files,
+            "packages": dict(sorted(packages.items()))}
+
+
+def read_baseline(path: str) -> dict:
+    if path is None or not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r") as fh:
+            baseline = json.load(fh)
+    except (OSError, ValueError) as exc:
+        print(f"WARNING: Ignoring the baseline {path}: {exc}", file=sys.stderr)
+        return None
+    if baseline.get("format") != BASELINE_FORMAT:
+        print(f"WARNING: Ignoring the baseline {path}, it has another format", file=sys.stderr)
+        return None
+    return baseline
+
+
+def compare(current: dict, baseline: dict, threshold_percent: float, threshold_bytes: int) -> list:
+    """Return [(owner, bytes, change in bytes or None, grew past the thresholds)], largest first."""
+    previous = baseline["packages"] if baseline else {}
+    rows = []
+    for owner in set(current["packages"]) | set(previous):
+        size = current["packages"].get(owner, [0, 0])[0]
+        if baseline is None:
+            rows.append((owner, size, None, False))
+            continue
+        old_size = previous.get(owner, [0, 0])[0]
+        change = size - old_size
+        grew = change >= threshold_bytes and (old_size == 0 or change * 100 >= threshold_percent * old_size)
+        rows.append((owner, size, change, grew))
+    return sorted(rows, key=lambda row: (-row[1], row[0]))
+
+
+def format_bytes(size: int) -> str:
+    if size < 1_000_000:
+        return f"{size / 1000:,.1f} kB"
+    return f"{size / 1_000_000:,.1f} MB"
+
+
+def format_change(change: int) -> str:
+    if not change:
+        return ""
+    return f"{'+' if change >= 0 else '-'}{format_bytes(abs(change))}"
+
+
+def markdown_report(current: dict, baseline: dict, rows: list, top: int, threshold_percent: float,
+                    threshold_bytes: int) -> str:
+    lines = ["## Distribution size per package", ""]
+    total = f"Total: **{format_bytes(current['total_bytes'])}** in {current['total_files']} files"
+    if baseline is None:
+        lines.append(f"{total}, no baseline to compare to.")
+    else:
+        lines.append(f"{total} ({format_change(current['total_bytes'] - baseline['total_bytes'])} compared to the baseline).")
+    grown = [row for row in rows if row[3]]
+    if grown:
+        lines += ["", f"### Grew more than {threshold_percent:g}% and {format_bytes(threshold_bytes)}", ""]
+        lines += [f"- :warning: `{owner}`: {format_bytes(size)} ({format_change(change)})" for owner, size, change, _ in grown]
+    lines += ["", "| Package | Size | Change |", "|---|---:|---:|"]
+    for owner, size, change, grew in rows[:top]:
+        lines.append(f"| `{owner}`{' :warning:' if grew else ''} | {format_bytes(size)} | {format_change(change)} |")
+    if len(rows) > top:
+        rest = sum(row[1] for row in rows[top:])
+        lines.append(f"| {len(rows) - top} more | {format_bytes(rest)} | |")
+    return "\n".join(lines) + "\n"
+
+
+def main(argv: list = None) -> None:
+    parser = argparse.ArgumentParser(
+        description="Attribute the size of a built distribution to its Conan packages and Python modules",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=__doc__,
+    )
+    parser.add_argument("dist_dir", help="Root of the distribution (e.g. dist/UltiMaker-Cura or the .app bundle)")
+    parser.add_argument(
+        "--conandata",
+        default="_cura_sources/conandata.yml",
+        help="Path to conandata.yml (default: _cura_sources/conandata.yml)",
+    )
+    parser.add_argument(
+        "--os",
+        dest="os_name",
+        default=None,
+        help="Override OS name: Windows, Linux, or Macos (defaults to current platform)",
+    )
+    parser.add_argument(
+        "--python",
+        default=None,
+        help="Interpreter whose installed distributions own the collected modules (default: this one)",
+    )
+    parser.add_argument("--baseline", default=None, help="Baseline JSON of a previous build to compare to")
+    parser.add_argument("--output", default=None, help="Write the baseline JSON of this build to this file")
+    parser.add_argument(
+        "--summary-output",
+        default=None,
+        help="Append the Markdown report to this file (e.g. $GITHUB_STEP_SUMMARY). If not specified, stdout will be used.",
+    )
+    parser.add_argument(
+        "--threshold-percent",
+        type=float,
+        default=5.0,
+        help="Flag packages that grew by more than this percentage (default: 5)",
+    )
+    parser.add_argument(
+        "--threshold-bytes",
+        type=int,
+        default=1_000_000,
+        help="... and by more than this many bytes (default: 1000000)",
+    )
+    parser.add_argument("--top", type=int, default=25, help="Number of packages listed in the report (default: 25)")
+    parser.add_argument("--fail-on-growth", action="store_true", help="Exit with 1 when a package is flagged")
+    args = parser.parse_args(argv)
+
+    current_os = args.os_name or {
+        "linux": "Linux",
+        "darwin": "Macos",
+        "win32": "Windows",
+    }.get(sys.platform, sys.platform)
+
+    if not os.path.isdir(args.dist_dir):
+        print(f"ERROR: Distribution directory not found: {args.dist_dir}", file=sys.stderr)
+        sys.exit(1)
+
+    folders, files = {}, {}
+    if os.path.exists(args.conandata):
+        conandata = load_yaml_file(args.conandata, keys=("pyinstaller.datas", "pyinstaller.binaries"))
+        folders, files = conan_owners(conandata, current_os)
+    else:
+        print(f"WARNING: conandata.yml not found at {args.conandata}, the Conan packages can't be attributed", file=sys.stderr)
+
+    modules = environment_modules(args.python)
+    modules.update(dist_info_modules(args.dist_dir))
+    current = attribute_sizes(args.dist_dir, folders, files, modules)
+    baseline = read_baseline(args.baseline)
+    rows = compare(current, baseline, args.threshold_percent, args.threshold_bytes)
+    report = markdown_report(current, baseline, rows, args.top, args.threshold_percent, args.threshold_bytes)
+
+    if args.output:
+        with open(args.output, "w") as fh:
+            json.dump(current, fh, separators=(",", ":"))
+
+    summary_output = sys.stdout
+    if args.summary_output is not None:
+        summary_output = open(args.summary_output, "a")
+    summary_output.write(report)
+    if args.summary_output is not None:
+        summary_output.close()
+
+    if args.fail_on_growth and any(row[3] for row in rows):
+        print("ERROR: Packages grew past the thresholds, see the report", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,24 +3,60 @@
 #       library "pyartifactory" is needed to run the script
 #       install it by "pip install pyartifactory"
 # for running:
-#       python sanitize_jfrog_artifactory.py USERNAME PASSWORD
+#       python sanitize_jfrog_artifactory.py USERNAME PASSWORD [--mode aql|rest] [--dry-run] [--jobs N] [--journal FILE]
+#
+# The default aql mode finds all artifacts created by anonymous below ARTIFACT_PATHS with one paged AQL query,
+# and deletes every page as a concurrent batch. When the AQL query is refused it falls back to the rest mode.
+# In the rest mode every artifact path is listed once, recursively, after which a bounded pool of workers checks and
+# deletes the listed artifacts over one shared keep-alive session.
+# Every processed URI is appended to the journal file, when the run is interrupted the next run
+# skips the URIs already in the journal. The journal is removed after a run without failures.
+#
+# With --policy FILE the artifacts are selected by a retention policy instead of by their creator. All files below the
+# rule paths are listed with one paged AQL query, grouped into units (by default the folders 3 levels below the rule
+# path: <version>/<channel>/<recipe revision>) and the resulting deletion plan is printed before anything is deleted.
+# The policy needs at least one rule, and it always uses AQL, so it can't be combined with --mode:
+#   rules:
+#     - path: cura-conan-dev-local/ultimaker/cura   # the longest matching rule path applies
+#       unit_depth: 3                               # levels below the path that make up one unit
+#       keep_newest: 5                              # per parent folder (<version>/<channel>), delete the older units
+#       max_age_days: 90                            # delete the units without files created in the last 90 days
+#       max_size: 200GB                             # delete the oldest of the remaining units until the path fits
+#   protect:                                        # never delete the units of these references, in any repository
+#     - cura/5.9.0@ultimaker/stable
+#     - uranium/5.9.0@ultimaker/stable#1a2b3c
 ###
 
-import pyartifactory
+import argparse
+import json
+import os
+import re
 import sys
+import threading
 
-ARTIFACTORY_BASE_URL = "https://cura.jfrog.io/artifactory"
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta, timezone
 
-if len(sys.argv) != 3:
-    print("Usage: python sanitize_jfrog_artifactory.py USERNAME PASSWORD\n"
-          "Also needs pyartifactory library to run this script")
-    exit()
+import pyartifactory
+import requests
 
-USERNAME = sys.argv[1]
-PASSWORD = sys.argv[2]
+from requests.adapters import HTTPAdapter
 
-def initialize_artifactory():
-    return pyartifactory.Artifactory(url=ARTIFACTORY_BASE_URL, auth=(USERNAME, PASSWORD))
+from workflow_context import positive_int
+from yaml_loader import load_yaml_file
+
+ARTIFACTORY_BASE_URL = "https://cura.jfrog.io/artifactory"
+DEFAULT_JOURNAL = "sanitize_jfrog_artifactory.journal"
+
+
+def initialize_artifactory(username, password, base_url = ARTIFACTORY_BASE_URL, jobs = 1):
+    artifactory_client = pyartifactory.Artifactory(url=base_url, auth=(username, password))
+    # All workers share the session of the artifacts object, size its connection pool so every worker
+    # can keep its connection alive instead of the pool discarding the surplus connections
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(jobs, 1))
+    artifactory_client.artifacts.session.mount("http://", adapter)
+    artifactory_client.artifacts.session.mount("https://", adapter)
+    return artifactory_client
 
 ARTIFACT_PATHS = {"cura-conan-dev-local/ultimaker/curaengine"          : True,
                   "cura-conan-dev-local/ultimaker/cura"                : True,
@@ -41,43 +77,441 @@ ARTIFACT_PATHS = {"cura-conan-dev-local/ultimaker/curaengine"          : True,
                   "cura_conan-cci-remote-cache"	                       : False}
 
 
-def list_artifacts(artifactory_client, artifact_path, depth):
+class Journal:
+    """Append-only record of the processed artifact URIs, used to resume an interrupted run"""
+
+    def __init__(self, path):
+        self.path = path
+        self.processed = set()
+        self._lock = threading.Lock()
+        self._file = None
+        if path is None:
+            return
+        if os.path.exists(path):
+            with open(path, "r") as journal_file:
+                # A line without its newline was cut off by the interruption, so it doesn't count
+                self.processed = {line[:-1] for line in journal_file if line.endswith("\n")}
+        self._file = open(path, "a")
+
+    def record(self, uri):
+        with self._lock:
+            self.processed.add(uri)
+            if self._file is not None:
+                self._file.write(f"{uri}\n")
+                self._file.flush()
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def discard(self):
+        self.close()
+        if self.path is not None and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def list_artifacts(artifactory_client, artifact_path):
     try:
-        return artifactory_client.artifacts.list(f"{artifact_path}/", depth).files
+        # The depth flags of ARTIFACT_PATHS used to end up in the `recursive` argument of this call, so every path has
+        # always been listed fully recursive, which includes the depth 1 and 2 items. List it once to keep that coverage.
+        return artifactory_client.artifacts.list(f"{artifact_path}/").files
     except pyartifactory.exception.ArtifactoryError as e:
         # artifact_path was not found in the repository, so we return empty dict
         # print(f"Repository {artifact_path} does not exist")
         return {}
 
 
+def is_not_found(error):
+    return isinstance(error, requests.exceptions.HTTPError) and error.response is not None and error.response.status_code == 404
+
+
 def delete_artifact(artifactory_client, artifact_path):
-    artifactory_client.artifacts.delete(artifact_path)
+    try:
+        artifactory_client.artifacts.delete(artifact_path)
+    except requests.exceptions.HTTPError as e:
+        # Already gone, for instance together with a folder that was deleted by another worker
+        if not is_not_found(e):
+            raise
 
 
 def artifact_modified_by_anonymous(artifactory_client, artifact_path):
-    return str(artifactory_client.artifacts.info(artifact_path).createdBy) == "anonymous"
+    try:
+        return str(artifactory_client.artifacts.info(artifact_path).createdBy) == "anonymous"
+    except pyartifactory.exception.ArtifactNotFoundError:
+        return False
 
 
-def process_artifact(artifactory_client, artifact_path, sequence_nr, depth):
-    artifact_files =  list_artifacts(artifactory_client, artifact_path, depth)
-    for artifact in artifact_files:
-        artifact_file_path = f"{artifact_path}{artifact.uri}"
-        if artifact_modified_by_anonymous(artifactory_client, artifact_file_path):
-            sequence_nr += 1
-            print(f"{sequence_nr}: {artifact_file_path}")
+def process_file(artifactory_client, artifact_file_path, size, journal, counters, counters_lock, artifact_path, dry_run = False):
+    if artifact_modified_by_anonymous(artifactory_client, artifact_file_path):
+        if not dry_run:
             delete_artifact(artifactory_client, artifact_file_path)
+        with counters_lock:
+            counters[artifact_path][0] += 1
+            counters[artifact_path][1] += size
+            print(f"{counters[artifact_path][0]}: {artifact_file_path}")
+    if not dry_run:
+        journal.record(artifact_file_path)
+
+
+def process_artifacts(artifactory_client, artifact_paths, jobs = 8, journal = None, dry_run = False):
+    if journal is None:
+        journal = Journal(None)
+    counters = {artifact_path: [0, 0] for artifact_path in artifact_paths}
+    counters_lock = threading.Lock()
+    failures = 0
+
+    executor = ThreadPoolExecutor(max_workers=jobs)
+    try:
+        listings = {executor.submit(list_artifacts, artifactory_client, artifact_path): artifact_path
+                    for artifact_path in artifact_paths}
+        file_tasks = {}
+        for listing in as_completed(listings):
+            artifact_path = listings[listing]
+            for artifact in listing.result():
+                artifact_file_path = f"{artifact_path}{artifact.uri}"
+                if artifact_file_path in journal.processed:
+                    continue
+                task = executor.submit(process_file, artifactory_client, artifact_file_path, artifact.size, journal, counters,
+                                       counters_lock, artifact_path, dry_run)
+                file_tasks[task] = artifact_file_path
+
+        for task in as_completed(file_tasks):
+            try:
+                task.result()
+            except (pyartifactory.exception.ArtifactoryError, requests.exceptions.RequestException) as e:
+                # Not recorded in the journal, so a next run will retry it
+                failures += 1
+                print(f"Failed to process {file_tasks[task]}: {e}", file=sys.stderr)
+    finally:
+        # On an interruption, drop the queued artifacts instead of still processing them
+        executor.shutdown(wait=True, cancel_futures=True)
+
+    return sum(count for count, _ in counters.values()), sum(size for _, size in counters.values()), failures
+
+
+def build_aql_query(artifact_paths, offset, limit, conditions = None, fields = ("repo", "path", "name", "type", "size")):
+    # Like the recursive listings of the REST mode, match everything below every path, folders included
+    if conditions is None:
+        conditions = {"created_by": "anonymous", "type": "any"}
+    if not artifact_paths:
+        # Artifactory rejects an empty "$or"
+        raise ValueError("No artifact paths to query")
+    criteria = []
+    for artifact_path in artifact_paths:
+        repo, _, folder = artifact_path.partition("/")
+        if folder == "":
+            criteria.append({"repo": repo})
+        else:
+            criteria.append({"repo": repo, "path": folder})
+            criteria.append({"repo": repo, "path": {"$match": f"{folder}/*"}})
+    query = {"$or": criteria, **conditions}
+    return (f"items.find({json.dumps(query)})"
+            f".include({','.join(json.dumps(field) for field in fields)})"
+            f'.sort({{"$asc":["repo","path","name"]}})'
+            f".offset({offset}).limit({limit})")
+
+
+def query_aql(artifactory_client, query):
+    # pyartifactory has no AQL support. Its request helpers are private, so the query is posted on the public session of
+    # the artifacts object (keeping the pooled connections) with the url and credentials of the client's settings
+    settings = artifactory_client.artifactory
+    auth = (settings.auth[0], settings.auth[1].get_secret_value()) if settings.auth is not None else None
+    response = artifactory_client.artifacts.session.post(f"{settings.url}/api/search/aql", data=query, auth=auth,
+                                                         headers={"Content-Type": "text/plain"}, verify=settings.verify,
+                                                         cert=settings.cert, timeout=settings.timeout)
+    response.raise_for_status()
+    return response.json()["results"]
+
+
+def aql_item_path(item):
+    if item["path"] in ("", "."):
+        return f"{item['repo']}/{item['name']}"
+    return f"{item['repo']}/{item['path']}/{item['name']}"
+
+
+def inside_deleted_folder(artifact_file_path, deleted_folders):
+    parent = artifact_file_path.rpartition("/")[0]
+    while parent:
+        if parent in deleted_folders:
+            return True
+        parent = parent.rpartition("/")[0]
+    return False
+
+
+def process_artifacts_aql(artifactory_client, artifact_paths, jobs = 8, page_size = 10000, dry_run = False):
+    number_deleted = 0
+    bytes_deleted = 0
+    failures = 0
+    deleted_folders = set()
+    offset = 0
+
+    executor = ThreadPoolExecutor(max_workers=jobs)
+    try:
+        while True:
+            page = query_aql(artifactory_client, build_aql_query(artifact_paths, offset, page_size))
+            batch = {}
+            for item in page:
+                artifact_file_path = aql_item_path(item)
+                # Deleting a folder deletes its content as well, which the sort order puts after the folder
+                if inside_deleted_folder(artifact_file_path, deleted_folders):
+                    continue
+                if item["type"] == "folder":
+                    deleted_folders.add(artifact_file_path)
+                number_deleted += 1
+                bytes_deleted += item.get("size", 0)
+                print(f"{number_deleted}: {artifact_file_path}")
+                if not dry_run:
+                    batch[executor.submit(delete_artifact, artifactory_client, artifact_file_path)] = artifact_file_path
+
+            # Wait for the batch, the next page is queried relative to what is left on the server
+            for task in as_completed(batch):
+                try:
+                    task.result()
+                except requests.exceptions.RequestException as e:
+                    failures += 1
+                    number_deleted -= 1
+                    deleted_folders.discard(batch[task])
+                    print(f"Failed to delete {batch[task]}: {e}", file=sys.stderr)
+
+            if len(page) < page_size:
+                break
+            # The deleted items dropped out of the result set, only the ones that failed to delete are still in front
+            offset = offset + len(page) if dry_run else failures
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+    return number_deleted, bytes_deleted, failures
+
+
+def iter_aql_items(artifactory_client, artifact_paths, conditions, fields, page_size = 10000):
+    offset = 0
+    while True:
+        page = query_aql(artifactory_client, build_aql_query(artifact_paths, offset, page_size, conditions, fields))
+        yield from page
+        if len(page) < page_size:
+            return
+        offset += len(page)
+
+
+SIZE_UNITS = {"": 1, "K": 1024, "M": 1024 ** 2, "G": 1024 ** 3, "T": 1024 ** 4}
+
+
+def parse_size(value):
+    if value is None or isinstance(value, int):
+        return value
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([KMGT]?)i?B?\s*", str(value), re.IGNORECASE)
+    if match is None:
+        raise ValueError(f"Invalid size {value!r}")
+    return int(float(match.group(1)) * SIZE_UNITS[match.group(2).upper()])
+
+
+def reference_path(reference):
+    # name/version@user/channel#revision is stored as user/name/version/channel/revision, with _ for a missing user/channel
+    reference, _, revision = reference.partition("#")
+    name_version, _, user_channel = reference.partition("@")
+    name, _, version = name_version.partition("/")
+    user, _, channel = user_channel.partition("/")
+    parts = (user or "_", name, version, channel or "_")
+    return parts + (revision,) if revision else parts
+
+
+def load_retention_policy(policy_file):
+    """Reads the retention policy file, see the USAGE header for its format"""
+    policy = load_yaml_file(policy_file) or {}
+    rules = {}
+    for rule in policy.get("rules", []):
+        rules[rule["path"].strip("/")] = {"unit_depth": int(rule.get("unit_depth", 3)),
+                                          "keep_newest": rule.get("keep_newest"),
+                                          "max_age_days": rule.get("max_age_days"),
+                                          "max_size": parse_size(rule.get("max_size"))}
+    if not rules:
+        raise ValueError(f"{policy_file} has no rules")
+    return {"rules": rules, "protect": [reference_path(reference) for reference in policy.get("protect", [])]}
+
+
+def parse_timestamp(value):
+    # Artifactory writes UTC as a trailing Z, which fromisoformat only accepts from Python 3.11 on
+    if value.endswith("Z"):
+        value = value[:-1] + "+00:00"
+    return datetime.fromisoformat(value)
+
+
+def folder_to_unit(folder, rules):
+    # The longest rule path containing the folder applies
+    rule_path = folder
+    while rule_path not in rules:
+        rule_path = rule_path.rpartition("/")[0]
+        if rule_path == "":
+            return None
+    parts = folder[len(rule_path) + 1:].split("/") if folder != rule_path else []
+    unit_depth = rules[rule_path]["unit_depth"]
+    if len(parts) < unit_depth:
+        # Files above the units, like the index files of a recipe, are left alone
+        return None
+    return f"{rule_path}/{'/'.join(parts[:unit_depth])}", rule_path
+
+
+def evaluate_retention_policy(policy, items, now = None):
+    """Groups the listed files into units (like a recipe revision) per rule and returns the deletion plan as a list of
+    (unit path, bytes, reason), with every file visited once and every unit sorted once within its group"""
+    if now is None:
+        now = datetime.now(timezone.utc)
+    rules = policy["rules"]
+    protected = set(policy["protect"])
+    protected_ancestors = {path[:depth] for path in protected for depth in range(1, len(path) + 1)}
+
+    # unit path -> [newest created, bytes, rule path]
+    units = {}
+    # folder -> (unit path, rule path), or None when no rule applies or the folder is above the units
+    unit_of_folder = {}
+    for item in items:
+        folder = item["repo"] if item["path"] in ("", ".") else f"{item['repo']}/{item['path']}"
+        folder_unit = unit_of_folder.get(folder, False)
+        if folder_unit is False:
+            folder_unit = folder_to_unit(folder, rules)
+            unit_of_folder[folder] = folder_unit
+        if folder_unit is None:
+            continue
+        unit_path, rule_path = folder_unit
+        created = parse_timestamp(item["created"])
+        unit = units.get(unit_path)
+        if unit is None:
+            units[unit_path] = [created, item.get("size", 0), rule_path]
+        else:
+            unit[1] += item.get("size", 0)
+            if created > unit[0]:
+                unit[0] = created
+
+    # rule path -> parent of the units -> unit paths; the units of one parent are the revisions that compete
+    groups = {}
+    for unit_path, (created, size, rule_path) in units.items():
+        groups.setdefault(rule_path, {}).setdefault(unit_path.rpartition("/")[0], []).append(unit_path)
+
+    def is_protected(unit_path):
+        relative = tuple(unit_path.split("/")[1:])  # drop the repository and compare against the reference layout
+        if relative in protected_ancestors:
+            return True
+        return any(relative[:depth] in protected for depth in range(1, len(relative) + 1))
+
+    plan = []
+    for rule_path, parents in groups.items():
+        rule = rules[rule_path]
+        cutoff = now - timedelta(days=rule["max_age_days"]) if rule["max_age_days"] is not None else None
+        keep = rule["keep_newest"]
+        candidates = []  # units that may still be deleted to satisfy the size cap
+        total_size = 0
+        for unit_paths in parents.values():
+            unit_paths.sort(key=lambda unit_path: units[unit_path][0], reverse=True)
+            for index, unit_path in enumerate(unit_paths):
+                created, size, _ = units[unit_path]
+                total_size += size
+                if is_protected(unit_path):
+                    continue
+                if keep is not None and index >= keep:
+                    reason = f"not in the newest {keep}"
+                elif cutoff is not None and created < cutoff:
+                    reason = f"older than {rule['max_age_days']} days"
+                else:
+                    candidates.append(unit_path)
+                    continue
+                plan.append((unit_path, size, reason))
+                total_size -= size
+
+        if rule["max_size"] is not None and total_size > rule["max_size"]:
+            candidates.sort(key=lambda unit_path: units[unit_path][0])
+            for unit_path in candidates:
+                if total_size <= rule["max_size"]:
+                    break
+                size = units[unit_path][1]
+                plan.append((unit_path, size, f"over the size cap of {rule['max_size']} bytes"))
+                total_size -= size
+
+    plan.sort()
+    return plan
+
+
+def apply_retention_policy(artifactory_client, policy, jobs = 8, page_size = 10000, dry_run = False):
+    items = iter_aql_items(artifactory_client, list(policy["rules"]), {"type": "file"}, ("repo", "path", "name", "size", "created"),
+                           page_size)
+    plan = evaluate_retention_policy(policy, items)
+    for index, (unit_path, size, reason) in enumerate(plan):
+        print(f"{index + 1}: {unit_path} ({size} bytes, {reason})")
+    bytes_planned = sum(size for _, size, _ in plan)
+    if dry_run:
+        return len(plan), bytes_planned, 0
+
+    failures = 0
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        tasks = {executor.submit(delete_artifact, artifactory_client, unit_path): (unit_path, size) for unit_path, size, _ in plan}
+        for task in as_completed(tasks):
+            try:
+                task.result()
+            except requests.exceptions.RequestException as e:
+                failures += 1
+                bytes_planned -= tasks[task][1]
+                print(f"Failed to delete {tasks[task][0]}: {e}", file=sys.stderr)
+    return len(plan) - failures, bytes_planned, failures
+
+
+def main(argv = None):
+    parser = argparse.ArgumentParser(description="Delete the artifacts created by anonymous from the Cura Artifactory")
+    parser.add_argument("username", type=str, help="Artifactory user name")
+    parser.add_argument("password", type=str, help="Artifactory password")
+    parser.add_argument("--jobs", type=positive_int, default=8, help="Number of concurrent requests to Artifactory")
+    parser.add_argument("--journal", type=str, default=DEFAULT_JOURNAL,
+                        help="File recording the processed artifacts, to resume an interrupted run")
+    parser.add_argument("--base-url", type=str, default=ARTIFACTORY_BASE_URL, help="Artifactory base url")
+    parser.add_argument("--mode", type=str, choices=["aql", "rest"], default=None,
+                        help="Find the artifacts with paged AQL queries (default), or by listing the paths and requesting the info of every artifact")
+    parser.add_argument("--page-size", type=positive_int, default=10000, help="Number of artifacts per AQL page")
+    parser.add_argument("--dry-run", action="store_true", help="Only report the artifacts that would be deleted")
+    parser.add_argument("--policy", type=str, help="Retention policy file, selects the artifacts to delete instead of their creator")
+    args = parser.parse_args(argv)
+    if args.policy and args.mode is not None:
+        # The policy needs the creation dates and sizes of all files at once, which only the AQL listing provides
+        parser.error("--policy always uses AQL, it can't be combined with --mode")
+
+    policy = None
+    if args.policy:
+        try:
+            policy = load_retention_policy(args.policy)
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"ERROR: Invalid retention policy {args.policy}: {e}", file=sys.stderr)
+            sys.exit(1)
 
-    return sequence_nr
+    artifactory_client = initialize_artifactory(args.username, args.password, args.base_url, args.jobs)
 
+    failures = None
+    if policy is not None:
+        number_files_deleted, bytes_deleted, failures = apply_retention_policy(artifactory_client, policy, args.jobs, args.page_size,
+                                                                               args.dry_run)
+    elif args.mode in (None, "aql"):
+        try:
+            number_files_deleted, bytes_deleted, failures = process_artifacts_aql(artifactory_client, ARTIFACT_PATHS, args.jobs,
+                                                                                  args.page_size, args.dry_run)
+        except requests.exceptions.HTTPError as e:
+            print(f"AQL query failed, falling back to the REST mode: {e}", file=sys.stderr)
 
-def main():
-    artifactory_client = initialize_artifactory()
+    if failures is None:
+        journal = Journal(None if args.dry_run else args.journal)
+        if journal.processed:
+            print(f"Resuming, skipping {len(journal.processed)} already processed artifacts")
+        try:
+            number_files_deleted, bytes_deleted, failures = process_artifacts(artifactory_client, ARTIFACT_PATHS, args.jobs, journal,
+                                                                              args.dry_run)
+        finally:
+            journal.close()
+        if failures == 0:
+            journal.discard()
 
-    for (artifact_path, include_depth_2) in ARTIFACT_PATHS.items():
-        number_files_deleted = 0
-        number_files_deleted = process_artifact(artifactory_client, artifact_path, number_files_deleted, depth=1)
-        if (include_depth_2):
-            process_artifact(artifactory_client, artifact_path, number_files_deleted, depth=2)
+    if args.dry_run:
+        print(f"Would delete {number_files_deleted} artifacts, {bytes_deleted} bytes")
+    else:
+        print(f"Deleted {number_files_deleted} artifacts, {bytes_deleted} bytes")
+    if failures > 0:
+        print(f"Failed to process {failures} artifacts, run again to retry them", file=sys.stderr)
+        sys.exit(1)
 
 if __name__ == "__main__":
     main()
@@ -2,32 +2,69 @@ import argparse
 import os
 import subprocess
 import json
+import tempfile
+
+from concurrent.futures import ThreadPoolExecutor
+
+from workflow_context import positive_int
+
+
+def target_remote(args, package):
+    return "cura-private-conan2" if (args.private or "@internal" in package) else "cura-conan2"
+
+
+def list_pattern(package):
+    # Select what 'conan upload <package>' selects: the recipe revision(s) and the latest revision of every binary
+    return package if ":" in package else f"{package}:*#latest"
+
+
+def upload_batch(remote, package_list):
+    # A single upload invocation for all the references going to this remote, so authentication,
+    # connection setup and Conan's startup are paid once
+    with tempfile.TemporaryDirectory() as temp_dir:
+        list_file = os.path.join(temp_dir, "pkglist.json")
+        with open(list_file, "w") as f:
+            json.dump({"Local Cache": package_list}, f)
+        subprocess.run(["conan", "upload", "--list", list_file, "-r", remote, "-c"], check=True)
 
 
 def upload_conan_package(args):
-    packages_json = subprocess.run(["conan", "list", "-c", "-f", "json", args.package], capture_output=True, check=True).stdout
+    packages_json = subprocess.run(["conan", "list", "-c", "-f", "json", list_pattern(args.package)], capture_output=True, check=True).stdout
     packages = json.loads(packages_json)
 
+    # Group the references by target remote: remote -> {reference: details}
+    batches = {}
+    batch_sizes = {}
     for package, details in packages["Local Cache"].items():
-        package_recipes = []
+        remote = target_remote(args, package)
+        batches.setdefault(remote, {})[package] = details
 
-        if "revisions" in details:
-          package_recipes = [f"{package}#{revision}" for revision in details["revisions"]]
-        else:
-          package_recipes = [package]
+        package_recipes = [f"{package}#{revision}" for revision in details.get("revisions", {})] or [package]
+        for package_recipe in package_recipes:
+            print(f"Upload package {package_recipe} to {remote}")
+        batch_sizes[remote] = batch_sizes.get(remote, 0) + len(package_recipes)
 
-        for package in package_recipes:
-            remote = "cura-private-conan2" if (args.private or "@internal" in package) else "cura-conan2"
+    for remote, batch_size in batch_sizes.items():
+        print(f"Batch upload to {remote}: {batch_size} recipe revision(s) in one conan upload")
 
-            print(f"Upload package {package} to {remote}")
-            if not args.dry_run:
-                subprocess.run(["conan", "upload", package, "-r", remote, "-c"], check=True)
+    if args.dry_run or not batches:
+        return
 
-if __name__ == "__main__":
+    with ThreadPoolExecutor(max_workers=args.jobs) as executor:
+        for future in [executor.submit(upload_batch, remote, package_list) for remote, package_list in batches.items()]:
+            future.result()
+
+
+def main(argv = None):
     parser = argparse.ArgumentParser(description = 'Upload the given local package(s) to the proper Cura conan repository')
     parser.add_argument('package', type = str, help = 'Package name, fully specific or containing wildards')
     parser.add_argument('--dry-run', action='store_true', help = 'Do not upload the package but just show what would happen')
     parser.add_argument('--private', action='store_true', help = 'Always upload the package to the private repository')
+    parser.add_argument('--jobs', type = positive_int, default = 2, help = 'Number of remotes uploaded to in parallel')
 
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
     upload_conan_package(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,73 +1,228 @@
 import argparse
+import hashlib
 import os
 import subprocess
 import re
-import yaml
+import sys
 import json
 
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 
-def upload_changed_recipes(args):
-    configs = {}
+from workflow_context import positive_int
+from yaml_loader import load_yaml_file
+
+
+def find_package_dir(file_path):
+    # The package folder is the closest parent holding the config.yml listing the versions
+    for parent in file_path.parents:
+        if parent.joinpath("config.yml").exists():
+            return parent
+    # Fall back to the <package>/<folder>/<file> layout
+    return file_path.parent.parent
 
-    for file in args.Files:
+
+def changed_folders(files):
+    # Maps each package folder to the set of changed version folders, or None when a file outside
+    # of the version folders (like config.yml itself) changed, which affects all versions
+    packages = {}
+    for file in files:
         file_path = Path(file)
-        config_path = file_path.parent.parent.joinpath("config.yml")
-        package_name = file_path.parent.parent.name
-        configs[package_name] = config_path
+        package_dir = find_package_dir(file_path)
+        relative_parts = file_path.relative_to(package_dir).parts
+        if len(relative_parts) < 2:
+            packages[package_dir] = None
+        elif package_dir not in packages:
+            packages[package_dir] = {relative_parts[0]}
+        elif packages[package_dir] is not None:
+            packages[package_dir].add(relative_parts[0])
+    return packages
+
+
+def recipe_content_hash(recipe_folder, reference):
+    # Hash of every file in the version folder, and of the reference it is exported as
+    content_hash = hashlib.sha256(reference.encode())
+    for root, dirs, files in os.walk(recipe_folder):
+        dirs[:] = sorted(d for d in dirs if d != "__pycache__")
+        for file in sorted(files):
+            file_path = Path(root, file)
+            content_hash.update(file_path.relative_to(recipe_folder).as_posix().encode() + b"\0")
+            content_hash.update(file_path.read_bytes())
+            content_hash.update(b"\0")
+    return content_hash.hexdigest()
+
+
+def load_revision_index(path):
+    if path is None or not os.path.exists(path):
+        return {}
+    with open(path, "r") as f:
+        return json.load(f)
+
+
+def save_revision_index(path, index):
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w") as f:
+        json.dump(index, f, indent=2, sort_keys=True)
+    os.replace(temp_path, path)
+
+
+def revision_on_remote(reference, revision, remote):
+    # The index only knows what this job uploaded before, the revision could have been removed from the remote since
+    try:
+        list_output = subprocess.run(["conan", "list", f"{reference}#{revision}", "-r", remote, "-f", "json"],
+                                     capture_output=True, check = True).stdout
+        found = json.loads(list_output).get(remote, {})
+    except (subprocess.CalledProcessError, ValueError, AttributeError):
+        return False
+    return any(isinstance(recipe, dict) and revision in recipe.get("revisions", {}) for recipe in found.values())
+
+
+def export_recipe(name, version, conanfile, user, channel):
+    conan_export = ["conan", "export", str(conanfile), "--name", name, "--version", version, "-f", "json"]
+
+    if user != "":
+        conan_export += ["--user", user]
+    if channel != "":
+        conan_export += ["--channel", channel]
+
+    export_output = subprocess.run(conan_export, capture_output=True, check = True).stdout
+    return json.loads(export_output)["reference"]
+
 
-    packages = []
+def upload_recipe(package_reference, remote):
+    subprocess.run(["conan", "upload", package_reference, "-r", remote, "-c"], capture_output=True, check = True)
+    return package_reference.split("#")[0]
+
+
+def describe_failure(ex):
+    if isinstance(ex, subprocess.CalledProcessError):
+        output = b"\n".join(stream for stream in (ex.stdout, ex.stderr) if stream)
+        return f"{' '.join(ex.cmd[:2])} failed with return code {ex.returncode}\n{output.decode(errors='replace')}"
+    return str(ex)
+
+
+def upload_changed_recipes(args):
     is_release = "main" in args.branch
     channel = "" if is_release else re.match(r"(CURA|NP|PP)-\d*", args.branch)[0].lower().replace("-", "_")
     user = "" if is_release else "ultimaker"
 
-    for name, config_file in configs.items():
+    revision_index = load_revision_index(args.revision_index)
+    remote_index = revision_index.setdefault(args.remote, {})
+
+    # Every (name, version) to export, in a fixed order so the summary is deterministic
+    recipes = []
+    skipped = []
+    for package_dir, folders in changed_folders(args.Files).items():
+        name = package_dir.name
+        config_file = package_dir.joinpath("config.yml")
         if not config_file.exists():
             continue
 
         actual_user = user
         actual_channel = channel
 
-        versions = {}
-        with open(config_file, "r") as f:
-            config = yaml.safe_load(f)
-            versions = config["versions"]
-            if "user" in config:
-                actual_user = config["user"]
-            if "channel" in config:
-                actual_channel = config["channel"]
+        config = load_yaml_file(config_file, keys=("versions", "user", "channel"))
+        versions = config["versions"]
+        if "user" in config:
+            actual_user = config["user"]
+        if "channel" in config:
+            actual_channel = config["channel"]
 
         for version, data in versions.items():
-            conanfile = config_file.parent.joinpath(data["folder"], "conanfile.py")
-
-            conan_export = ["conan", "export", str(conanfile), "--name", name, "--version", version, "-f", "json"]
+            version = str(version)
+            folder = Path(data["folder"])
+            if folders is not None and folder.parts[0] not in folders:
+                skipped.append((f"{name}/{version}", f"folder '{data['folder']}' not changed"))
+                continue
 
+            reference = f"{name}/{version}"
             if actual_user != "":
-                conan_export += ["--user", actual_user]
-            if actual_channel != "":
-                conan_export += ["--channel", actual_channel]
+                reference += f"@{actual_user}"
+                if actual_channel != "":
+                    reference += f"/{actual_channel}"
+            content_hash = recipe_content_hash(package_dir.joinpath(folder), reference)
+            conanfile = package_dir.joinpath(folder, "conanfile.py")
+            recipes.append(((name, version, conanfile, actual_user, actual_channel), reference, content_hash))
 
+    # Unchanged recipes are only skipped when the remote still has the revision the index recorded
+    indexed = {index: remote_index[reference]["revision"] for index, (_, reference, content_hash) in enumerate(recipes)
+               if reference in remote_index and remote_index[reference]["content_hash"] == content_hash}
+    if indexed:
+        with ThreadPoolExecutor(max_workers=args.jobs) as list_pool:
+            on_remote = dict(zip(indexed, list_pool.map(
+                lambda index: revision_on_remote(recipes[index][1], indexed[index], args.remote), indexed)))
+        for index, revision in indexed.items():
+            reference = recipes[index][1]
+            if on_remote[index]:
+                skipped.append((reference, f"unchanged, revision {revision} already on {args.remote}"))
+            else:
+                print(f"Revision {revision} of {reference} is no longer on {args.remote}, uploading it again")
+                del remote_index[reference]
+        recipes = [recipe for index, recipe in enumerate(recipes) if not on_remote.get(index, False)]
+
+    # Conan doesn't support concurrent writes to its cache, so the recipes are exported one after another; each
+    # recipe's upload is started in a bounded pool as soon as it is exported, overlapping with the next exports
+    packages = [None] * len(recipes)
+    failures = [None] * len(recipes)
+    with ThreadPoolExecutor(max_workers=args.jobs) as upload_pool:
+        uploads = {}
+        for index, (recipe, _, _) in enumerate(recipes):
             try:
-                export_output = subprocess.run(conan_export, capture_output=True, check = True).stdout
-            except subprocess.CalledProcessError as ex:
-                print(ex.stdout)
-                print(ex.stderr)
-                raise ex
-            package_reference = json.loads(export_output)["reference"]
-            subprocess.run(["conan", "upload", package_reference, "-r", args.remote, "-c"], check = True)
-            packages.append(package_reference.split("#")[0])
+                package_reference = export_recipe(*recipe)
+            except Exception as ex:
+                failures[index] = ("export", describe_failure(ex))
+                continue
+            print(f"Exported {package_reference}")
+            uploads[upload_pool.submit(upload_recipe, package_reference, args.remote)] = (index, package_reference)
+
+        for upload in as_completed(uploads):
+            index, package_reference = uploads[upload]
+            try:
+                packages[index] = upload.result()
+            except Exception as ex:
+                failures[index] = ("upload", describe_failure(ex))
+                continue
+            print(f"Uploaded {packages[index]} to {args.remote}")
+            _, reference, content_hash = recipes[index]
+            remote_index[reference] = {"content_hash": content_hash, "revision": package_reference.partition("#")[2]}
+
+    if args.revision_index is not None:
+        save_revision_index(args.revision_index, revision_index)
 
     summary_env = os.environ["GITHUB_STEP_SUMMARY"]
     with open(summary_env, "w") as f:
         f.writelines(f"# Created and Uploaded to remote {args.remote}\n")
         for package in packages:
-            f.writelines(f"{package}\n")
+            if package is not None:
+                f.writelines(f"{package}\n")
+        if skipped:
+            f.writelines("# Skipped\n")
+            for reference, reason in skipped:
+                f.writelines(f"{reference}: {reason}\n")
+        if any(failures):
+            f.writelines("# Failed\n")
+            for (_, reference, _), failure in zip(recipes, failures):
+                if failure is not None:
+                    f.writelines(f"{reference} ({failure[0]})\n")
 
-if __name__ == "__main__":
+    if any(failures):
+        for (_, reference, _), failure in zip(recipes, failures):
+            if failure is not None:
+                print(f"Failed to {failure[0]} {reference}: {failure[1]}", file=sys.stderr)
+        sys.exit(1)
+
+
+def main(argv = None):
     parser = argparse.ArgumentParser(description = 'Upload all the changed recipes in the recipe folder')
     parser.add_argument('--branch', type = str, help = 'Development branch')
     parser.add_argument('--remote', type = str, help = 'Name of the remote conan repository')
+    parser.add_argument('--jobs', type = positive_int, default = 4, help = 'Maximum number of concurrent uploads, which overlap with the exports; the exports always run one after another')
+    parser.add_argument('--revision-index', type = str, help = 'JSON file recording the recipe contents already uploaded per remote; unchanged versions still on the remote are skipped')
     parser.add_argument("Files", metavar="FILES", type=str, nargs="+", help="Files or directories to format")
 
-    args = parser.parse_args()
+    args = parser.parse_args(argv)
     upload_changed_recipes(args)
+
+
+if __name__ == "__main__":
+    main()
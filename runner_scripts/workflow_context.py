@@ -0,0 +1,9 @@
+import argparse
+
+
+def positive_int(value):
+    """argparse type for counts like --jobs, which must be 1 or more"""
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"{value} is not 1 or more")
+    return number
@@ -0,0 +1,186 @@
+"""
+Shared loader for conandata.yml, config.yml and the other YAML files read by the runner scripts.
+
+- Parses with libyaml's CSafeLoader when PyYAML was built with it, and falls back to the pure Python SafeLoader.
+- With `keys`, only the top level sections holding those (dotted) keys are parsed, e.g. "version" or
+  "pyinstaller.blacklist", and the result only contains those keys, in the same nesting as in the file.
+- Parsed results are cached on disk, as JSON keyed by the absolute path and the requested keys. An entry is reused
+  as long as the file's mtime and size are unchanged, or its content hash is unchanged when only the mtime changed
+  (like after a fresh checkout), so all scripts in a job parse a file once. Results JSON can't represent exactly (like
+  dates, or keys that aren't strings) aren't cached.
+
+The cache lives in $XDG_CACHE_HOME/cura-workflows/yaml; set CURA_WORKFLOWS_YAML_CACHE to use another directory, or
+to 0 to disable it. The runners are shared, so the cache is only used when the directory belongs to the current user
+and nobody else can write to it.
+"""
+
+import json
+import os
+import re
+import stat
+import sys
+
+DEFAULT_CACHE_DIR = os.path.join(os.environ.get("XDG_CACHE_HOME", os.path.join(os.path.expanduser("~"), ".cache")),
+                                 "cura-workflows", "yaml")
+CACHE_FORMAT = 2
+
+# Anchors, aliases and tags can tie the top level sections together or change how they are read. Both patterns are
+# compiled on first use, the runner scripts that don't read YAML files don't pay for it
+_ANCHOR_ALIAS_OR_TAG = r"(?<![^\s\[{,:])[&*!]\S"
+_TOP_LEVEL_KEY = r"^(['\"]?)([\w./$][^:'\"#]*?)\1\s*:(?:\s|$)"
+
+
+def cache_dir():
+    cache_setting = os.environ.get("CURA_WORKFLOWS_YAML_CACHE")
+    if cache_setting == "0":
+        return None
+    return cache_setting or DEFAULT_CACHE_DIR
+
+
+def safe_load(text):
+    # Imported on first use, the runner scripts that don't read YAML files don't pay for it
+    try:
+        import yaml
+    except ImportError as exc:
+        raise SystemExit("PyYAML is required (pip install pyyaml).") from exc
+    loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+    return yaml.load(text, Loader=loader)
+
+
+def split_top_level(text):
+    """Returns {top level key: the text of its section}, or None when the document can't safely be split"""
+    # Plain substring checks first, they are much faster than the regular expression on a large file
+    if "\t" in text or text.startswith(("---", "...", "%")) or any(marker in text for marker in ("\n---", "\n...", "\n%")):
+        return None
+    if any(character in text for character in "&*!") and re.search(_ANCHOR_ALIAS_OR_TAG, text):
+        return None
+    top_level_key = re.compile(_TOP_LEVEL_KEY)
+    sections = {}
+    current = None
+    for line in text.splitlines(keepends=True):
+        if line[:1] in ("", " ", "\n", "\r", "#"):
+            if current is not None:
+                sections[current].append(line)
+            continue
+        match = top_level_key.match(line)
+        if match is None or match.group(2) in sections:
+            return None
+        current = match.group(2)
+        sections[current] = [line]
+    return {key: "".join(lines) for key, lines in sections.items()}
+
+
+def select_keys(data, keys):
+    """The part of data holding the dotted keys, in the same nesting"""
+    selected = {}
+    for key in keys:
+        source = data
+        target = selected
+        parts = key.split(".")
+        for index, part in enumerate(parts):
+            if not isinstance(source, dict) or part not in source:
+                break
+            if index == len(parts) - 1:
+                target[part] = source[part]
+            else:
+                source = source[part]
+                target = target.setdefault(part, {})
+    return selected
+
+
+def parse_yaml(text, keys = None):
+    if keys is None:
+        return safe_load(text)
+    sections = split_top_level(text)
+    if sections is None:
+        data = safe_load(text)
+    else:
+        wanted = dict.fromkeys(key.split(".")[0] for key in keys)
+        data = safe_load("".join(sections[key] for key in wanted if key in sections))
+    return select_keys(data or {}, keys)
+
+
+def _cache_file(directory, path, keys):
+    import hashlib
+    key = hashlib.sha256(f"{path}\n{','.join(keys or ['*'])}".encode()).hexdigest()
+    return os.path.join(directory, f"{key}.json")
+
+
+def _is_private(file_stat):
+    # Owned by the current user and not writable by anyone else; there are no owners to check on Windows
+    if not hasattr(os, "getuid"):
+        return True
+    return file_stat.st_uid == os.getuid() and not file_stat.st_mode & (stat.S_IWGRP | stat.S_IWOTH)
+
+
+def _private_cache_dir(directory):
+    """Creates the cache directory when needed; returns whether it can be trusted"""
+    try:
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        directory_stat = os.stat(directory)
+    except OSError as e:
+        print(f"Warning: Not using YAML cache {directory}: {e}", file=sys.stderr)
+        return False
+    if not _is_private(directory_stat):
+        print(f"Warning: Not using YAML cache {directory}, it belongs to another user or others can write to it",
+              file=sys.stderr)
+        return False
+    return True
+
+
+def _json_exact(data):
+    # Whether JSON gives back the same data, e.g. not for dates, or for keys that aren't strings
+    if isinstance(data, dict):
+        return all(isinstance(key, str) and _json_exact(value) for key, value in data.items())
+    if isinstance(data, list):
+        return all(_json_exact(item) for item in data)
+    return data is None or isinstance(data, (str, int, float, bool))
+
+
+def load_yaml_file(path, keys = None):
+    """Parses the YAML file, or only the given dotted keys of it, through the on-disk cache"""
+    path = os.path.abspath(path)
+    keys = tuple(keys) if keys is not None else None
+    file_stat = os.stat(path)
+    directory = cache_dir()
+    if directory is not None and not _private_cache_dir(directory):
+        directory = None
+    cache_file = _cache_file(directory, path, keys) if directory is not None else None
+
+    cached = None
+    if cache_file is not None:
+        try:
+            with open(cache_file, "r", encoding="utf-8") as f:
+                if not _is_private(os.fstat(f.fileno())):
+                    raise ValueError("written by another user")
+                cached = json.load(f)
+            if cached.get("format") != CACHE_FORMAT or cached.get("path") != path or \
+                    cached.get("keys") != (list(keys) if keys is not None else None):
+                cached = None
+        except (OSError, AttributeError, ValueError):
+            cached = None
+    if cached is not None and cached["mtime_ns"] == file_stat.st_mtime_ns and cached["size"] == file_stat.st_size:
+        return cached["data"]
+
+    import hashlib
+    with open(path, "rb") as f:
+        content = f.read()
+    content_hash = hashlib.sha256(content).hexdigest()
+    if cached is not None and cached["sha256"] == content_hash:
+        data = cached["data"]
+    else:
+        data = parse_yaml(content.decode("utf-8"), keys)
+
+    if cache_file is not None and _json_exact(data):
+        entry = {"format": CACHE_FORMAT, "path": path, "keys": list(keys) if keys is not None else None,
+                 "mtime_ns": file_stat.st_mtime_ns, "size": file_stat.st_size, "sha256": content_hash, "data": data}
+        try:
+            # Write to a temporary file first so concurrent jobs never read a partial entry
+            temp_file = f"{cache_file}.{os.getpid()}.tmp"
+            # Only readable by this user, whatever the umask
+            with open(os.open(temp_file, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "w", encoding="utf-8") as f:
+                json.dump(entry, f, separators=(",", ":"))
+            os.replace(temp_file, cache_file)
+        except OSError as e:
+            print(f"Warning: Could not write YAML cache {cache_file}: {e}", file=sys.stderr)
+    return data
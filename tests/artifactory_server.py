@@ -0,0 +1,164 @@
+"""
+A stand-in for the Artifactory REST API, serving an in-memory tree from a local HTTP server.
+
+Supports the requests the sanitizer makes: listing a folder recursively, the info of an artifact, deleting one, and
+the AQL queries built by build_aql_query.
+"""
+
+import fnmatch
+import json
+import re
+import threading
+import urllib.parse
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+CREATED = "2024-01-01T00:00:00.000Z"
+
+
+class ArtifactoryServer:
+    def __init__(self, artifacts):
+        # "repo/folder/file" -> {"size": ..., "created_by": ..., "created": ...}; the folders are derived from the files
+        self.items = {}
+        for path, artifact in artifacts.items():
+            self.items[path] = {"type": "file", "size": 0, "created_by": "ultimaker", "created": CREATED, **artifact}
+            parent = path.rpartition("/")[0]
+            while parent:
+                self.items.setdefault(parent, {"type": "folder", "size": 0, "created_by": "ultimaker", "created": CREATED})
+                parent = parent.rpartition("/")[0]
+        self.requests = []
+        self.authorizations = set()  # the Authorization headers received
+        self.failing = set()  # paths whose deletion fails with a server error
+        self.aql_status = 200  # another status refuses the AQL queries
+        self.lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self._server.server_address[1]}/artifactory"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def files(self):
+        return sorted(path for path, item in self.items.items() if item["type"] == "file")
+
+    def count(self, method, prefix = ""):
+        return sum(1 for request_method, path in self.requests if request_method == method and path.startswith(prefix))
+
+    def below(self, path):
+        return sorted(item_path for item_path in self.items if item_path.startswith(f"{path}/"))
+
+    def list_folder(self, path):
+        if path not in self.items or self.items[path]["type"] != "folder":
+            return 404, {"errors": [{"status": 404, "message": "Not found"}]}
+        files = [{"uri": item_path[len(path):], "size": self.items[item_path]["size"], "lastModified": CREATED,
+                  "folder": self.items[item_path]["type"] == "folder"} for item_path in self.below(path)]
+        return 200, {"uri": f"{self.url}/api/storage/{path}", "created": CREATED, "files": files}
+
+    def info(self, path):
+        item = self.items.get(path)
+        if item is None:
+            return 404, {"errors": [{"status": 404, "message": "Not found"}]}
+        repo, _, folder = path.partition("/")
+        info = {"repo": repo, "path": f"/{folder}", "created": item["created"], "createdBy": item["created_by"],
+                "uri": f"{self.url}/api/storage/{path}"}
+        if item["type"] == "folder":
+            info["children"] = []
+        else:
+            info["size"] = item["size"]
+        return 200, info
+
+    def delete(self, path):
+        if path in self.failing:
+            return 500, {"errors": [{"status": 500, "message": "Failed"}]}
+        if path not in self.items:
+            return 404, {"errors": [{"status": 404, "message": "Not found"}]}
+        for item_path in [path, *self.below(path)]:
+            del self.items[item_path]
+        return 204, None
+
+    def aql(self, query):
+        if self.aql_status != 200:
+            return self.aql_status, {"errors": [{"status": self.aql_status, "message": "AQL refused"}]}
+        match = re.fullmatch(r"items\.find\((.*)\)\.include\((.*)\)\.sort\((.*)\)\.offset\((\d+)\)\.limit\((\d+)\)", query)
+        criteria = json.loads(match.group(1))
+        fields = json.loads(f"[{match.group(2)}]")
+        alternatives = criteria.pop("$or")
+
+        def matches(repo, folder, item):
+            if criteria.get("created_by", item["created_by"]) != item["created_by"]:
+                return False
+            if criteria.get("type", "any") not in ("any", item["type"]):
+                return False
+            for alternative in alternatives:
+                pattern = alternative.get("path", folder)
+                if isinstance(pattern, dict):
+                    pattern = pattern["$match"]
+                if alternative["repo"] == repo and fnmatch.fnmatchcase(folder, pattern):
+                    return True
+            return False
+
+        results = []
+        for path, item in self.items.items():
+            repo, _, relative = path.partition("/")
+            if not relative:
+                continue
+            folder, _, name = relative.rpartition("/")
+            folder = folder or "."
+            if matches(repo, folder, item):
+                values = {"repo": repo, "path": folder, "name": name, **item}
+                results.append({field: values[field] for field in fields})
+        results.sort(key=lambda result: (result["repo"], result["path"], result["name"]))
+        offset, limit = int(match.group(4)), int(match.group(5))
+        return 200, {"results": results[offset:offset + limit]}
+
+    def handle(self, method, path, query, body):
+        if method == "POST" and path == "api/search/aql":
+            return self.aql(body)
+        if method == "GET" and path.startswith("api/storage/"):
+            if "list" in query:
+                return self.list_folder(path[len("api/storage/"):].rstrip("/"))
+            return self.info(path[len("api/storage/"):])
+        if method == "DELETE":
+            return self.delete(path)
+        return 404, {"errors": [{"status": 404, "message": "Not found"}]}
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def respond(self, method):
+                url = urllib.parse.urlsplit(self.path)
+                path = urllib.parse.unquote(url.path)[len("/artifactory/"):]
+                body = self.rfile.read(int(self.headers.get("Content-Length", 0))).decode()
+                with server.lock:
+                    server.requests.append((method, path))
+                    server.authorizations.add(self.headers.get("Authorization"))
+                    status, response = server.handle(method, path, urllib.parse.parse_qs(url.query, keep_blank_values=True), body)
+                content = json.dumps(response).encode() if response is not None else b""
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(content)))
+                self.end_headers()
+                self.wfile.write(content)
+
+            def do_GET(self):
+                self.respond("GET")
+
+            def do_POST(self):
+                self.respond("POST")
+
+            def do_DELETE(self):
+                self.respond("DELETE")
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
@@ -0,0 +1,114 @@
+"""
+Benchmark the blacklist matching walk of cleanup_distribution on a synthetic distribution tree, against matching every
+path with every blacklist entry like it used to. Nothing is deleted; both only plan the removals.
+
+Usage:
+    python tests/benchmark_cleanup_distribution.py [--files N] [--entries N] [--repeat N]
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+from pathlib import Path
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "runner_scripts"))
+
+from cleanup_distribution import BlacklistMatcher, collect_removal_plan
+
+PACKAGES = ["pyqt6", "numpy", "scipy", "shapely", "trimesh", "networkx", "cryptography", "certifi", "keyring", "pyclipper",
+            "pynest2d", "pyarcus", "pysavitar", "charon", "uranium", "cura", "sentry_sdk", "requests", "urllib3", "zeroconf"]
+FOLDERS = ["qt6", "plugins", "qml", "translations", "resources", "lib", "bin", "tests", "data", "include", "core", "linalg"]
+EXTENSIONS = [".py", ".pyc", ".so", ".qml", ".qm", ".json", ".txt", ".dll", ".dylib", ".pak"]
+OSES = ["Windows", "Linux", "Macos"]
+
+
+def make_tree(root, count, rng):
+    # <package>/<folder>/.../<name><extension>, up to four folders deep, with about 50 files per folder
+    created = 0
+    while created < count:
+        folder = root.joinpath(rng.choice(PACKAGES), *(rng.choice(FOLDERS) for _ in range(rng.randrange(1, 5))),
+                               f"module{rng.randrange(1000)}")
+        folder.mkdir(parents=True, exist_ok=True)
+        for _ in range(min(50, count - created)):
+            name = f"{rng.choice(['', 'lib', 'qt', 'test_'])}file{created}{rng.choice(EXTENSIONS)}"
+            folder.joinpath(name).touch()
+            created += 1
+
+
+def make_entries(count, rng):
+    # Like the pyinstaller.blacklist of Cura's conandata.yml: one to three substrings, some for a single OS
+    words = PACKAGES + FOLDERS + [extension.lstrip(".") for extension in EXTENSIONS] + ["quick3d", "webengine", "test_", "libqt"]
+    entries = []
+    for _ in range(count):
+        entry = {"patterns": rng.sample(words, rng.randrange(1, 4))}
+        if rng.random() < 0.3:
+            entry["oses"] = [rng.choice(OSES)]
+        entries.append(entry)
+    return entries
+
+
+def plan_with_path_matches(dist_dir, entries, current_os):
+    # The walk before the matcher: every directory and file compared with every entry, one substring search each
+    def path_matches(path, entry):
+        patterns = entry if isinstance(entry, list) else entry.get("patterns", [])
+        normalised = path.as_posix().lower()
+        return all(part in normalised for part in patterns)
+
+    plan = []
+    for root, dirs, files in os.walk(dist_dir, topdown=True):
+        dirs.sort()
+        root_path = Path(root)
+        for names, is_dir in ((sorted(dirs), True), (sorted(files), False)):
+            for name in names:
+                target = root_path / name
+                for entry in entries:
+                    oses = entry.get("oses") if isinstance(entry, dict) else None
+                    if oses and current_os not in oses:
+                        continue
+                    if path_matches(target, entry):
+                        plan.append(target)
+                        if is_dir:
+                            dirs.remove(name)
+                        break
+    return plan
+
+
+def best_time(function, repeat):
+    times = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        times.append(time.perf_counter() - started)
+    return min(times), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the blacklist matching of cleanup_distribution")
+    parser.add_argument("--files", type=int, default=100000, help="Files in the synthetic tree (default: 100000)")
+    parser.add_argument("--entries", type=int, default=60, help="Blacklist entries (default: 60)")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs, the fastest one counts (default: 3)")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    entries = make_entries(args.entries, rng)
+    with tempfile.TemporaryDirectory(prefix="cleanup-benchmark-") as directory:
+        dist_dir = Path(directory)
+        make_tree(dist_dir, args.files, rng)
+        print(f"{args.files} files, {args.entries} blacklist entries")
+
+        matcher_time, plan = best_time(lambda: collect_removal_plan(dist_dir, BlacklistMatcher(entries, "Linux")), args.repeat)
+        print(f"BlacklistMatcher walk          {matcher_time * 1000:8.1f}ms, {len(plan)} removals")
+        path_matches_time, old_plan = best_time(lambda: plan_with_path_matches(dist_dir, entries, "Linux"), args.repeat)
+        print(f"path_matches per entry         {path_matches_time * 1000:8.1f}ms ({path_matches_time / matcher_time:.1f}x)")
+        if sorted(item.path for item in plan) != sorted(old_plan):
+            print("Error: the two walks planned different removals", file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Benchmark deduplicate_packages on synthetic references, against comparing Conan Version objects like it used to.
+
+Usage:
+    python tests/benchmark_deduplicate_packages.py [--references N] [--packages N] [--repeat N]
+"""
+
+import argparse
+import contextlib
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "runner_scripts"))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from conan_package_finder import deduplicate_packages, parse_package_reference, version_sort_key
+from versions import random_version
+
+
+def deduplicate_with_conan_version(packages):
+    # The selection before the sort keys: a Version built for every reference, compared one by one
+    from conan.internal.model.version import Version
+
+    highest = {}
+    version_selections = {}
+    for package_ref in packages:
+        parsed = parse_package_reference(package_ref)
+        if not parsed:
+            continue
+        package_name, version = parsed
+        current = Version(version)
+        if package_name not in highest or current > highest[package_name][0]:
+            highest[package_name] = (current, package_ref)
+        version_selections.setdefault(package_name, []).append(version)
+    for package_name, (version, _) in highest.items():
+        if len(version_selections[package_name]) > 1:
+            print(f"Selected highest version for {package_name}: {version} from {len(version_selections[package_name])} options", file=sys.stderr)
+    return [package_ref for _, package_ref in highest.values()], version_selections
+
+
+def best_time(function, references, repeat):
+    times = []
+    for _ in range(repeat):
+        version_sort_key.cache_clear()  # every run parses the versions again
+        # Both print the selected versions; not to the terminal, that would dominate the time
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stderr(devnull):
+            started = time.perf_counter()
+            function(references)
+            times.append(time.perf_counter() - started)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark deduplicate_packages")
+    parser.add_argument("--references", type=int, default=50000, help="Synthetic references (default: 50000)")
+    parser.add_argument("--packages", type=int, default=500, help="Distinct package names (default: 500)")
+    parser.add_argument("--repeat", type=int, default=5, help="Runs, the fastest one counts (default: 5)")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    references = [f"package{rng.randrange(args.packages)}/{random_version(rng)}@ultimaker/testing"
+                  for _ in range(args.references)]
+    distinct = len({reference.split("@")[0].split("/", 1)[1] for reference in references})
+    print(f"{len(references)} references, {args.packages} packages, {distinct} distinct versions")
+
+    sort_keys = best_time(deduplicate_packages, references, args.repeat)
+    print(f"deduplicate_packages (sort keys)  {sort_keys * 1000:8.1f}ms")
+    try:
+        conan_version = best_time(deduplicate_with_conan_version, references, args.repeat)
+    except ImportError:
+        print("Conan is not installed, not comparing to Version")
+        return
+    print(f"Conan Version per reference       {conan_version * 1000:8.1f}ms ({conan_version / sort_keys:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
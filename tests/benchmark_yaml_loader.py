@@ -0,0 +1,104 @@
+"""
+Benchmark loading a conandata.yml shaped like Cura's with yaml_loader: cold, with only the needed keys, and from the
+on-disk cache, against yaml.safe_load of the whole file like the scripts used to.
+
+Usage:
+    python tests/benchmark_yaml_loader.py [--blacklist N] [--repeat N]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "runner_scripts"))
+
+import yaml
+
+from yaml_loader import load_yaml_file
+
+PACKAGES = ["uranium", "curaengine", "cura_binary_data", "fdm_materials", "dulcificum", "pysavitar", "pynest2d",
+            "pyarcus", "charon", "native_cad_plugin", "cura_private_data", "fdm_materials_private"]
+
+
+def make_conandata(blacklist_entries):
+    # The sections of Cura's conandata.yml: version, requirements, urls, the pyinstaller configuration with its datas,
+    # hidden imports and blacklist, and the PyCharm run targets
+    lines = ['version: "5.10.0-alpha.0"', 'commit: "unknown"', "requirements:"]
+    lines += [f'  - "{package}/5.10.0-alpha.0@ultimaker/testing"' for package in PACKAGES[:8]]
+    lines += ["requirements_internal:"] + [f'  - "{package}/(latest)@internal/testing"' for package in PACKAGES[8:]]
+    lines += ["urls:", "  default:", '    cloud_api_root: "https://api.ultimaker.com"',
+              '    cloud_account_api_root: "https://account.ultimaker.com"', '    marketplace_root: "https://marketplace.ultimaker.com"']
+    lines += ["pyinstaller:", "  runinfo:", '    entrypoint: "cura_app.py"', "  datas:"]
+    for package in PACKAGES:
+        for folder in ("resources", "plugins"):
+            lines += [f"    {package}_{folder}:", f'      package: "{package}"', f'      src: "res/{folder}"',
+                      f'      dst: "share/{package}/{folder}"', "      oses:", '        - "Windows"', '        - "Linux"', '        - "Macos"']
+    lines += ["  hiddenimports:"] + [f'    - "{module}"' for module in
+                                     ("pySavitar", "pyArcus", "pyDulcificum", "pynest2d", "PyQt6", "PyQt6.QtNetwork",
+                                      "PyQt6.sip", "logging.handlers", "zeroconf", "fcntl", "stl", "serial", "win32cred",
+                                      "win32timezone", "pkgutil", "certifi", "sentry_sdk", "keyring.backends")]
+    lines += ["  collect_all:", '    - "cura"', '    - "UM"', '    - "serial"', '    - "Charon"', '    - "sqlite3"',
+              '    - "trimesh"', '    - "win32ctypes"', '    - "PyQt6.QtNetwork"', '    - "PyQt6.sip"', '    - "stl"']
+    lines += ["  blacklist:"]
+    for index in range(blacklist_entries):
+        lines += [f'    - patterns: ["{PACKAGES[index % len(PACKAGES)]}", "plugin{index}"]']
+        if index % 3 == 0:
+            lines += ['      oses: ["Linux", "Macos"]']
+    lines += ["pycharm_targets:"]
+    for target in ("cura_app", "tests", "plugins", "plugins_tests", "uranium_tests"):
+        lines += [f'  - jinja_path: ".run_templates/pycharm_cura_{target}.run.xml.jinja"', '    module_name: "Cura"',
+                  f'    name: "{target}"', f'    script_name: "{target}.py"']
+    return "\n".join(lines) + "\n"
+
+
+def best_time(function, repeat):
+    times = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - started)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the cold and cached loads of yaml_loader")
+    parser.add_argument("--blacklist", type=int, default=150, help="Entries in pyinstaller.blacklist (default: 150)")
+    parser.add_argument("--repeat", type=int, default=20, help="Runs, the fastest one counts (default: 20)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="yaml-benchmark-") as directory:
+        conandata = os.path.join(directory, "conandata.yml")
+        with open(conandata, "w") as f:
+            f.write(make_conandata(args.blacklist))
+        print(f"conandata.yml of {os.path.getsize(conandata) / 1024:.0f} KiB, {args.blacklist} blacklist entries, "
+              f"{'CSafeLoader' if hasattr(yaml, 'CSafeLoader') else 'no libyaml, SafeLoader'}")
+
+        def safe_load():
+            with open(conandata, "r") as f:
+                yaml.safe_load(f)
+
+        def bump_mtime():
+            # Like a fresh checkout: same content, a newer mtime, so the content hash decides
+            stat = os.stat(conandata)
+            os.utime(conandata, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1000))
+            load_yaml_file(conandata, ("pyinstaller.blacklist",))
+
+        baseline = best_time(safe_load, args.repeat)
+        os.environ["CURA_WORKFLOWS_YAML_CACHE"] = "0"
+        timings = [("yaml.safe_load, whole file", baseline),
+                   ("cold, whole file", best_time(lambda: load_yaml_file(conandata), args.repeat)),
+                   ("cold, pyinstaller.blacklist", best_time(lambda: load_yaml_file(conandata, ("pyinstaller.blacklist",)), args.repeat)),
+                   ("cold, version", best_time(lambda: load_yaml_file(conandata, ("version",)), args.repeat))]
+        os.environ["CURA_WORKFLOWS_YAML_CACHE"] = os.path.join(directory, "cache")
+        load_yaml_file(conandata, ("pyinstaller.blacklist",))
+        timings += [("cached, pyinstaller.blacklist", best_time(lambda: load_yaml_file(conandata, ("pyinstaller.blacklist",)), args.repeat)),
+                    ("cached, after an mtime change", best_time(bump_mtime, args.repeat))]
+
+        for label, seconds in timings:
+            print(f"{label:32} {seconds * 1000:8.2f}ms ({baseline / seconds:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
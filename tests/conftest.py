@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The runner scripts import each other as top level modules, like when they are run from their folder
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "runner_scripts"))
@@ -0,0 +1,66 @@
+"""
+A fake `conan` executable for the tests, answering `conan remote list` and `conan list` from a JSON configuration.
+
+Every `conan list` call is logged with its start and end time, so the tests can see which remotes were queried and
+whether the queries overlapped.
+"""
+
+import json
+import os
+import stat
+import sys
+
+FAKE_CONAN = '''#!{python}
+import json
+import sys
+import time
+
+with open({config!r}) as f:
+    config = json.load(f)
+arguments = sys.argv[1:]
+if arguments[:2] == ["remote", "list"]:
+    print(json.dumps([{{"name": name, "enabled": True}} for name in config["remotes"]]))
+    sys.exit(0)
+
+remote = next(argument.partition("=")[2] for argument in arguments if argument.startswith("-r="))
+started = time.time()
+time.sleep(config["delay"])
+with open({log!r}, "a") as log:
+    log.write(json.dumps({{"pattern": arguments[1], "remote": remote, "start": started, "end": time.time()}}) + "\\n")
+if remote in config["failing"]:
+    print("ERROR: Remote unavailable", file=sys.stderr)
+    sys.exit(1)
+remotes = config["remotes"] if remote == "*" else [remote]
+print(json.dumps({{name: config["remotes"][name] for name in remotes}}))
+'''
+
+
+class FakeConan:
+    def __init__(self, directory, remotes, delay = 0.0):
+        # remotes: name -> the 'conan list' result of that remote, e.g. {"cura/5.9.0@ultimaker/stable": {}}
+        self.bin_dir = os.path.join(directory, "bin")
+        self.config_file = os.path.join(directory, "conan.json")
+        self.log_file = os.path.join(directory, "conan.log")
+        self.remotes = remotes
+        self.delay = delay
+        self.failing = set()
+        os.makedirs(self.bin_dir, exist_ok=True)
+        self.write_config()
+        executable = os.path.join(self.bin_dir, "conan")
+        with open(executable, "w") as f:
+            f.write(FAKE_CONAN.format(python=sys.executable, config=self.config_file, log=self.log_file))
+        os.chmod(executable, os.stat(executable).st_mode | stat.S_IXUSR)
+
+    def write_config(self):
+        with open(self.config_file, "w") as f:
+            json.dump({"remotes": self.remotes, "delay": self.delay, "failing": sorted(self.failing)}, f)
+
+    def calls(self):
+        if not os.path.exists(self.log_file):
+            return []
+        with open(self.log_file) as f:
+            return [json.loads(line) for line in f]
+
+    def clear_calls(self):
+        if os.path.exists(self.log_file):
+            os.remove(self.log_file)
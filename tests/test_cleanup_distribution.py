@@ -0,0 +1,111 @@
+import os
+import sys
+
+import pytest
+
+import cleanup_distribution
+
+from cleanup_distribution import deduplicate
+
+# --dedup is only supported on Linux and Macos
+pytestmark = pytest.mark.skipif(sys.platform == "win32", reason="hardlinks are only deduplicated on Linux and Macos")
+
+CONTENT = b"duplicate" * 1000
+
+
+def write(path, content = CONTENT):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(content)
+    return path
+
+
+def inode(path):
+    return os.stat(path).st_ino
+
+
+def test_copies_are_linked_to_the_first_path(tmp_path):
+    dist = tmp_path / "dist"
+    first, second, third = write(dist / "a" / "lib.so"), write(dist / "b" / "lib.so"), write(dist / "c" / "lib.so")
+    write(dist / "other.so", b"other" * 2000)
+
+    report = deduplicate(dist, [])
+
+    assert inode(first) == inode(second) == inode(third) != inode(dist / "other.so")
+    assert os.stat(first).st_nlink == 3
+    assert report == {"mode": "hardlink", "linked_files": 2, "bytes_saved": 2 * len(CONTENT),
+                      "groups": [{"original": "a/lib.so", "duplicates": ["b/lib.so", "c/lib.so"], "size": len(CONTENT)}]}
+    # A second run finds them linked already
+    assert deduplicate(dist, [])["linked_files"] == 0
+
+
+def test_files_linked_within_the_distribution_count_once(tmp_path):
+    dist = tmp_path / "dist"
+    single = write(dist / "a" / "lib.so")
+    linked = write(dist / "b" / "lib.so")
+    (dist / "c").mkdir()
+    os.link(linked, dist / "c" / "lib.so")
+
+    report = deduplicate(dist, [])
+
+    # Both paths of the linked inode are relinked, and its bytes are saved once
+    assert inode(single) == inode(linked) == inode(dist / "c" / "lib.so")
+    assert report["linked_files"] == 2
+    assert report["bytes_saved"] == len(CONTENT)
+
+
+def test_files_also_linked_from_outside_save_nothing(tmp_path):
+    dist = tmp_path / "dist"
+    write(dist / "a" / "lib.so")
+    duplicate = write(dist / "b" / "lib.so")
+    os.link(duplicate, tmp_path / "outside.so")
+
+    report = deduplicate(dist, [])
+
+    # The outside link keeps the duplicate's inode alive
+    assert inode(dist / "b" / "lib.so") == inode(dist / "a" / "lib.so") != inode(tmp_path / "outside.so")
+    assert report["linked_files"] == 1
+    assert report["bytes_saved"] == 0
+
+
+def test_small_files_and_platform_boundaries_are_kept_apart(tmp_path):
+    dist = tmp_path / "dist"
+    write(dist / "a" / "small.txt", b"x")
+    write(dist / "b" / "small.txt", b"x")
+    write(dist / "qt" / "windows" / "lib.so")
+    write(dist / "qt" / "linux" / "lib.so")
+    entries = [{"patterns": ["windows"], "oses": ["Linux", "Macos"]}, ["unused"]]
+
+    report = deduplicate(dist, entries, min_size=2)
+
+    assert report["linked_files"] == 0
+    assert os.stat(dist / "a" / "small.txt").st_nlink == 1
+
+
+def test_symlinks_are_relative(tmp_path):
+    dist = tmp_path / "dist"
+    write(dist / "a" / "lib.so")
+    duplicate = write(dist / "b" / "c" / "lib.so")
+
+    report = deduplicate(dist, [], mode="symlink")
+
+    assert os.readlink(duplicate) == os.path.join("..", "..", "a", "lib.so")
+    assert duplicate.read_bytes() == CONTENT
+    assert report["bytes_saved"] == len(CONTENT)
+
+
+def test_main_cleans_then_links(tmp_path, capsys):
+    dist = tmp_path / "dist"
+    write(dist / "a" / "lib.so")
+    write(dist / "b" / "lib.so")
+    write(dist / "tests" / "lib.so")
+    conandata = tmp_path / "conandata.yml"
+    conandata.write_text("pyinstaller:\n  blacklist:\n    - patterns: [\"tests\"]\n")
+    report = tmp_path / "dedup.json"
+
+    cleanup_distribution.main([str(dist), "--conandata", str(conandata), "--os", "Linux", "--dedup", "hardlink",
+                               "--dedup-report", str(report)])
+
+    assert not (dist / "tests").exists()
+    assert inode(dist / "a" / "lib.so") == inode(dist / "b" / "lib.so")
+    assert f"linked 1 file(s), saving {len(CONTENT)} bytes" in capsys.readouterr().out
+    assert report.exists()
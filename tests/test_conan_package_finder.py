@@ -0,0 +1,304 @@
+import json
+import os
+import random
+import sys
+import time
+
+import pytest
+
+import conan_package_finder
+
+from conan_package_finder import (SubprocessConanBackend, bucket_packages_by_ticket, deduplicate_packages, load_jira_tickets,
+                                  search_conan_packages, summarize_packages, version_sort_key)
+from fake_conan import FakeConan
+from versions import random_version
+
+try:
+    from conan.internal.model.version import Version
+except ImportError:
+    Version = None
+
+needs_conan = pytest.mark.skipif(Version is None, reason="Conan is not installed")
+needs_fake_conan = pytest.mark.skipif(sys.platform == "win32", reason="The fake conan is a script with a shebang")
+
+
+def compare(a, b):
+    return (a > b) - (a < b)
+
+
+def key_compare(a, b):
+    # Without the version string itself, which only breaks the ties between versions Conan considers equal
+    return compare(version_sort_key(a)[:-1], version_sort_key(b)[:-1])
+
+
+@needs_conan
+def test_sort_key_orders_like_conan_version():
+    rng = random.Random(7)
+    for _ in range(20000):
+        a, b = random_version(rng), random_version(rng)
+        assert key_compare(a, b) == compare(Version(a), Version(b)), (a, b)
+
+
+@needs_conan
+@pytest.mark.parametrize("lower, higher", [
+    ("1.0.0-alpha", "1.0.0"),
+    ("1.0.0-alpha", "1.0.0-alpha.1"),
+    ("1.0.0-alpha.beta", "1.0.0-beta"),
+    ("1.0.0-rc.1", "1.0.0-rc.11"),
+    ("1.0.0", "1.0.0+build"),
+    ("1.0.0+1", "1.0.0+2"),
+    ("1.0.0-rc.1+build", "1.0.0"),
+    ("5.9", "5.10"),
+    ("5.10.0", "5.10.0.1"),
+    ("1.2", "1.2.a"),
+    ("1.2.a", "1.3"),
+])
+def test_sort_key_examples(lower, higher):
+    assert Version(lower) < Version(higher)
+    assert version_sort_key(lower) < version_sort_key(higher)
+
+
+@needs_conan
+@pytest.mark.parametrize("a, b", [("1.0", "1.0.0"), ("1", "1.0.0.0"), ("1.0-rc.0", "1-rc"), ("1.0+0", "1+0.0")])
+def test_equal_versions_only_differ_in_the_tie_breaker(a, b):
+    assert Version(a) == Version(b)
+    assert key_compare(a, b) == 0
+    assert version_sort_key(a) != version_sort_key(b)
+
+
+@needs_conan
+def test_sorting_agrees_with_conan_version():
+    rng = random.Random(11)
+    versions = sorted((random_version(rng) for _ in range(3000)), key=version_sort_key)
+    for lower, higher in zip(versions, versions[1:]):
+        assert Version(lower) <= Version(higher), (lower, higher)
+
+
+def test_numbers_sort_before_text():
+    # Conan compares "2" and "10a" as strings, which isn't a total order; the key always puts numbers first
+    assert version_sort_key("2") < version_sort_key("10a")
+    assert version_sort_key("1.2") < version_sort_key("1.10a") < version_sort_key("1.a")
+
+
+@needs_conan
+def test_deduplicate_keeps_a_highest_version_per_package():
+    rng = random.Random(13)
+    references = [f"package{rng.randrange(50)}/{random_version(rng)}@ultimaker/testing" for _ in range(5000)]
+    deduplicated, selections = deduplicate_packages(references)
+
+    assert sorted(selections) == sorted({reference.split("/")[0] for reference in references})
+    assert len(deduplicated) == len(selections)
+    for reference in deduplicated:
+        name, version = reference.split("@")[0].split("/", 1)
+        assert not any(Version(other) > Version(version) for other in selections[name]), reference
+
+
+def test_deduplicate_doesnt_depend_on_the_order():
+    rng = random.Random(17)
+    references = [f"package{rng.randrange(20)}/{random_version(rng)}@_/_" for _ in range(2000)]
+    expected, _ = deduplicate_packages(references)
+    for _ in range(5):
+        rng.shuffle(references)
+        assert sorted(deduplicate_packages(references)[0]) == sorted(expected)
+
+
+def test_deduplicate_skips_unparsable_references():
+    deduplicated, selections = deduplicate_packages(["curaengine/5.9.0@ultimaker/stable", "not a reference",
+                                                     "curaengine/5.10.0-beta.1@ultimaker/testing"])
+    assert deduplicated == ["curaengine/5.10.0-beta.1@ultimaker/testing"]
+    assert selections == {"curaengine": ["5.9.0", "5.10.0-beta.1"]}
+
+
+REMOTES = {
+    "cura-conan2": {"cura/5.9.0@ultimaker/stable": {"revisions": {"r1": {"timestamp": 1}}},
+                    "uranium/5.9.0@ultimaker/stable": {"revisions": {}}},
+    "cura-private-conan2": {"cura/5.9.0@ultimaker/stable": {"revisions": {}},
+                            "cura_private_data/5.9.0@internal/stable": {"revisions": {}}},
+    "conancenter": {"zlib/1.3.1": {"revisions": {}}, "zlib/1.3.1+patched": {"revisions": {}}},
+}
+EXPECTED = ["cura/5.9.0@ultimaker/stable", "uranium/5.9.0@ultimaker/stable", "cura_private_data/5.9.0@internal/stable",
+            "zlib/1.3.1"]
+
+
+@pytest.fixture
+def fake_conan(tmp_path, monkeypatch):
+    fake = FakeConan(str(tmp_path / "conan"), dict(REMOTES))
+    monkeypatch.setenv("PATH", fake.bin_dir + os.pathsep + os.environ["PATH"])
+    return fake
+
+
+def search(**kwargs):
+    return list(search_conan_packages("*", backend=SubprocessConanBackend(), **kwargs))
+
+
+@needs_fake_conan
+def test_search_dedups_across_remotes_in_remote_order(fake_conan):
+    assert search() == EXPECTED
+    assert sorted(call["remote"] for call in fake_conan.calls()) == sorted(REMOTES)
+
+
+@needs_fake_conan
+def test_search_queries_the_remotes_concurrently(fake_conan):
+    fake_conan.delay = 0.5
+    fake_conan.write_config()
+    started = time.monotonic()
+    assert search() == EXPECTED
+    elapsed = time.monotonic() - started
+
+    calls = fake_conan.calls()
+    assert len(calls) == len(REMOTES)
+    # Every query started before any of them ended
+    assert max(call["start"] for call in calls) < min(call["end"] for call in calls)
+    assert elapsed < len(REMOTES) * fake_conan.delay
+
+
+@needs_fake_conan
+def test_search_with_one_worker_queries_the_remotes_one_by_one(fake_conan):
+    fake_conan.delay = 0.1
+    fake_conan.write_config()
+    assert search(max_workers=1) == EXPECTED
+
+    calls = sorted(fake_conan.calls(), key=lambda call: call["start"])
+    assert [call["remote"] for call in calls] == list(REMOTES)
+    for previous, call in zip(calls, calls[1:]):
+        assert previous["end"] <= call["start"]
+
+
+@needs_fake_conan
+def test_search_doesnt_cache_by_default(fake_conan, tmp_path):
+    search(cache_dir=str(tmp_path / "cache"))
+    search(cache_dir=str(tmp_path / "cache"))
+
+    assert len(fake_conan.calls()) == 2 * len(REMOTES)
+    assert not (tmp_path / "cache").exists()
+
+
+@needs_fake_conan
+def test_search_reuses_the_cached_lists(fake_conan, tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    assert search(use_cache=True, cache_dir=cache_dir) == EXPECTED
+    fake_conan.clear_calls()
+
+    assert search(use_cache=True, cache_dir=cache_dir) == EXPECTED
+    assert fake_conan.calls() == []
+
+
+@needs_fake_conan
+def test_search_ignores_expired_cached_lists(fake_conan, tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    search(use_cache=True, cache_dir=cache_dir)
+    fake_conan.clear_calls()
+
+    search(use_cache=True, cache_dir=cache_dir, cache_ttl=-1)
+    assert len(fake_conan.calls()) == len(REMOTES)
+
+
+@needs_fake_conan
+def test_search_doesnt_cache_a_failed_remote(fake_conan, tmp_path):
+    cache_dir = str(tmp_path / "cache")
+    fake_conan.failing.add("cura-private-conan2")
+    fake_conan.write_config()
+    assert search(use_cache=True, cache_dir=cache_dir) == [reference for reference in EXPECTED if "internal" not in reference]
+
+    fake_conan.failing.clear()
+    fake_conan.write_config()
+    fake_conan.clear_calls()
+    assert search(use_cache=True, cache_dir=cache_dir) == EXPECTED
+    assert [call["remote"] for call in fake_conan.calls()] == ["cura-private-conan2"]
+
+
+@needs_fake_conan
+def test_search_skips_a_remote_reporting_an_error(fake_conan):
+    fake_conan.remotes["conancenter"] = {"error": "Permission denied for user: 'anonymous'"}
+    fake_conan.write_config()
+    assert search() == EXPECTED[:-1]
+
+
+@needs_fake_conan
+def test_main_searches_with_the_cache_when_asked(fake_conan, tmp_path, capsys):
+    arguments = ["--search-pattern", "*", "--backend", "subprocess", "--cache", "--cache-dir", str(tmp_path / "cache")]
+    conan_package_finder.main(arguments)
+    first = json.loads(capsys.readouterr().out)
+    conan_package_finder.main(arguments)
+
+    assert json.loads(capsys.readouterr().out) == first
+    assert first["discovered_packages"] == EXPECTED
+    assert len(fake_conan.calls()) == len(REMOTES)
+
+
+def test_main_rejects_cache_with_no_cache():
+    with pytest.raises(SystemExit):
+        conan_package_finder.main(["--search-pattern", "*", "--cache", "--no-cache"])
+
+
+@pytest.mark.parametrize("content", ['["CURA-12824", "np-42", 1234]', "CURA-12824\nnp-42, 1234\n", " CURA-12824,np-42\t1234 "])
+def test_load_jira_tickets_from_a_file(tmp_path, content):
+    tickets_file = tmp_path / "tickets"
+    tickets_file.write_text(content)
+    assert load_jira_tickets(str(tickets_file)) == ["CURA-12824", "np-42", "1234"]
+
+
+def test_load_jira_tickets_from_a_json_array():
+    assert load_jira_tickets('["CURA-12824", 1234]') == ["CURA-12824", "1234"]
+
+
+@pytest.mark.parametrize("value", ["CURA-12824", '{"ticket": "CURA-12824"}', '[["CURA-12824"]]'])
+def test_load_jira_tickets_rejects_other_values(value):
+    with pytest.raises(ValueError):
+        load_jira_tickets(value)
+
+
+def test_bucket_packages_by_ticket():
+    packages = iter(["cura/5.9.0@ultimaker/cura_12824", "uranium/5.9.0@ultimaker/CURA_12824#abc",
+                     "curaengine/5.9.0@ultimaker/np_42", "fdm_materials/5.9.0@ultimaker/pp_7",
+                     "zlib/1.3.1", "cura/5.9.0@ultimaker/stable"])
+    assert bucket_packages_by_ticket(packages, ["np_42", "cura_12824", "cura_1"]) == {
+        "np_42": ["curaengine/5.9.0@ultimaker/np_42"],
+        "cura_12824": ["cura/5.9.0@ultimaker/cura_12824", "uranium/5.9.0@ultimaker/CURA_12824#abc"],
+        "cura_1": [],
+    }
+
+
+def test_summarize_packages():
+    packages = ["cura/5.9.0@ultimaker/cura_12824", "uranium/5.9.0@ultimaker/cura_12824",
+                "uranium/5.10.0@ultimaker/cura_12824", "curaengine/5.9.0@ultimaker/cura_12824"]
+    summary = summarize_packages(packages)
+
+    assert summary["discovered_packages"] == packages
+    assert summary["cura_package"] == "cura/5.9.0@ultimaker/cura_12824"
+    assert sorted(summary["override_packages"]) == ["curaengine/5.9.0@ultimaker/cura_12824", "uranium/5.10.0@ultimaker/cura_12824"]
+    assert summary["version_selections"]["uranium"] == ["5.9.0", "5.10.0"]
+    assert (summary["original_count"], summary["deduplicated_count"]) == (4, 3)
+
+
+def test_summarize_no_packages():
+    summary = summarize_packages([])
+    assert (summary["cura_package"], summary["override_packages"], summary["deduplicated_count"]) == ("", [], 0)
+
+
+@needs_fake_conan
+def test_main_buckets_the_packages_of_several_tickets(tmp_path, monkeypatch, capsys):
+    fake = FakeConan(str(tmp_path / "conan"), {
+        "cura-conan2": {"cura/5.9.0@ultimaker/cura_12824": {}, "uranium/5.9.0@ultimaker/np_42": {},
+                        "cura/5.9.0@ultimaker/stable": {}},
+        "cura-private-conan2": {"cura_private_data/5.9.0@ultimaker/cura_12824": {}},
+    })
+    monkeypatch.setenv("PATH", fake.bin_dir + os.pathsep + os.environ["PATH"])
+    conan_package_finder.main(["--jira-tickets", '["CURA-12824", "NP-42", "PP-1", "cura-12824"]', "--backend", "subprocess"])
+
+    result = json.loads(capsys.readouterr().out)
+    assert list(result) == ["cura_12824", "np_42", "pp_1"]
+    assert result["cura_12824"]["discovered_packages"] == ["cura/5.9.0@ultimaker/cura_12824",
+                                                           "cura_private_data/5.9.0@ultimaker/cura_12824"]
+    assert result["cura_12824"]["cura_package"] == "cura/5.9.0@ultimaker/cura_12824"
+    assert result["np_42"]["override_packages"] == ["uranium/5.9.0@ultimaker/np_42"]
+    assert result["pp_1"]["deduplicated_count"] == 0
+    # A single wildcard query per remote for all the tickets
+    assert sorted(call["pattern"] for call in fake.calls()) == ["*/*@ultimaker/*"] * 2
+
+
+def test_main_rejects_invalid_tickets(capsys):
+    with pytest.raises(SystemExit) as exit_info:
+        conan_package_finder.main(["--jira-tickets", '["CURA-12824", "XYZ-1"]'])
+    assert exit_info.value.code == 1
+    assert "Invalid Jira ticket keyword" in capsys.readouterr().err
@@ -0,0 +1,176 @@
+import json
+import os
+
+import pytest
+
+import make_runners_list
+
+from make_runners_list import dependency_stages, graph_nodes, shard_packages
+
+GRAPHS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "graphs")
+
+# The shared dependencies of the Cura graph, required by more than one of curaengine, pyarcus and pynest2d
+CURA_SHARED = [("arcus/5.4.1", "host"), ("clipper/6.4.2", "host"), ("cpython/3.12.2", "host"), ("openssl/3.2.1", "host"),
+               ("protobuf/3.21.12", "build"), ("protobuf/3.21.12", "host"), ("zlib/1.3.1", "build"), ("zlib/1.3.1", "host")]
+CURA_SUBTREES = [[("curaengine/5.9.0", "host")], [("fdm_materials/5.9.0", "host")], [("nest2d/5.4.1", "host"), ("pynest2d/5.4.1", "host")],
+                 [("pyarcus/5.4.1", "host")], [("uranium/5.9.0", "host")]]
+
+
+def load_graph(name, repo_root = "/repo", conan_home = "/conan"):
+    # `conan graph info --format=json` of stub recipes, trimmed to the fields used, with the folders as placeholders
+    with open(os.path.join(GRAPHS, f"{name}.json")) as f:
+        text = f.read()
+    return json.loads(text.replace("{repo_root}", repo_root).replace("{conan_home}", conan_home))
+
+
+@pytest.fixture
+def cura_nodes():
+    return graph_nodes(load_graph("cura"))
+
+
+def test_graph_nodes_read_the_references_and_contexts(cura_nodes):
+    assert cura_nodes["2"][:2] == ("curaengine", "curaengine/5.9.0")
+    assert cura_nodes["9"][1::3] == ("protobuf/3.21.12", "build")
+    # Conan lists the transitive dependencies
+    assert "5" in cura_nodes["2"][3]
+
+
+def test_shared_dependencies_are_split_from_the_subtrees(cura_nodes):
+    shared, subtrees = dependency_stages(cura_nodes, set(cura_nodes))
+
+    assert shared == CURA_SHARED
+    assert subtrees == CURA_SUBTREES
+
+
+def test_subtrees_only_require_shared_packages_or_their_own(cura_nodes):
+    shared, subtrees = dependency_stages(cura_nodes, set(cura_nodes))
+    subtree_of = {package: index for index, subtree in enumerate(subtrees) for package in subtree}
+    for node_id, (name, reference, recipe_folder, dependencies, context) in cura_nodes.items():
+        if (reference, context) not in subtree_of:
+            continue
+        for dependency in dependencies:
+            package = cura_nodes[dependency][1], cura_nodes[dependency][4]
+            assert package in shared or subtree_of[package] == subtree_of[(reference, context)], (reference, package)
+
+
+def test_only_the_affected_packages_are_staged(cura_nodes):
+    # A change in arcus affects the packages above it; arcus is only shared by the two affected ones
+    affected = {"0", "2", "3", "11"}
+    assert dependency_stages(cura_nodes, affected) == ([("arcus/5.4.1", "host")],
+                                                        [[("curaengine/5.9.0", "host")], [("pyarcus/5.4.1", "host")]])
+
+
+def test_a_chain_has_nothing_shared(cura_nodes):
+    assert dependency_stages(cura_nodes, {"0", "14", "15", "8"}) == ([], [[("clipper/6.4.2", "host"), ("nest2d/5.4.1", "host"),
+                                                                          ("pynest2d/5.4.1", "host")]])
+
+
+def test_shards_are_balanced_over_whole_subtrees():
+    durations = {"curaengine/5.9.0": 1800, "nest2d/5.4.1": 100, "pynest2d/5.4.1": 300, "pyarcus/5.4.1": 600,
+                 "uranium/5.9.0": 60, "fdm_materials/5.9.0": 30}
+    shards = shard_packages(CURA_SUBTREES, durations, 3)
+
+    assert [duration for duration, packages in shards] == [1800, 600, 490]
+    # nest2d and pynest2d stay together
+    assert [len({("nest2d/5.4.1", "host"), ("pynest2d/5.4.1", "host")} & set(packages)) for duration, packages in shards] == [0, 0, 2]
+
+
+def test_main_emits_the_shared_stage_then_the_shards(tmp_path, capsys):
+    graph_file = tmp_path / "graph.json"
+    graph_file.write_text(json.dumps(load_graph("cura")))
+    make_runners_list.main(["--platform-linux", "--platform-wasm", "--graph-json", f"wasm={graph_file}",
+                            "--graph-json", str(graph_file), "--shards", "2", "--shards", "wasm=1"])
+
+    matrix = json.loads(capsys.readouterr().out)["include"]
+    # The shared stages first, then the longest shards
+    assert [(entry["platform"], entry["stage"], entry["shard_index"], entry["expected_duration"]) for entry in matrix] == [
+        ("linux", 0, 0, 8.0), ("wasm", 0, 0, 8.0), ("wasm", 1, 0, 6.0), ("linux", 1, 0, 3.0), ("linux", 1, 1, 3.0)]
+    shared = matrix[0]
+    assert shared["packages"] == ["arcus/5.4.1", "clipper/6.4.2", "cpython/3.12.2", "openssl/3.2.1", "protobuf/3.21.12", "zlib/1.3.1"]
+    assert shared["tool_packages"] == ["protobuf/3.21.12", "zlib/1.3.1"]
+    assert matrix[2]["conan_extra_args"] == "-pr:h cura_wasm.jinja"
+    linux_shards = [entry["packages"] for entry in matrix if entry["platform"] == "linux" and entry["stage"] == 1]
+    assert sorted(package for packages in linux_shards for package in packages) == sorted(
+        reference for subtree in CURA_SUBTREES for reference, context in subtree)
+
+
+def changed(nodes, files, repo_root):
+    package_names = {node[0] for node in nodes.values()}
+    return make_runners_list.changed_nodes(nodes, files, str(repo_root), package_names)
+
+
+def test_a_change_in_the_consumer_changes_the_root(tmp_path):
+    nodes = graph_nodes(load_graph("cura", repo_root=str(tmp_path)))
+    assert changed(nodes, ["cura/CuraApplication.py", "conanfile.py"], tmp_path) == ({"0"}, [])
+    assert make_runners_list.affected_nodes(nodes, {"0"}) == {"0"}
+
+
+def test_a_change_in_a_recipe_folder_changes_its_package_in_both_contexts(tmp_path):
+    # A recipe repository next to the consumer, with the <package>/config.yml layout
+    nodes = graph_nodes(load_graph("cura", repo_root=str(tmp_path)))
+    changed_ids, unattributed = changed(nodes, ["recipes/protobuf/all/conanfile.py"], tmp_path)
+
+    assert (sorted(changed_ids), unattributed) == (["4", "6", "9"], [])
+    affected = make_runners_list.affected_nodes(nodes, changed_ids)
+    assert sorted({nodes[node_id][1] for node_id in affected}) == ["arcus/5.4.1", "cura/5.9.0", "curaengine/5.9.0",
+                                                                    "protobuf/3.21.12", "pyarcus/5.4.1"]
+
+
+def test_affected_nodes_are_the_transitive_dependents(cura_nodes):
+    # clipper is used by curaengine directly and by pynest2d through nest2d
+    assert make_runners_list.affected_nodes(cura_nodes, {"8"}) == {"0", "2", "8", "14", "15"}
+    assert make_runners_list.affected_nodes(cura_nodes, {"1"}) == {"0", "1"}
+    assert make_runners_list.affected_nodes(cura_nodes, set()) == set()
+
+
+def test_a_recipe_outside_the_graph_changes_nothing(tmp_path):
+    (tmp_path / "recipes" / "boost").mkdir(parents=True)
+    (tmp_path / "recipes" / "boost" / "config.yml").write_text("versions: {}\n")
+    nodes = graph_nodes(load_graph("cura", repo_root=str(tmp_path / "consumer")))
+
+    assert changed(nodes, ["recipes/boost/all/conanfile.py"], tmp_path) == (set(), [])
+
+
+def test_files_that_cant_be_attributed_are_reported(tmp_path):
+    # The consumer isn't in this repository, so a shared profile can't be placed
+    nodes = graph_nodes(load_graph("cura", repo_root=str(tmp_path / "consumer")))
+    assert changed(nodes, ["profiles/cura.jinja", "recipes/zlib/all/conandata.yml"], tmp_path) == (
+        {"5", "7", "10"}, ["profiles/cura.jinja"])
+
+
+def test_main_only_keeps_the_affected_platforms(tmp_path, capsys):
+    graph_file = tmp_path / "graph.json"
+    graph_file.write_text(json.dumps(load_graph("cura", repo_root=str(tmp_path))))
+    # The same graph stands in for Windows, without nest2d; a change to nest2d only affects Linux
+    windows_graph = load_graph("cura", repo_root=str(tmp_path))
+    nodes = windows_graph["graph"]["nodes"]
+    for node_id in ("14", "15"):
+        del nodes[node_id]
+    for node in nodes.values():
+        for node_id in ("14", "15"):
+            node["dependencies"].pop(node_id, None)
+    windows_file = tmp_path / "windows.json"
+    windows_file.write_text(json.dumps(windows_graph))
+    changed_files = tmp_path / "changed.txt"
+    changed_files.write_text("README.md\nrecipes/nest2d/all/conanfile.py\n")
+
+    make_runners_list.main(["--platform-linux", "--platform-windows", "--changed-files", str(changed_files),
+                            "--graph-json", str(graph_file), "--graph-json", f"windows={windows_file}",
+                            "--repo-root", str(tmp_path)])
+
+    output = capsys.readouterr()
+    assert json.loads(output.out)["include"] == [dict(make_runners_list.PLATFORMS["linux"][0],
+                                                      packages=["cura/5.9.0", "nest2d/5.4.1", "pynest2d/5.4.1"])]
+    assert "windows: not affected by the changed files, skipped" in output.err
+
+
+def test_main_builds_everything_for_an_unattributed_change(tmp_path, capsys):
+    graph_file = tmp_path / "graph.json"
+    graph_file.write_text(json.dumps(load_graph("cura", repo_root=str(tmp_path / "consumer"))))
+    changed_files = tmp_path / "changed.txt"
+    changed_files.write_text(".github/workflows/conan-package.yml\n")
+
+    make_runners_list.main(["--platform-linux", "--changed-files", str(changed_files), "--graph-json", str(graph_file),
+                            "--repo-root", str(tmp_path)])
+
+    assert len(json.loads(capsys.readouterr().out)["include"][0]["packages"]) == 13
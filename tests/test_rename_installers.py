@@ -0,0 +1,72 @@
+import hashlib
+import json
+
+import pytest
+
+from rename_installers import main
+
+
+@pytest.fixture
+def installers(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    contents = {
+        "UltiMaker-Cura-5.9.0-beta.1+abc123-linux-X64.AppImage": b"appimage",
+        "UltiMaker-Cura-5.9.0-beta.1+abc123-win64-X64.exe": b"exe" * 1000,
+        "UltiMaker-Cura-5.9.0-beta.1+abc123-macos-ARM64.dmg": b"",
+    }
+    for name, content in contents.items():
+        tmp_path.joinpath(name).write_bytes(content)
+    return tmp_path, contents
+
+
+def test_renames_installers_and_writes_checksums(installers, capsys):
+    tmp_path, contents = installers
+    main(["--tag", "nightly", "--jobs", "2"])
+
+    renamed = {name.replace("+abc123", "-nightly"): content for name, content in contents.items()}
+    assert sorted(path.name for path in tmp_path.iterdir()) == sorted([*renamed, "SHA256SUMS", "installers-manifest.json"])
+
+    output = capsys.readouterr().out
+    assert "cura_version=UltiMaker-Cura-5.9.0-beta.1\n" in output
+    assert "short_version=5.9\n" in output
+
+    checksums = tmp_path.joinpath("SHA256SUMS").read_text().splitlines()
+    assert checksums == [f"{hashlib.sha256(renamed[name]).hexdigest()} *{name}" for name in sorted(renamed)]
+
+    manifest = json.loads(tmp_path.joinpath("installers-manifest.json").read_text())
+    assert manifest["tag"] == "nightly"
+    assert manifest["cura_version"] == "UltiMaker-Cura-5.9.0-beta.1"
+    assert [(entry["name"], entry["original_name"], entry["size"]) for entry in manifest["installers"]] == \
+           [(name.replace("+abc123", "-nightly"), name, len(contents[name])) for name in sorted(contents)]
+
+
+@pytest.mark.parametrize("name", ["Cura+abc123-linux.AppImage", "UltiMaker-Cura-5.9.0+abc123.exe", "notes.txt"])
+def test_skips_files_not_named_like_installers(installers, capsys, name):
+    tmp_path, contents = installers
+    tmp_path.joinpath(name).write_bytes(b"other")
+    main(["--tag", "nightly"])
+
+    assert tmp_path.joinpath(name).read_bytes() == b"other"
+    assert f"Skipping {name}" in capsys.readouterr().err
+    manifest = json.loads(tmp_path.joinpath("installers-manifest.json").read_text())
+    assert [entry["original_name"] for entry in manifest["installers"]] == sorted(contents)
+
+
+def test_second_run_keeps_the_checksums(installers):
+    tmp_path, _ = installers
+    main(["--tag", "nightly"])
+    checksums = tmp_path.joinpath("SHA256SUMS").read_text()
+    main(["--tag", "nightly"])
+    assert tmp_path.joinpath("SHA256SUMS").read_text() == checksums
+
+
+def test_no_checksums_only_renames(installers):
+    tmp_path, contents = installers
+    main(["--tag", "nightly", "--no-checksums"])
+    assert sorted(path.name for path in tmp_path.iterdir()) == sorted(name.replace("+abc123", "-nightly") for name in contents)
+
+
+@pytest.mark.parametrize("jobs", ["0", "-1"])
+def test_rejects_jobs_below_one(installers, jobs):
+    with pytest.raises(SystemExit):
+        main(["--tag", "nightly", "--jobs", jobs])
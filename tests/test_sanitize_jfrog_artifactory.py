@@ -0,0 +1,188 @@
+import pytest
+
+pytest.importorskip("pyartifactory")
+
+import sanitize_jfrog_artifactory as sanitizer
+
+from artifactory_server import ArtifactoryServer
+
+ARTIFACT_PATHS = {"cura-conan-dev-local/ultimaker/cura": True, "cura-conan-dev-local/_/uranium": True,
+                  "cura-conan-dev-local/_/missing": True}
+
+ARTIFACTS = {
+    "cura-conan-dev-local/ultimaker/cura/5.9.0/cura_1/0/export/conanfile.py": {"size": 10, "created_by": "anonymous"},
+    "cura-conan-dev-local/ultimaker/cura/5.9.0/cura_1/0/export/conanmanifest.txt": {"size": 20, "created_by": "anonymous"},
+    "cura-conan-dev-local/ultimaker/cura/5.9.0/cura_2/0/export/conanfile.py": {"size": 30},
+    "cura-conan-dev-local/_/uranium/5.9.0/_/0/export/conanfile.py": {"size": 40, "created_by": "anonymous"},
+    "cura-conan-dev-local/_/uranium/5.9.0/_/1/export/conanfile.py": {"size": 50},
+    "cura-conan-dev-local/_/curaengine/5.9.0/_/0/export/conanfile.py": {"size": 60, "created_by": "anonymous"},
+}
+ANONYMOUS = sorted(path for path, artifact in ARTIFACTS.items() if artifact.get("created_by") == "anonymous" and "curaengine" not in path)
+
+
+@pytest.fixture
+def server():
+    with ArtifactoryServer(ARTIFACTS) as artifactory:
+        yield artifactory
+
+
+@pytest.fixture
+def client(server):
+    return sanitizer.initialize_artifactory("user", "password", server.url, jobs=4)
+
+
+def test_rest_mode_deletes_the_anonymous_files_below_the_paths(server, client):
+    deleted, deleted_bytes, failures = sanitizer.process_artifacts(client, ARTIFACT_PATHS, jobs=4)
+
+    assert (deleted, deleted_bytes, failures) == (len(ANONYMOUS), 70, 0)
+    assert server.files() == sorted(set(ARTIFACTS) - set(ANONYMOUS))
+    # One listing per path, however deep the files are
+    listings = [path for method, path in server.requests if method == "GET" and path.endswith("/")]
+    assert sorted(listings) == sorted(f"api/storage/{path}/" for path in ARTIFACT_PATHS)
+
+
+def test_rest_mode_dry_run_deletes_nothing(server, client):
+    deleted, deleted_bytes, failures = sanitizer.process_artifacts(client, ARTIFACT_PATHS, jobs=4, dry_run=True)
+
+    assert (deleted, deleted_bytes, failures) == (len(ANONYMOUS), 70, 0)
+    assert server.files() == sorted(ARTIFACTS)
+    assert server.count("DELETE") == 0
+
+
+def test_rest_mode_resumes_from_the_journal(server, client, tmp_path):
+    journal_file = tmp_path / "journal"
+    journal_file.write_text(f"{ANONYMOUS[0]}\n{ANONYMOUS[1]}")  # the second line was cut off, it doesn't count
+
+    journal = sanitizer.Journal(str(journal_file))
+    try:
+        deleted, _, failures = sanitizer.process_artifacts(client, ARTIFACT_PATHS, jobs=4, journal=journal)
+    finally:
+        journal.close()
+
+    assert (deleted, failures) == (len(ANONYMOUS) - 1, 0)
+    assert f"api/storage/{ANONYMOUS[0]}" not in [path for method, path in server.requests if method == "GET"]
+    assert ANONYMOUS[0] in server.files()
+    assert set(ANONYMOUS[1:]).isdisjoint(server.files())
+
+
+def test_rest_mode_failures_are_not_journaled(server, client, tmp_path):
+    server.failing.add(ANONYMOUS[0])
+    journal = sanitizer.Journal(str(tmp_path / "journal"))
+    try:
+        deleted, _, failures = sanitizer.process_artifacts(client, ARTIFACT_PATHS, jobs=4, journal=journal)
+    finally:
+        journal.close()
+
+    assert (deleted, failures) == (len(ANONYMOUS) - 1, 1)
+    assert ANONYMOUS[0] not in sanitizer.Journal(str(tmp_path / "journal")).processed
+
+    # The next run only retries the failed file
+    server.failing.clear()
+    server.requests.clear()
+    journal = sanitizer.Journal(str(tmp_path / "journal"))
+    try:
+        deleted, _, failures = sanitizer.process_artifacts(client, ARTIFACT_PATHS, jobs=4, journal=journal)
+    finally:
+        journal.close()
+    assert (deleted, failures) == (1, 0)
+    assert server.count("DELETE") == 1
+
+
+def test_aql_mode_deletes_the_anonymous_items_in_pages(server, client):
+    deleted, deleted_bytes, failures = sanitizer.process_artifacts_aql(client, ARTIFACT_PATHS, jobs=4, page_size=2)
+
+    assert (deleted, deleted_bytes, failures) == (len(ANONYMOUS), 70, 0)
+    assert server.files() == sorted(set(ARTIFACTS) - set(ANONYMOUS))
+    # O(pages) queries and no info request per file
+    assert server.count("POST", "api/search/aql") == 2
+    assert server.count("GET") == 0
+    assert server.authorizations == {"Basic dXNlcjpwYXNzd29yZA=="}
+
+
+def test_aql_mode_deletes_a_folder_once(server, client):
+    folder = "cura-conan-dev-local/ultimaker/cura/5.9.0/cura_1"
+    server.items[folder]["created_by"] = "anonymous"
+    deleted, deleted_bytes, failures = sanitizer.process_artifacts_aql(client, ARTIFACT_PATHS, jobs=4)
+
+    assert failures == 0
+    assert not server.below(folder) and folder not in server.items
+    # The folder, and the uranium file; the files inside the folder went with it
+    assert deleted == 2
+    assert server.count("DELETE") == 2
+
+
+def test_aql_mode_dry_run_reports_counts_and_bytes(server, client):
+    deleted, deleted_bytes, failures = sanitizer.process_artifacts_aql(client, ARTIFACT_PATHS, jobs=4, page_size=2, dry_run=True)
+
+    assert (deleted, deleted_bytes, failures) == (len(ANONYMOUS), 70, 0)
+    assert server.files() == sorted(ARTIFACTS)
+    assert server.count("DELETE") == 0
+
+
+def test_aql_mode_retries_the_failed_deletions_in_the_next_page(server, client):
+    server.failing.add(ANONYMOUS[0])
+    deleted, _, failures = sanitizer.process_artifacts_aql(client, ARTIFACT_PATHS, jobs=4, page_size=1)
+
+    assert (deleted, failures) == (len(ANONYMOUS) - 1, 1)
+    assert server.files() == sorted(set(ARTIFACTS) - set(ANONYMOUS[1:]))
+
+
+def test_main_falls_back_to_the_rest_mode_when_aql_is_refused(server, monkeypatch, tmp_path):
+    server.aql_status = 403
+    monkeypatch.setattr(sanitizer, "ARTIFACT_PATHS", ARTIFACT_PATHS)
+    sanitizer.main(["user", "password", "--base-url", server.url, "--journal", str(tmp_path / "journal")])
+
+    assert server.count("POST", "api/search/aql") == 1
+    assert server.files() == sorted(set(ARTIFACTS) - set(ANONYMOUS))
+    assert not (tmp_path / "journal").exists()
+
+
+@pytest.mark.parametrize("option", ["--jobs", "--page-size"])
+def test_main_rejects_counts_below_one(option):
+    with pytest.raises(SystemExit):
+        sanitizer.main(["user", "password", option, "0"])
+
+
+@pytest.fixture
+def policy_file(tmp_path, monkeypatch):
+    monkeypatch.setenv("CURA_WORKFLOWS_YAML_CACHE", "0")
+
+    def write(text):
+        path = tmp_path / "policy.yml"
+        path.write_text(text)
+        return str(path)
+    return write
+
+
+def test_retention_policy_deletes_the_older_revisions(server, policy_file):
+    older = "cura-conan-dev-local/_/uranium/5.9.0/_/0/export/conanfile.py"
+    server.items[older]["created"] = "2023-01-01T00:00:00.000Z"
+    policy = policy_file("rules:\n  - path: cura-conan-dev-local/_/uranium\n    unit_depth: 3\n    keep_newest: 1\n")
+    sanitizer.main(["user", "password", "--base-url", server.url, "--policy", policy])
+
+    # Revision 1 of 5.9.0/_ is the newest, everything else is outside the rule
+    assert server.files() == sorted(set(ARTIFACTS) - {older})
+    assert server.count("POST", "api/search/aql") == 1
+    assert server.count("DELETE") == 1
+
+
+@pytest.mark.parametrize("text", ["rules: []\n", "protect:\n  - cura/5.9.0@ultimaker/stable\n", ""])
+def test_retention_policy_without_rules_is_rejected(server, policy_file, capsys, text):
+    with pytest.raises(SystemExit) as exit_info:
+        sanitizer.main(["user", "password", "--base-url", server.url, "--policy", policy_file(text)])
+
+    assert exit_info.value.code == 1
+    assert "has no rules" in capsys.readouterr().err
+    assert server.requests == []
+
+
+def test_retention_policy_cant_be_combined_with_mode(policy_file):
+    policy = policy_file("rules:\n  - path: cura-conan-dev-local/ultimaker/cura\n    keep_newest: 1\n")
+    with pytest.raises(SystemExit) as exit_info:
+        sanitizer.main(["user", "password", "--policy", policy, "--mode", "aql"])
+    assert exit_info.value.code == 2
+
+
+def test_aql_query_needs_a_path():
+    with pytest.raises(ValueError):
+        sanitizer.build_aql_query([], 0, 10)
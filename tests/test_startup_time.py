@@ -0,0 +1,45 @@
+import importlib.util
+
+import pytest
+
+from check_startup_time import (ALLOWED_IMPORTS, STARTUP_BUDGETS_MS, deferred_imports, measure_import, parse_importtime,
+                                parse_importtime_lines, relative_scale)
+
+# Shared runners are noisy: on top of scaling the budgets to this machine, a script only fails past twice its budget
+MARGIN = 2
+
+IMPORTTIME_OUTPUT = """import time: self [us] | cumulative | imported package
+import time:       120 |        120 |   _json
+import time:       900 |       1020 | json
+import time:        80 |         80 |     yaml.error
+import time:      3000 |       3080 |   yaml
+import time:       400 |       3480 | make_runners_list
+"""
+
+
+def test_parse_importtime_reads_what_the_module_imported():
+    assert parse_importtime_lines(IMPORTTIME_OUTPUT)[0] == ("_json", 1, 120, 120)
+    # json was imported before, at the top level, so it isn't attributed to the module
+    assert parse_importtime(IMPORTTIME_OUTPUT, "make_runners_list") == {
+        "make_runners_list": (0, 3480), "yaml": (1, 3080), "yaml.error": (2, 80)}
+    assert deferred_imports(parse_importtime(IMPORTTIME_OUTPUT, "make_runners_list"), "make_runners_list") == ["yaml"]
+    with pytest.raises(ValueError):
+        parse_importtime(IMPORTTIME_OUTPUT, "cleanup_distribution")
+
+
+@pytest.fixture(scope="module")
+def scale():
+    return relative_scale()
+
+
+@pytest.mark.parametrize("module", sorted(STARTUP_BUDGETS_MS))
+def test_startup_time_is_within_budget(module, scale):
+    for dependency in ALLOWED_IMPORTS.get(module, ()):
+        if importlib.util.find_spec(dependency) is None:
+            pytest.skip(f"{dependency} is not installed")
+
+    durations, timings = measure_import(module)
+
+    assert deferred_imports(timings, module) == []
+    budget = STARTUP_BUDGETS_MS[module] * scale * MARGIN
+    assert min(durations) <= budget, f"{module} imports in {min(durations):.1f}ms, over {budget:.1f}ms"
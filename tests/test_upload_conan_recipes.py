@@ -0,0 +1,69 @@
+import threading
+
+import pytest
+
+import upload_conan_recipes
+
+
+@pytest.fixture
+def recipes(tmp_path, monkeypatch):
+    package_dir = tmp_path / "recipes" / "uranium"
+    versions = ["5.9.0", "5.10.0", "5.11.0"]
+    for version in versions:
+        (package_dir / "all" / version).mkdir(parents=True)
+        (package_dir / "all" / version / "conanfile.py").write_text(f"# {version}")
+    (package_dir / "config.yml").write_text("versions:\n" + "".join(f'  "{version}":\n    folder: all/{version}\n' for version in versions))
+    monkeypatch.setenv("GITHUB_STEP_SUMMARY", str(tmp_path / "summary.md"))
+    monkeypatch.setenv("CURA_WORKFLOWS_YAML_CACHE", "0")
+    return package_dir / "config.yml"
+
+
+def test_uploads_start_while_the_next_recipes_are_exported(recipes, tmp_path, monkeypatch):
+    events = []
+    first_upload_started = threading.Event()
+
+    def export_recipe(name, version, conanfile, user, channel):
+        if version != "5.9.0":
+            # The next export only goes on once the upload of the first recipe is running
+            assert first_upload_started.wait(5)
+        events.append(("export", version))
+        return f"{name}/{version}#rev{version}"
+
+    def upload_recipe(package_reference, remote):
+        first_upload_started.set()
+        events.append(("upload", package_reference))
+        return package_reference.split("#")[0]
+
+    monkeypatch.setattr(upload_conan_recipes, "export_recipe", export_recipe)
+    monkeypatch.setattr(upload_conan_recipes, "upload_recipe", upload_recipe)
+    upload_conan_recipes.main(["--branch", "main", "--remote", "cura-conan2", "--jobs", "2",
+                               "--revision-index", str(tmp_path / "index.json"), str(recipes)])
+
+    assert [event for event in events if event[0] == "export"] == [("export", "5.9.0"), ("export", "5.10.0"), ("export", "5.11.0")]
+    assert events.index(("upload", "uranium/5.9.0#rev5.9.0")) < events.index(("export", "5.10.0"))
+    assert (tmp_path / "summary.md").read_text().splitlines() == ["# Created and Uploaded to remote cura-conan2",
+                                                                  "uranium/5.9.0", "uranium/5.10.0", "uranium/5.11.0"]
+    index = upload_conan_recipes.load_revision_index(str(tmp_path / "index.json"))
+    assert index["cura-conan2"]["uranium/5.10.0"]["revision"] == "rev5.10.0"
+
+
+def test_failed_exports_and_uploads_are_reported(recipes, tmp_path, monkeypatch, capsys):
+    def export_recipe(name, version, conanfile, user, channel):
+        if version == "5.10.0":
+            raise RuntimeError("export failed")
+        return f"{name}/{version}#rev"
+
+    def upload_recipe(package_reference, remote):
+        if package_reference.startswith("uranium/5.11.0"):
+            raise RuntimeError("upload failed")
+        return package_reference.split("#")[0]
+
+    monkeypatch.setattr(upload_conan_recipes, "export_recipe", export_recipe)
+    monkeypatch.setattr(upload_conan_recipes, "upload_recipe", upload_recipe)
+    with pytest.raises(SystemExit):
+        upload_conan_recipes.main(["--branch", "main", "--remote", "cura-conan2", str(recipes)])
+
+    assert (tmp_path / "summary.md").read_text().splitlines() == ["# Created and Uploaded to remote cura-conan2",
+                                                                  "uranium/5.9.0", "# Failed",
+                                                                  "uranium/5.10.0 (export)", "uranium/5.11.0 (upload)"]
+    assert "Failed to upload uranium/5.11.0: upload failed" in capsys.readouterr().err
@@ -0,0 +1,29 @@
+import random
+
+PRE_RELEASES = ["alpha", "beta", "rc", "dev", "a", "b"]
+BUILDS = ["abc", "build", "git", "x"]
+
+
+def random_items(rng, count, textual):
+    # Small numbers, so equal items and trailing zeros are common
+    items = []
+    for _ in range(count):
+        if textual and rng.random() < 0.3:
+            items.append(rng.choice(PRE_RELEASES))
+        else:
+            items.append(str(rng.randint(0, 3)))
+    return ".".join(items)
+
+
+def random_version(rng):
+    """A version with one to four main items, and maybe a pre-release and a build, each with one to three items.
+
+    Textual items start with a letter: Conan compares a number to a text as strings, which only agrees with the total
+    order of version_sort_key when the text can't start with a digit."""
+    version = random_items(rng, rng.randint(1, 4), textual=rng.random() < 0.1)
+    if rng.random() < 0.4:
+        version += "-" + random_items(rng, rng.randint(1, 3), textual=True)
+    if rng.random() < 0.3:
+        build = random_items(rng, rng.randint(1, 3), textual=False)
+        version += "+" + (f"{rng.choice(BUILDS)}.{build}" if rng.random() < 0.5 else build)
+    return version